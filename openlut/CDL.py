@@ -0,0 +1,171 @@
+import xml.etree.ElementTree as ET
+
+import numpy as np
+
+from .Transform import Transform
+from .lib import olOpt as olo
+from .lib import serial
+
+class CDL(Transform) :
+	'''
+	An ASC Color Decision List correction: per channel slope, offset & power, then saturation. That is, per pixel:
+
+	:code:`out = clamp(in * slope + offset) ** power`, then :code:`out = luma + sat * (out - luma)`, where luma weighs r, g, b as
+	Rec709 does. SOP and saturation happen in a single pass of :py:func:`~openlut.olOpt.cdl`, instead of one
+	:py:func:`~openlut.ColMap.apply` each.
+
+	:param slope: The r, g, b slopes, or one for all three.
+	:param offset: The r, g, b offsets, or one for all three.
+	:param power: The r, g, b powers, or one for all three.
+	:param float sat: The saturation.
+	:param bool clamp: Whether values are clamped to [0, 1] after SOP, and after saturation, as the ASC specifies. Without,
+		negative values are left as they are by the power.
+	:param id: The correction's ID, as in .cdl & .ccc files.
+	:type id: str or None
+
+	:raises ValueError: When slope or saturation are negative, or power isn't positive.
+	'''
+
+	#: The r, g, b weights of luma, for saturation: Rec709's, as the ASC specifies.
+	LUMA = (0.2126, 0.7152, 0.0722)
+
+	def __init__(self, slope = 1.0, offset = 0.0, power = 1.0, sat = 1.0, clamp = True, id = None) :
+		self.slope = CDL._rgb(slope)
+		self.offset = CDL._rgb(offset)
+		self.power = CDL._rgb(power)
+		self.sat = float(sat)
+		self.clamp = bool(clamp)
+		self.id = id
+
+		if min(self.slope) < 0 or self.sat < 0 or min(self.power) <= 0 :
+			raise ValueError('CDL slopes & saturation can\'t be negative, and powers must be positive!')
+
+	def _rgb(val) :
+		'''
+		An r, g, b tuple of floats, from one number or three.
+		'''
+		vals = tuple(float(v) for v in np.ravel(val))
+		if len(vals) == 1: return vals * 3
+		if len(vals) != 3: raise ValueError('CDL values need one number, or three for r, g, b!')
+
+		return vals
+
+	def sample(self, fSeq, planar = False, out = None) :
+		'''
+		Apply the CDL to the numpy image array, using fast C++ math.
+
+		:return: Returns a numpy array with identical shape to the input array, whose last axis must be r, g, b (the first, if planar).
+			Written into out, if given; see :py:func:`~openlut.Transform.outArray`.
+		'''
+		fSeq = Transform.workArray(fSeq)
+		if fSeq.shape[Transform.rgbAxis(planar)] != 3: raise ValueError("CDLs need an array whose {} axis is r, g, b!".format('first' if planar else 'last'))
+
+		return olo.cdl(	fSeq.reshape(fSeq.size),
+						np.array(self.slope + self.offset + self.power, dtype=np.float32),
+						self.sat,
+						self.clamp,
+						planar,
+						Transform.outArray(out, fSeq)
+		).reshape(fSeq.shape)
+
+	#File IO
+	def _tag(elem) :
+		'''
+		An element's tag, without its XML namespace. Files from different versions of the ASC schema use different ones.
+		'''
+		return elem.tag.rsplit('}', 1)[-1]
+
+	def _fromElem(elem, path) :
+		'''
+		The CDL of a ColorCorrection element.
+		'''
+		texts = {CDL._tag(e): e.text for e in elem.iter()}
+
+		def vals(name, default) :
+			try :
+				return [float(v) for v in texts[name].split()] if texts.get(name) is not None else default
+			except ValueError :
+				raise ValueError('Bad {} in {}: {!r}'.format(name, path, texts[name]))
+
+		#Older files spell SatNode as SATNode; only the Saturation inside matters.
+		return CDL(vals('Slope', 1.0), vals('Offset', 0.0), vals('Power', 1.0), vals('Saturation', [1.0])[0], id=elem.get('id'))
+
+	def _corrections(path) :
+		'''
+		Yields (key, ColorCorrection element) in file order, streaming: each element is cleared once the caller is done with it.
+		'''
+		pos = 0
+		with open(path, 'rb') as f :
+			try :
+				for event, elem in ET.iterparse(f, events=('end',)) :
+					if CDL._tag(elem) != 'ColorCorrection': continue
+
+					yield elem.get('id', pos), elem
+
+					pos += 1
+					elem.clear() #So huge collections never sit in memory whole.
+			except ET.ParseError as e :
+				raise ValueError('{} isn\'t a valid CDL file: {}'.format(path, e))
+
+	def openAll(path, ids = None) :
+		'''
+		Opens the corrections of a .cdl, .ccc or .cc file, all in one pass - ex. every shot of a batch.
+
+		:param ids: Only the corrections with these IDs are made. None makes them all.
+		:return: A dict of ID --> :py:class:`~openlut.CDL`, in file order. Corrections without an ID are keyed by their position.
+		:raises ValueError: When the file doesn't parse, or a value isn't a number.
+		'''
+		wanted = set(ids) if ids is not None else None
+
+		return {key: CDL._fromElem(elem, path) for key, elem in CDL._corrections(path) if wanted is None or key in wanted}
+
+	def open(path, id = None) :
+		'''
+		Opens one correction of a .cdl, .ccc or .cc file: the one with the given ID, or else the first.
+
+		:raises ValueError: When there's no such correction. See :py:func:`~openlut.CDL.openAll`.
+		'''
+		for key, elem in CDL._corrections(path) :
+			if id is None or key == id: return CDL._fromElem(elem, path)
+
+		raise ValueError('{} has no correction{}!'.format(path, ' with ID {!r}'.format(id) if id is not None else 's'))
+
+	def _toElem(self) :
+		cc = ET.Element('ColorCorrection', {'id': str(self.id)} if self.id is not None else {})
+
+		sop = ET.SubElement(cc, 'SOPNode')
+		for name, vals in (('Slope', self.slope), ('Offset', self.offset), ('Power', self.power)) :
+			ET.SubElement(sop, name).text = ' '.join('{:.6f}'.format(v) for v in vals)
+
+		ET.SubElement(ET.SubElement(cc, 'SatNode'), 'Saturation').text = '{:.6f}'.format(self.sat)
+
+		return cc
+
+	def save(self, path) :
+		'''
+		Saves the CDL as a .cc file.
+		'''
+		ET.ElementTree(self._toElem()).write(path, encoding='utf-8', xml_declaration=True)
+
+	def saveAll(cdls, path) :
+		'''
+		Saves many CDLs - ex. a dict's values, from :py:func:`~openlut.CDL.openAll` - as one .ccc file.
+		'''
+		ccc = ET.Element('ColorCorrectionCollection', {'xmlns': 'urn:ASC:CDL:v1.01'})
+		ccc.extend(cdl._toElem() for cdl in cdls)
+
+		ET.ElementTree(ccc).write(path, encoding='utf-8', xml_declaration=True)
+
+	def _dump(self, w) :
+		w.pack('9dd?', *(self.slope + self.offset + self.power), self.sat, self.clamp)
+		w.str(self.id if self.id is not None else '')
+
+	def _load(r) :
+		vals = r.unpack('9dd?')
+
+		return CDL(vals[0:3], vals[3:6], vals[6:9], vals[9], vals[10], r.str() or None)
+
+	def __repr__(self) :
+		return 'CDL(\n\tslope = {0},\n\toffset = {1},\n\tpower = {2},\n\tsat = {3},\n\tclamp = {4},\n\tid = {5!r}\n)'.format(self.slope, self.offset, self.power, self.sat, self.clamp, self.id)
+
+serial.register(CDL, b'D')
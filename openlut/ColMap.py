@@ -4,11 +4,7 @@ from functools import reduce
 
 import numpy as np
 
-import wand
-import wand.image
-import wand.display
-
-from wand.api import library
+#Wand (ImageMagick), the Viewer (pygame & OpenGL) and openlut.lib.aio (asyncio) are slow to import, so they're imported where they're used.
 
 #~ library.MagickSetCompressionQuality.argtypes = [ctypes.c_void_p, ctypes.c_size_t]
 #~ library.MagickSetCompression.argtypes = [ctypes.c_void_p, ctypes.c_size_t]
@@ -16,8 +12,9 @@ from wand.api import library
 #~ COMPRESS_TYPES = dict(zip(wand.image.COMPRESSION_TYPES, tuple(map(ctypes.c_int, range(len(wand.image.COMPRESSION_TYPES))))))
 
 from . import gamma
+from . import gamut
+from .Transform import Transform
 from .LUT import LUT
-from .Viewer import Viewer
 
 from .lib import olOpt as olo
 
@@ -29,6 +26,8 @@ class ColMap :
 	:type shape: tuple[int, int] or tuple[int, int, int]
 	:param depth: The integer depth used for int format's input and output. Set to DEPTHS['full'] by default.
 	:type depth: int or None
+	:param bool half: Store the image as 16 bit floats instead, halving memory use & bandwidth. See :py:func:`~openlut.ColMap.asHalf`.
+	:param bool planar: Store the image planar, as a (3, height, width) array, instead of interleaved. See :py:func:`~openlut.ColMap.asPlanar`.
 	
 	ColMaps are initialized by default with 0's; a black image. You can use
 	`open` to load a path, :py:func:`~openlut.ColMap.fromArray` to load from a numpy array, or :py:func:`~openlut.ColMap.fromBinary` to load from
@@ -48,7 +47,7 @@ class ColMap :
 	}
 	
 #Constructors
-	def __init__(self, shape, depth = None) :
+	def __init__(self, shape, depth = None, half = False, planar = False) :
 		if depth not in ColMap.DEPTHS.values() :
 			raise ValueError('Bit depth not supported! Supported bit depths: {}'.format(', '.join(ColMap.DEPTHS.values())))
 		
@@ -56,10 +55,11 @@ class ColMap :
 			raise ValueError('Please use a valid numpy image array shape!')
 		
 		self.depth = depth if depth is not None else ColMap.DEPTHS['full'] #This represents the real precision of data.
-		self.rgbArr = np.zeros((shape[0], shape[1], 3), dtype=np.float32)
+		self.planar = planar
+		self.rgbArr = np.zeros((3, shape[0], shape[1]) if planar else (shape[0], shape[1], 3), dtype=np.float16 if half else np.float32)
 		
 	@staticmethod
-	def fromArray(imgArr) :
+	def fromArray(imgArr, half = False, planar = False) :
 		'''
 		Initialize a ColMap from a numpy array of either float or int type (containing an image).
 		
@@ -68,9 +68,11 @@ class ColMap :
 		:param imgArr: The numpy image array. Must have shape (width, height, 3)
 		:param depth: The integer depth used for int format's input and output. None will use highest available.
 		:type depth: int or None
+		:param bool half: Store the image as 16 bit floats. Otherwise, float16 arrays are widened to 32 bit floats.
+		:param bool planar: imgArr is planar, with shape (3, height, width); the ColMap stays planar. Greyscale images become planar.
 		
 		:return: A ColMap containing the image represented in imgArr.
-		:raises ValueError: When trying to use unsupported array data type
+		:raises ValueError: When trying to use unsupported array data type, or the r, g, b axis (last, or first if planar) isn't 3 long.
 		'''
 		
 		#Infer bitDepth from array to create new array, nArr, which we'll use to make our ColMap.
@@ -87,7 +89,7 @@ class ColMap :
 			else :
 				bitDepth = None
 				
-			nArr = np.array(imgArr, dtype=np.float32)
+			nArr = np.array(imgArr, dtype=np.float16 if half else np.float32)
 			
 		else :
 			raise ValueError('The input image array uses an invalid data type {}! Please use any np.int or np.float variant!'.format(imgArr.dtype.type))
@@ -97,16 +99,73 @@ class ColMap :
 		if len(nArr.shape) not in (2, 3) :
 			raise ValueError('Please use a valid numpy image array shape!')
 			
+		elif len(nArr.shape) == 3 and nArr.shape[Transform.rgbAxis(planar)] != 3 :
+			raise ValueError('Please use an image array whose {} axis is r, g, b, not shape {}!'.format('first' if planar else 'last', nArr.shape))
+			
+		elif len(nArr.shape) == 2 and planar :
+			
+			#Planar greyscale is just three copies of the plane.
+			nArr = np.stack([nArr] * 3)
+			
 		elif len(nArr.shape) == 2 :
 			
 			#If we're dealing with a greyscale image, then we need to convert it to RGB using an optimized C++ function.
 			nArr = olo.grey_to_rgb(nArr.reshape(reduce(lambda a, b: a*b, nArr.shape))).reshape((nArr.shape[0], nArr.shape[1], 3))
 		
-		img = ColMap(nArr.shape, depth=bitDepth)
-		img.rgbArr = nArr
+		if half: nArr = nArr.astype(np.float16, copy=False)
+		
+		return ColMap._wrap(nArr, bitDepth, planar)
+		
+	@staticmethod
+	def _wrap(rgbArr, depth = None, planar = False) :
+		'''
+		Make a ColMap around an existing (height, width, 3) - or planar (3, height, width) - float32 or float16 array, without allocating a black image first.
+		'''
+		img = ColMap.__new__(ColMap)
+		img.depth = depth if depth is not None else ColMap.DEPTHS['full']
+		img.planar = planar
+		img.rgbArr = rgbArr
 		
 		return img
 		
+	@staticmethod
+	def fromMemmap(path, shape = None, mode = 'r', depth = None, half = False) :
+		'''
+		Construct a ColMap whose image array is memory-mapped from the disk, instead of loaded into RAM.
+		
+		:param str path: A .npy file, or a raw file of native-endian float32 (or float16) r, g, b values.
+		:param shape: The (height, width) of a raw file. .npy files know their own shape.
+		:type shape: tuple[int, int] or None
+		:param bool half: Whether a raw file holds float16 values. .npy files know their own type.
+		:param str mode: The np.memmap mode. 'r' is read only; 'r+' writes changes back to the file; 'c' is copy-on-write.
+		:param depth: The integer depth used for int format's input and output.
+		:type depth: int or None
+		:return: The image, as a ColMap backed by the file.
+		:rtype: :py:class:`~openlut.ColMap`
+		:raises ValueError: When the file isn't a float32 or float16 (height, width, 3) image.
+		
+		Several processes may map the same huge plate, sharing it through the page cache.
+		'''
+		if path.endswith('.npy') :
+			arr = np.load(path, mmap_mode=mode)
+		else :
+			if shape is None: raise ValueError('Raw memory-mapped images need a shape!')
+			arr = np.memmap(path, dtype=np.float16 if half else np.float32, mode=mode, shape=(shape[0], shape[1], 3))
+			
+		if arr.dtype not in (np.float32, np.float16) or len(arr.shape) != 3 or arr.shape[2] != 3 :
+			raise ValueError('Memory-mapped images must be float32 or float16 arrays of shape (height, width, 3)!')
+			
+		return ColMap._wrap(arr, depth)
+		
+	@staticmethod
+	def _openMemmap(path, shape, dtype = np.float32) :
+		'''
+		Create a writable float32 (or dtype) memmap at path; .npy if the path says so, raw otherwise.
+		'''
+		if path.endswith('.npy') :
+			return np.lib.format.open_memmap(path, mode='w+', dtype=dtype, shape=shape)
+		return np.memmap(path, dtype=dtype, mode='w+', shape=shape)
+		
 	@staticmethod
 	def fromBinary(binData, fmt, width=None, height=None) :
 		'''
@@ -126,6 +185,8 @@ class ColMap :
 			
 		**NOTE: Uses Wand's "blob" functionality, and as such incurs Wand's limitations.**
 		'''
+		import wand.image
+		
 		with wand.image.Image(blob=binData, format=fmt, width=width, height=height) as img:
 			
 			return ColMap.fromArray(np.fromstring(img.make_blob("RGB"), dtype='uint{}'.format(img.depth)).reshape(img.height, img.width, 3))
@@ -160,7 +221,7 @@ class ColMap :
 			return ColMap.openWand(path)
 		
 #Operations - returns new ColMaps.
-	def apply(self, transform) :
+	def apply(self, transform, path = None, rows = None) :
 		'''
 		Apply an image transformation, in the form of a subclass of :py:class:`~openlut.Transform`.
 		
@@ -168,11 +229,184 @@ class ColMap :
 		:py:class:`~openlut.Func`, :py:class:`~openlut.ColMat`, or any other :py:class:`~openlut.Transform` object to apply it
 		to the image!
 		
+		:param transform: An image transform.
+		:type transform: :py:class:`~openlut.Transform`
+		:param path: Write the result to a memory-mapped file here (.npy, or raw float32) instead of RAM. See :py:func:`~openlut.ColMap.fromMemmap`.
+		:type path: str or None
+		:param rows: With path, the number of rows transformed at a time. Defaults to about 64MB worth.
+		:type rows: int or None
+		:return: A transformed ColMap.
+		
+		With a path, the image goes through the transform in bands of rows, so neither the input nor the output
+		ever has to fit in RAM.
+		
+		Half float images stay half float; the C++ transforms read & write float16 directly, computing in 32 bit float.
+		Planar images stay planar; the C++ transforms work on the planes directly, without transposing. Transforms whose sample
+		doesn't take planar get the image interleaved.
+		'''
+		if path is None: return ColMap.fromArray(Transform.sampleWith(transform, self.asarray(), self.planar), half=self.isHalf(), planar=self.planar)
+		
+		out = ColMap._openMemmap(path, self.rgbArr.shape, self.rgbArr.dtype)
+		height = self.rgbArr.shape[1 if self.planar else 0]
+		rows = rows if rows is not None else max(1, (64 * 2 ** 20) // max(self.rgbArr.nbytes // height, 1))
+		
+		for row in range(0, height, rows) :
+			band = np.s_[:, row:row + rows] if self.planar else np.s_[row:row + rows]
+			out[band] = Transform.sampleWith(transform, np.asarray(self.rgbArr[band]), self.planar)
+		out.flush()
+		
+		return ColMap._wrap(out, self.depth, self.planar)
+		
+	def toMemmap(self, path) :
+		'''
+		Spill this image to a memory-mapped file (.npy, or raw float32), freeing RAM. See :py:func:`~openlut.ColMap.fromMemmap`.
+		
+		:param str path: The file to write.
+		:return: An identical ColMap, backed by the file.
+		:rtype: :py:class:`~openlut.ColMap`
+		'''
+		out = ColMap._openMemmap(path, self.rgbArr.shape, self.rgbArr.dtype)
+		out[:] = self.rgbArr
+		out.flush()
+		
+		return ColMap._wrap(out, self.depth, self.planar)
+		
+#Analysis
+	def stats(self, bins = 1024, iRange = (0.0, 1.0), percentiles = (1, 5, 50, 95, 99)) :
+		'''
+		Scan the image for per-channel statistics, in a single parallel pass of :py:func:`~openlut.olOpt.stats`.
+		
+		:param int bins: The number of histogram bins.
+		:param iRange: The range covered by the histogram.
+		:type iRange: tuple[float, float]
+		:param percentiles: The percentiles (0 - 100) to approximate from the histogram.
+		:return: A dictionary of per-channel (r, g, b) numpy arrays:
+		
+			* **min**, **max**, **mean**: Over finite values only.
+			* **finite**, **nan**, **inf**: Value counts.
+			* **under**, **over**: Counts of finite values outside iRange.
+			* **hist**: A (3, bins) histogram over iRange. Values outside iRange land in the edge bins.
+			* **percentiles**: A dict mapping each percentile to its approximate per-channel value, clamped to iRange.
+		:rtype: dict
+		:raises ValueError: When bins is less than 1, or iRange is empty or reversed.
+		
+		Use this to check frames for NaN's, out-of-range values, or exposure, before picking a LUT range or tone-mapping key.
+		'''
+		if bins < 1: raise ValueError('The histogram needs at least one bin!')
+		if not iRange[1] > iRange[0]: raise ValueError('iRange must run from low to high, not {}!'.format(tuple(iRange)))
+		
+		st = olo.stats(self.asInterleaved().rgbArr, bins, iRange[0], iRange[1])
+		
+		#Percentiles come from the cumulative histogram, interpolating linearly inside each bin.
+		binWidth = (iRange[1] - iRange[0]) / bins
+		cdf = np.cumsum(st['hist'], axis=1)
+		
+		st['percentiles'] = dict()
+		for p in percentiles :
+			vals = np.full(3, np.nan)
+			for c in range(3) :
+				if not cdf[c, -1]: continue
+				
+				target = p / 100 * cdf[c, -1]
+				b = min(int(np.searchsorted(cdf[c], target)), bins - 1)
+				below = cdf[c, b - 1] if b > 0 else 0
+				
+				vals[c] = iRange[0] + (b + (target - below) / max(st['hist'][c, b], 1)) * binWidth
+				
+			st['percentiles'][p] = vals
+			
+		return st
+		
+	def compare(self, other, metrics = ('maxAbs', 'meanAbs', 'psnr', 'dE2000'), peak = 1.0) :
+		'''
+		Compare this image to another of the same shape, in a single parallel pass of :py:func:`~openlut.olOpt.compare`. No difference image is made.
+		
+		:param other: The image to compare against, ex. the output of a baked LUT vs. the exact :py:class:`~openlut.Func` chain.
+		:type other: :py:class:`~openlut.ColMap` or np.array
+		:param metrics: The metrics to compute. Any of:
+		
+			* **maxAbs**, **meanAbs**: Per-channel max & mean absolute error.
+			* **psnr**: Peak signal-to-noise ratio in dB, over all channels, relative to peak.
+			* **dE2000**: Mean CIEDE2000 color difference, with **dE2000Max** alongside. Images are taken as linear ACES, converted with :py:data:`~openlut.gamut.XYZ`.
+		:param float peak: The peak value used by psnr.
+		:return: A dictionary with an entry for each metric.
+		:rtype: dict
+		:raises ValueError: When the images have different shapes, or a metric is unknown.
+		'''
+		unknown = set(metrics) - {'maxAbs', 'meanAbs', 'psnr', 'dE2000'}
+		if unknown: raise ValueError('Unknown metrics: {}'.format(', '.join(sorted(unknown))))
+		
+		otherArr = other.asInterleaved().rgbArr if isinstance(other, ColMap) else other
+		selfArr = self.asInterleaved().rgbArr
+		if np.shape(otherArr) != selfArr.shape: raise ValueError('Compared images must have the same shape!')
+		
+		dE = 'dE2000' in metrics
+		res = olo.compare(selfArr, otherArr, gamut.XYZ.reshape(9), dE)
+		
+		out = dict()
+		if 'maxAbs' in metrics: out['maxAbs'] = res['maxAbs']
+		if 'meanAbs' in metrics: out['meanAbs'] = res['meanAbs']
+		if 'psnr' in metrics :
+			mse = np.mean(res['mse'])
+			out['psnr'] = float(10 * np.log10(peak ** 2 / mse)) if mse > 0 else np.inf #Identical images have infinite PSNR.
+		if dE :
+			out['dE2000'] = res['dE2000']
+			out['dE2000Max'] = res['dE2000Max']
+			
+		return out
+		
+#asyncio Counterparts - run on a library-managed thread pool; see openlut.lib.aio.
+	@staticmethod
+	async def aopen(path) :
+		'''
+		Awaitable :py:func:`~openlut.ColMap.open`, which doesn't block the event loop.
+		
+		:param str path: The image path to open.
+		:return: The image, as a ColMap.
+		:rtype: :py:class:`~openlut.ColMap`
+		'''
+		from .lib import aio
+		
+		return await aio.run(ColMap.open, path)
+		
+	async def aapply(self, transform) :
+		'''
+		Awaitable :py:func:`~openlut.ColMap.apply`, which doesn't block the event loop.
+		
 		:param transform: An image transform.
 		:type transform: :py:class:`~openlut.Transform`
 		:return: A transformed ColMap.
 		'''
-		return ColMap.fromArray(transform.sample(self.asarray()))
+		from .lib import aio
+		
+		return await aio.run(self.apply, transform)
+		
+	async def asave(self, path, compress = None, depth = None) :
+		'''
+		Awaitable :py:func:`~openlut.ColMap.save`, which doesn't block the event loop.
+		'''
+		from .lib import aio
+		
+		return await aio.run(self.save, path, compress, depth)
+		
+	@staticmethod
+	def aopenSeq(paths, transform = None, prefetch = None) :
+		'''
+		Async iterator, opening (and optionally transforming) a sequence of images in order.
+		
+		:param paths: The image paths.
+		:param transform: An image transform to apply to each image, or None.
+		:type transform: :py:class:`~openlut.Transform` or None
+		:param prefetch: How many frames may be in flight at once. Defaults to the worker count of openlut.lib.aio.
+		:type prefetch: int or None
+		:return: An async iterator of ColMaps. Use with ``async for``.
+		
+		Frames are opened ahead of the consumer, bounded by prefetch, so memory stays constant.
+		'''
+		from .lib import aio
+		
+		load = ColMap.open if transform is None else (lambda path: ColMap.open(path).apply(transform))
+		return aio.imap(load, paths, prefetch)
 		
 #Vendor-specific open methods.
 	@staticmethod
@@ -184,6 +418,7 @@ class ColMap :
 		:return: The image, as a ColMat.
 		:rtype: :py:class:`~openlut.ColMap`
 		'''
+		import wand.image
 		
 		with wand.image.Image(filename=path) as img:
 			#Quick inverse sRGB transform, to undo what Wand did - but not for exr's, which are linear bastards.
@@ -275,6 +510,7 @@ class ColMap :
 		
 		For the viewer source code, see :py:class:`~openlut.Viewer`.
 		'''
+		from .Viewer import Viewer
 		
 		img = ColMap.open(path).rgbArr
 		aspectRatio = img.shape[0]/img.shape[1]
@@ -292,9 +528,11 @@ class ColMap :
 		
 		For the viewer source code, see :py:class:`~openlut.Viewer`.
 		'''
+		from .Viewer import Viewer
 		
 		#Use my custom OpenGL viewer!
-		Viewer.run(self.rgbArr, width, int(width * self.rgbArr.shape[0]/self.rgbArr.shape[1]))
+		img = np.asarray(self.asInterleaved().rgbArr, dtype=np.float32)
+		Viewer.run(img, width, int(width * img.shape[0]/img.shape[1]))
 		
 
 #Data Output Types
@@ -309,6 +547,7 @@ class ColMap :
 		
 		See http://docs.wand-py.org/en/0.4.4/index.html for Wand docs.
 		'''
+		import wand.image
 		
 		if depth not in ColMap.DEPTHS.values() :
 			raise ValueError('Bit depth not supported! Supported bit depths: {}'.format(', '.join(ColMap.DEPTHS.values())))
@@ -319,7 +558,8 @@ class ColMap :
 			d = depth
 		
 		#~ i = wand.image.Image(blob=self.asarray().tostring(), width=np.shape(self.rgbArr)[1], height=np.shape(self.rgbArr)[0], format='RGB') #Float Array
-		i = wand.image.Image(blob=self.asIntArray(d).tostring(), width=np.shape(self.rgbArr)[1], height=np.shape(self.rgbArr)[0], format='RGB')
+		intArr = self.asIntArray(d)
+		i = wand.image.Image(blob=intArr.tostring(), width=intArr.shape[1], height=intArr.shape[0], format='RGB')
 		i.colorspace = 'rgb' #Specify, to Wand, that this image is to be treated as raw, linear, data.
 		
 		return i
@@ -350,16 +590,68 @@ class ColMap :
 		
 	def asarray(self) :
 		"""
-		Returns the internal np.float32 image array directly.
+		Returns the internal np.float32 (or np.float16, for half float ColMaps) image array directly. Planar ColMaps return their (3, height, width) array.
 		
 		:return: The internal numpy array.
 		:rtype: np.array
 		"""
 		return self.rgbArr
 		
+	def isHalf(self) :
+		"""
+		True if the image is stored as 16 bit floats.
+		"""
+		return self.rgbArr.dtype == np.float16
+		
+	def asHalf(self) :
+		"""
+		Returns a ColMap storing this image as 16 bit floats: half the memory of 32 bit floats, for caches & streaming.
+		
+		Transforms keep working in 32 bit float internally, reading & writing 16 bit floats. Values over 65504 become inf.
+		
+		:return: A half float ColMap; this one, if it already is.
+		:rtype: :py:class:`~openlut.ColMap`
+		"""
+		return self if self.isHalf() else ColMap._wrap(self.rgbArr.astype(np.float16), self.depth, self.planar)
+		
+	def asFull(self) :
+		"""
+		Returns a ColMap storing this image as 32 bit floats. See :py:func:`~openlut.ColMap.asHalf`.
+		
+		:return: A 32 bit float ColMap; this one, if it already is.
+		:rtype: :py:class:`~openlut.ColMap`
+		"""
+		return ColMap._wrap(self.rgbArr.astype(np.float32), self.depth, self.planar) if self.isHalf() else self
+		
+	def isPlanar(self) :
+		"""
+		True if the image is stored planar, as a (3, height, width) array.
+		"""
+		return self.planar
+		
+	def asPlanar(self) :
+		"""
+		Returns a ColMap storing this image planar, as a (3, height, width) array - the layout of ML frameworks & many decoders.
+		
+		Transforms work on planar images directly, so convert once at the boundary, if at all. Per-channel curves then run over contiguous planes.
+		
+		:return: A planar ColMap; this one, if it already is.
+		:rtype: :py:class:`~openlut.ColMap`
+		"""
+		return self if self.planar else ColMap._wrap(np.ascontiguousarray(self.rgbArr.transpose(2, 0, 1)), self.depth, True)
+		
+	def asInterleaved(self) :
+		"""
+		Returns a ColMap storing this image interleaved, as a (height, width, 3) array. See :py:func:`~openlut.ColMap.asPlanar`.
+		
+		:return: An interleaved ColMap; this one, if it already is.
+		:rtype: :py:class:`~openlut.ColMap`
+		"""
+		return ColMap._wrap(np.ascontiguousarray(self.rgbArr.transpose(1, 2, 0)), self.depth) if self.planar else self
+		
 	def asIntArray(self, depth = None, us = True) :
 		"""
-		Returns the internal image array as an int array.
+		Returns the internal image array as an interleaved (height, width, 3) int array.
 		
 		:param depth: You may override the ColMap's bit depth if you wish.
 		:type depth: int or None
@@ -377,7 +669,7 @@ class ColMap :
 			d = depth
 		
 		u = 'u' if us else '' #Unsigned or no?
-		return np.multiply(self.rgbArr.clip(0, 1), 2.0 ** depth - 1).astype("{0}int{1}".format(u, depth))
+		return np.multiply(self.asInterleaved().rgbArr.clip(0, 1).astype(np.float32), 2.0 ** depth - 1).astype("{0}int{1}".format(u, depth))
 		
 		
 #Overloads
@@ -7,12 +7,16 @@ import numpy as np
 
 from .Transform import Transform
 from .lib import olOpt as olo
+from .lib import serial
 
 class ColMat(Transform) :
 	def __init__(self, *mats) :
 		'''
 		Initializes a combined 3x3 Transformation Matrix from any number of input matrices. These may be numpy arrays, matrices,
 		other ColMats, or any combination thereof.
+		
+		3x4 affine matrices are supported too; the last column is an offset added after the 3x3 part. Combining an affine
+		matrix with anything gives an affine matrix.
 		'''
 		if len(mats) == 1 :
 			mat = mats[0]
@@ -21,10 +25,14 @@ class ColMat(Transform) :
 				self.mat = mat.mat #Support a copy constructor.
 			else :
 				self.mat = np.array(mat) #Simply set self.mat with the numpy array version of the mat.
+				
+			if self.mat.shape not in ((3, 3), (3, 4)): raise ValueError('ColMats must be 3x3 or 3x4 (affine)!')
 		elif len(mats) > 1 :
 			self.mat = ColMat._mats(*[ColMat(mat) for mat in mats]).mat
 		elif not mats :
 			self.mat = np.identity(3)
+			
+		self._mat32 = np.ascontiguousarray(self.mat, dtype=np.float32).reshape(self.mat.size) #What olo.matr wants; made once. Treat mat as read only.
 		
 	def _mats(*inMats) :
 		'''
@@ -32,22 +40,54 @@ class ColMat(Transform) :
 		'''
 		return ColMat(reduce(ColMat.__mul__, reversed(inMats))) #Works because multiply is actually non-commutative dot.
 		#This is why we reverse inMats.
+		
+	def _hom(mat) :
+		'''
+		Returns a 3x3 or 3x4 matrix as a 4x4 homogeneous matrix, so affine matrices combine with a simple dot.
+		'''
+		mat = np.array(mat)
+		hom = np.identity(4)
+		hom[:3, :mat.shape[1]] = mat
+		return hom
+		
+	def _unHom(hom, affine) :
+		'''
+		Returns a 4x4 homogeneous matrix as a 3x4 matrix if affine, otherwise as a 3x3 matrix.
+		'''
+		return hom[:3] if affine else hom[:3, :3]
+		
+	def isAffine(self) :
+		'''
+		True if the ColMat is a 3x4 affine matrix.
+		'''
+		return self.mat.shape == (3, 4)
 	
-	def sample(self, fSeq) :
+	def sample(self, fSeq, planar = False, out = None) :
+		'''
+		Apply the matrix to a single color, or to any array whose last axis is r, g, b: images, (N, H, W, 3) batches of
+		frames, (N, 3) point clouds, etc. . With planar, it's the first axis instead, as in (3, height, width) arrays.
+		
+		With out, the result is written into that array, which may be fSeq itself. See :py:func:`~openlut.Transform.outArray`.
+		
+		:return: Returns a numpy array with identical shape to the input array.
+		'''
 		shp = np.shape(fSeq)
 		if len(shp) == 1 :
-			return self.mat.dot(fSeq)
-		if len(shp) == 3 :
-			#C++ based olo.matr replaces & sped up the operation by 50x with same output!!!
-			return olo.matr(fSeq.reshape(reduce(lambda a, b: a*b, fSeq.shape)), self.mat.reshape(reduce(lambda a, b: a*b, self.mat.shape))).reshape(fSeq.shape)
+			return Transform.intoOut(self.mat[:, :3].dot(fSeq) + (self.mat[:, 3] if self.isAffine() else 0), out)
+		
+		if shp[Transform.rgbAxis(planar)] != 3: raise ValueError('ColMats need an array whose {} axis is r, g, b!'.format('first' if planar else 'last'))
+		
+		#C++ based olo.matr replaces & sped up the operation by 50x with same output!!! Any rank goes in a single call.
+		return olo.matr(fSeq, self._mat32, planar, Transform.outArray(out, fSeq, flat=False))
 		
 	def inv(obj) :
 		if isinstance(obj, ColMat) : #Works on any ColMat object - including self.
-			return ColMat(np.linalg.inv(obj.mat))
+			return ColMat(ColMat._unHom(np.linalg.inv(ColMat._hom(obj.mat)), obj.isAffine()))
 		else : #Works on raw numpy arrays as well.
-			return np.linalg.inv(obj)
+			return ColMat._unHom(np.linalg.inv(ColMat._hom(obj)), np.shape(obj) == (3, 4))
 		
 	def transpose(self) :
+		if self.isAffine(): raise ValueError('Affine ColMats can\'t be transposed!')
 		return ColMat(np.transpose(self.mat))
 		
 	#Overloading
@@ -56,24 +96,34 @@ class ColMat(Transform) :
 		* implements matrix multiplication.
 		'''
 		if isinstance(other, ColMat) :
-			return ColMat(self.mat.dot(other.mat))
+			other = other.mat
 		elif isinstance(other, float) or isinstance(other, int) :
 			return ColMat(np.multiply(self.mat, other))
-		elif isinstance(other, np.ndarray) or isinstance(other, np.matrixlib.defmatrix.matrix) :
-			return ColMat(self.mat.dot(np.array(other)))
-		else :
+		elif not (isinstance(other, np.ndarray) or isinstance(other, np.matrixlib.defmatrix.matrix)) :
 			raise ValueError('Invalid multiplication arguments!')
 			
+		other = np.array(other)
+		if not self.isAffine() and other.shape == (3, 3) :
+			return ColMat(self.mat.dot(other))
+		
+		#Affine matrices combine as homogeneous 4x4 matrices.
+		return ColMat(ColMat._unHom(ColMat._hom(self.mat).dot(ColMat._hom(other)), True))
+			
 	__rmul__ = __mul__
 	
 	def __add__(self, other) :
 		if isinstance(other, ColMat) :
-			return ColMat(self.mat + other.mat)
-		elif isinstance(other, np.ndarray) or isinstance(other, np.matrixlib.defmatrix.matrix) :
-			return ColMat(self.mat + np.array(other))
-		else :
+			other = other.mat
+		elif not (isinstance(other, np.ndarray) or isinstance(other, np.matrixlib.defmatrix.matrix)) :
 			raise ValueError('Invalid addition arguments!')
 			
+		other = np.array(other)
+		if self.mat.shape == other.shape :
+			return ColMat(self.mat + other)
+		
+		#Mixing 3x3 and 3x4 - a 3x3 matrix has a zero offset.
+		return ColMat(ColMat._hom(self.mat)[:3] + ColMat._hom(other)[:3])
+			
 	__radd__ = __add__
 	
 	def __pow__(self, other) :
@@ -101,7 +151,13 @@ class ColMat(Transform) :
 	def __iter__(self) :
 		return iter(self.mat)
 		
+	def _dump(self, w) :
+		w.array(self.mat)
+		
+	def _load(r) :
+		return ColMat(r.array())
+		
 	def __repr__(self) :
 		return "\nColMat (\n{0}  )\n".format(str(self.mat))
-		
 
+serial.register(ColMat, b'M')
@@ -0,0 +1,72 @@
+import numpy as np
+
+from .Transform import Transform
+from .ColMat import ColMat
+from .LUT import LUT
+from .lib import olOpt as olo
+from .lib import serial
+
+class CurveMat(Transform) :
+	'''
+	A 1D curve, then a color matrix, then another 1D curve: the classic shape of input (IDT) and output (ODT) transforms.
+
+	:param pre: The 1D LUT applied first, with 1 or 3 channels. None skips it.
+	:type pre: :py:class:`~openlut.LUT` or None
+	:param mat: The 3x3 or 3x4 (affine) color matrix.
+	:type mat: :py:class:`~openlut.ColMat` or numpy array
+	:param post: The 1D LUT applied last, with 1 or 3 channels. None skips it.
+	:type post: :py:class:`~openlut.LUT` or None
+
+	All three steps happen per pixel in a single pass of :py:func:`~openlut.olOpt.curvematr`, instead of three
+	:py:func:`~openlut.ColMap.apply` calls that each allocate a full frame.
+
+	:raises ValueError: When pre or post isn't a 1D LUT.
+	'''
+	def __init__(self, pre = None, mat = None, post = None) :
+		for curve in (pre, post) :
+			if curve is not None and (not isinstance(curve, LUT) or curve.dims != 1) :
+				raise ValueError('CurveMat curves must be 1D LUTs!')
+
+		self.pre = pre
+		self.mat = ColMat(mat) if mat is not None else ColMat()
+		self.post = post
+
+	def _curveArgs(curve) :
+		'''
+		The (flattened LUT, channels, low bound, high bound) arguments of olo.curvematr, for a curve or None.
+		'''
+		if curve is None :
+			return np.zeros(0, dtype=np.float32), 0, 0.0, 1.0
+
+		return curve.array.reshape(curve.array.size), curve.chans, curve.range[0], curve.range[1]
+
+	def sample(self, fSeq, planar = False, out = None) :
+		'''
+		Apply the curve, matrix and curve to the numpy image array, using fast C++ math.
+
+		:return: Returns a numpy array with identical shape to the input array, whose last axis must be r, g, b (the first, if planar).
+			Written into out, if given; see :py:func:`~openlut.Transform.outArray`.
+		'''
+		fSeq = Transform.workArray(fSeq)
+		if fSeq.shape[Transform.rgbAxis(planar)] != 3: raise ValueError("CurveMats need an array whose {} axis is r, g, b!".format('first' if planar else 'last'))
+
+		return olo.curvematr(	fSeq.reshape(fSeq.size),
+								*CurveMat._curveArgs(self.pre),
+								self.mat._mat32,
+								*CurveMat._curveArgs(self.post),
+								planar,
+								Transform.outArray(out, fSeq)
+		).reshape(fSeq.shape)
+
+	def _dump(self, w) :
+		w.node(self.pre)
+		w.node(self.mat)
+		w.node(self.post)
+
+	def _load(r) :
+		return CurveMat(r.node(), r.node(), r.node())
+
+	def __repr__(self) :
+		return 'CurveMat(\n\tpre = {0},\n\tmat = {1},\n\tpost = {2}\n)'.format(repr(self.pre), repr(self.mat), repr(self.post))
+
+serial.register(CurveMat, b'C')
@@ -0,0 +1,225 @@
+import io
+import queue
+import sys
+import threading
+
+import numpy as np
+
+from .ColMap import ColMap
+from .Transform import Transform
+
+class FrameStream :
+	'''
+	Reads & writes fixed-size rawvideo frames through file descriptors, ex. pipes from & to ffmpeg, as ColMaps.
+
+	:param int width: The frame width.
+	:param int height: The frame height.
+	:param str pixFmt: The input's ffmpeg pixel format. See :py:data:`~openlut.FrameStream.FORMATS`.
+	:param inFile: The input: a file descriptor, or a binary file object with readinto. None only writes.
+	:type inFile: int or file or None
+	:param outFile: The output: a file descriptor, or a binary file object. None only reads.
+	:type outFile: int or file or None
+	:param outFmt: The output's ffmpeg pixel format. Set to pixFmt by default.
+	:type outFmt: str or None
+	:param int ring: The number of preallocated frames. A frame read stays valid until ring - 1 more frames are read.
+
+	Nothing is allocated per frame: each frame is read with readinto straight into a ring of preallocated buffers.
+	32 bit float formats are read straight into the ColMap's array, and planar formats stay planar (see
+	:py:func:`~openlut.ColMap.asPlanar`), so :py:func:`~openlut.FrameStream.process` transforms each frame in place.
+
+	For example, to grade dailies: ::
+
+		ffmpeg -i in.mov -f rawvideo -pix_fmt gbrpf32le - | python grade.py | ffmpeg -f rawvideo -pix_fmt gbrpf32le -s 3840x2160 -i - out.mov
+
+	Where grade.py runs :code:`FrameStream(3840, 2160, 'gbrpf32le', sys.stdin.buffer, sys.stdout.buffer).process(lut)`.
+
+	:raises ValueError: When using an unsupported pixel format.
+	'''
+
+	#: The supported pixel formats, as (sample type, planar). Planar frames are ordered g, b, r, like ffmpeg's gbrp formats.
+	FORMATS = {	'rgb48le'	: (np.dtype('<u2'), False),
+				'rgbf32le'	: (np.dtype('<f4'), False),
+				'rgbf32'	: (np.dtype('<f4'), False),
+				'gbrpf32le'	: (np.dtype('<f4'), True),
+				'gbrpf32'	: (np.dtype('<f4'), True)
+	}
+
+	def __init__(self, width, height, pixFmt = 'rgbf32le', inFile = None, outFile = None, outFmt = None, ring = 3) :
+		outFmt = outFmt if outFmt is not None else pixFmt
+		for fmt in (pixFmt, outFmt) :
+			if fmt not in FrameStream.FORMATS :
+				raise ValueError('Pixel format not supported! Supported formats: {}'.format(', '.join(sorted(FrameStream.FORMATS))))
+		if ring < 1: raise ValueError('The ring needs at least one frame!')
+
+		self.width, self.height = width, height
+		self.pixFmt, self.outFmt = pixFmt, outFmt
+
+		#Raw file descriptors are wrapped unbuffered; readinto & write are looped until whole frames are done.
+		self.inFile = io.FileIO(inFile, 'rb', closefd=False) if isinstance(inFile, int) else inFile
+		self.outFile = io.FileIO(outFile, 'wb', closefd=False) if isinstance(outFile, int) else outFile
+
+		#The ring of frames. Integer formats get a raw buffer per frame too, converted into the ColMap after reading.
+		dtype, planar = FrameStream.FORMATS[pixFmt]
+		shape = (3, height, width) if planar else (height, width, 3)
+
+		self._frames = [ColMap._wrap(np.zeros(shape, dtype=np.float32), 16 if dtype.kind == 'u' else None, planar) for i in range(ring)]
+		self._raws = [np.zeros(shape, dtype=dtype) for i in range(ring)] if dtype.kind == 'u' else [None] * ring
+		self._next = 0
+
+		#Output staging, for formats that can't be written straight from a ColMap's array.
+		outType, outPlanar = FrameStream.FORMATS[outFmt]
+		self._outRaw = np.zeros((3, height, width) if outPlanar else (height, width, 3), dtype=outType) if outType.kind == 'u' else None
+		self._outWork = np.zeros(self._outRaw.shape, dtype=np.float32) if self._outRaw is not None else None
+
+	def frameBytes(self, fmt = None) :
+		'''
+		The size in bytes of one frame, in the input's pixel format (or fmt).
+		'''
+		return self.width * self.height * 3 * FrameStream.FORMATS[fmt if fmt is not None else self.pixFmt][0].itemsize
+
+	def _readFull(self, view) :
+		'''
+		Fill the memoryview from the input, looping over short reads. Returns False at a clean end of stream.
+		'''
+		done = 0
+		while done < len(view) :
+			n = self.inFile.readinto(view[done:])
+			if not n :
+				if done == 0: return False
+				raise ValueError('The input ended in the middle of a frame!')
+			done += n
+
+		return True
+
+	def _writeFull(self, view) :
+		'''
+		Write the whole memoryview to the output, looping over short writes.
+		'''
+		done = 0
+		while done < len(view) :
+			n = self.outFile.write(view[done:])
+			done += n if n is not None else len(view) - done
+
+	def _readSlot(self, slot) :
+		'''
+		Read the next frame into a ring slot. Returns False at the end of the stream.
+		'''
+		img, raw = self._frames[slot], self._raws[slot]
+		target = raw if raw is not None else img.rgbArr
+
+		planes = FrameStream._streamViews(target, img.planar)
+		for i, view in enumerate(planes) :
+			if not self._readFull(view) :
+				if i == 0: return False
+				raise ValueError('The input ended in the middle of a frame!')
+
+		if raw is not None :
+			np.multiply(raw, 1 / 65535, out=img.rgbArr, casting='unsafe') #Integer frames are scaled to [0, 1].
+		elif sys.byteorder != 'little' :
+			img.rgbArr.byteswap(inplace=True)
+
+		return True
+
+	def _streamViews(arr, planar) :
+		'''
+		Byte memoryviews of a frame array, in stream order: the whole interleaved array, or the g, b, r planes of a planar one.
+		'''
+		if planar: return [memoryview(arr[c]).cast('B') for c in (1, 2, 0)]
+		return [memoryview(arr).cast('B')]
+
+	def read(self) :
+		'''
+		Read the next frame.
+
+		:return: The frame, as a ColMap viewing a ring buffer - or None at the end of the stream.
+		:rtype: :py:class:`~openlut.ColMap` or None
+		'''
+		slot = self._next
+		if not self._readSlot(slot): return None
+
+		self._next = (slot + 1) % len(self._frames)
+		return self._frames[slot]
+
+	def __iter__(self) :
+		'''
+		Iterate over the frames of the input. See :py:func:`~openlut.FrameStream.read`.
+		'''
+		img = self.read()
+		while img is not None :
+			yield img
+			img = self.read()
+
+	def write(self, img) :
+		'''
+		Write a frame to the output, in its pixel format. Integer formats are clipped to [0, 1] and rounded.
+
+		:param img: The frame.
+		:type img: :py:class:`~openlut.ColMap`
+		:raises ValueError: When the frame has the wrong size.
+		'''
+		outType, outPlanar = FrameStream.FORMATS[self.outFmt]
+
+		img = img.asPlanar() if outPlanar else img.asInterleaved()
+		arr = img.rgbArr
+		if arr.size != self.width * self.height * 3: raise ValueError('Frames must be {}x{}!'.format(self.width, self.height))
+
+		if self._outRaw is not None :
+			np.clip(arr, 0, 1, out=self._outWork)
+			np.multiply(self._outWork, 65535, out=self._outWork)
+			np.rint(self._outWork, out=self._outWork)
+			np.copyto(self._outRaw, self._outWork, casting='unsafe')
+			arr = self._outRaw
+		elif arr.dtype != np.float32 or sys.byteorder != 'little' :
+			arr = arr.astype('<f4')
+
+		for view in FrameStream._streamViews(np.ascontiguousarray(arr), outPlanar) :
+			self._writeFull(view)
+
+	def process(self, transform) :
+		'''
+		Apply a Transform to every frame of the input, in place, and write the frames to the output.
+
+		:param transform: The transform. Its sample method is given out, when it takes it - all of openlut's do; otherwise, its result is
+			copied into the frame.
+		:type transform: :py:class:`~openlut.Transform`
+		:return: The number of frames processed.
+		:rtype: int
+
+		A reader thread keeps the ring full while frames are transformed & written. Reads, writes and the C++ transforms
+		all run without the GIL, so I/O and processing overlap.
+		'''
+		free, full = queue.Queue(), queue.Queue()
+		for slot in range(len(self._frames)): free.put(slot)
+
+		def reader() :
+			try :
+				slot = free.get()
+				while slot is not None and self._readSlot(slot) :
+					full.put(slot)
+					slot = free.get()
+			except Exception as e :
+				full.put(e)
+			else :
+				full.put(None)
+
+		thread = threading.Thread(target=reader, daemon=True)
+		thread.start()
+
+		count = 0
+		try :
+			slot = full.get()
+			while slot is not None :
+				if isinstance(slot, Exception): raise slot
+
+				img = self._frames[slot]
+				Transform.sampleWith(transform, img.rgbArr, img.planar, out=img.rgbArr)
+				self.write(img)
+
+				free.put(slot)
+				count += 1
+				slot = full.get()
+		finally :
+			free.put(None) #Stops the reader, if it's still waiting on a slot.
+
+		if hasattr(self.outFile, 'flush'): self.outFile.flush()
+		return count
@@ -1,42 +1,188 @@
 import multiprocessing as mp
+import os
+import threading
 import types
 from functools import reduce
 
 import numpy as np
 
 from .Transform import Transform
+from .LUT import LUT
 from .lib import olOpt as olo
+from .lib import serial
+from .lib import cache
+from .lib import chunks
+from .lib.expr import Expr
+from .gamma import ParamCurve
 
 class Func(Transform) :
-	def __init__(self, func) :
+	#: The execution backends of Python functions. See :py:class:`~openlut.Func`.
+	BACKENDS = ('thread', 'process')
+	
+	_pool = None #The shared thread pool of the thread backend, made on first use.
+	_poolLock = threading.Lock()
+	
+	def __init__(self, func, bake = None, domain = None, bakeMin = 2 ** 20, backend = None) :
+		'''
+		A Transform from any one-argument function: a fast C++ function or :py:class:`~openlut.gamma.ParamCurve` (see
+		:py:mod:`~openlut.gamma`), an expression string or a Python function.
+		
+		Expressions, like :code:`"x > 0.04045 ? pow((x + 0.055) / 1.055, 2.4) : x / 12.92"`, are compiled once, then run in
+		fast C++ like the builtin functions. See :py:mod:`openlut.lib.expr` for the language.
+		
+		:param func: The function, or expression.
+		:param bake: Adaptive mode: an error tolerance. Big inputs are then applied through a cached 1D LUT, made with
+			:py:func:`~openlut.LUT.lutFit` to be within this tolerance of the function. None always evaluates the function.
+		:type bake: float or None
+		:param domain: The domain that the baked LUT covers; values outside it clip. None uses the input's finite min/max.
+		:type domain: tuple[float, float] or None
+		:param int bakeMin: Inputs with fewer values than this are always evaluated exactly.
+		:param backend: How Python functions run. 'thread' calls the function on whole chunks of the array, in a thread pool;
+			for numpy-vectorizable functions (ex. built from np.power & np.where), which release the GIL. 'process' calls it
+			per value, in one process per CPU. None picks 'thread' if the function maps a small probe array to an array of the
+			same shape, else 'process'. The probe is a real call of the function, once per Func, so give functions with side
+			effects an explicit backend; that skips the probe.
+		:type backend: str or None
+		:raises ValueError: When backend isn't in :py:data:`~openlut.Func.BACKENDS`, or the expression doesn't parse.
+		'''
+		if backend is not None and backend not in Func.BACKENDS :
+			raise ValueError('Backend must be one of: {}'.format(', '.join(Func.BACKENDS)))
+			
 		self.func = func
+		self.backend = backend
+		
+		self.bake = bake
+		self.domain = domain
+		self.bakeMin = bakeMin
+		
+		self._baked = None #Cache of (domain, LUT or None, if no LUT was accurate enough).
+		self._detected = None #The auto-detected backend.
+		self._lock = threading.Lock() #Guards the two above: Funcs are shared between threads, ex. by openlut.lib.aio.
+		self._native = Expr(func) if isinstance(func, str) else (func if isinstance(func, ParamCurve) else None) #Runs in C++, on whole arrays.
 		
 	#Func Methods
-	def __gamma(q, cpu, f, spSeq) :
-		q.put( (cpu, f(spSeq)) )
+	def __gamma(q, i, f, chunk) :
+		q.put( (i, f(chunk)) )
+	
+	def getBackend(self) :
+		'''
+		The backend Python functions run with: the one given, or else the auto-detected one. See :py:class:`~openlut.Func`.
+		'''
+		if self.backend is not None: return self.backend
+		
+		with self._lock :
+			if self._detected is None :
+				probe = np.linspace(0, 1, 7, dtype=np.float32)
+				try :
+					res = self.func(probe)
+					self._detected = 'thread' if isinstance(res, np.ndarray) and res.shape == probe.shape else 'process'
+				except Exception :
+					self._detected = 'process' #Ex. math functions, or branching on the value.
+					
+			return self._detected
+		
+	def _threadPool() :
+		'''
+		The thread pool of the thread backend, shared by all Funcs. It's separate from openlut.lib.aio's, which may be running the
+		very ColMap.apply that's waiting on it.
+		'''
+		with Func._poolLock :
+			if Func._pool is None :
+				from concurrent.futures import ThreadPoolExecutor
+				Func._pool = ThreadPoolExecutor(os.cpu_count() or 1)
+				
+			return Func._pool
+			
+	def _bakedLUT(self, fSeq) :
+		'''
+		Returns the cached LUT covering fSeq, baking one if needed. Returns None when no LUT is accurate enough.
+		'''
+		if self.domain is not None :
+			lo, hi = self.domain
+		else :
+			lo, hi = float(np.nanmin(fSeq)), float(np.nanmax(fSeq))
+			if not (np.isfinite(lo) and np.isfinite(hi)) or lo == hi: return None #Nothing sensible to bake over.
+			
+		#Threads sharing this Func bake once, and never see a half-updated cache.
+		with self._lock :
+			#Reuse the cached LUT when it covers the input. Otherwise, rebake over the union, so a sequence settles on one LUT.
+			if self._baked is not None :
+				(cLo, cHi), lut = self._baked
+				if cLo <= lo and hi <= cHi: return lut
+				if self.domain is None: lo, hi = min(lo, cLo), max(hi, cHi)
+				
+			#Bakes are cached on disk. Only LUTs that met the tolerance are.
+			def bake() :
+				lut, report = LUT.lutFit(Func(self.func), tol=self.bake, iRange=(lo, hi), title="Baked Func")
+				return lut if report['met'] else None
+				
+			self._baked = ((lo, hi), cache.cached('funcBake', (self.func, self.bake, lo, hi), bake))
+			
+			return self._baked[1]
 	
-	def sample(self, fSeq) :
-		fSeq = np.array(fSeq, dtype=np.float32) #Just some type assurances.
+	def sample(self, fSeq, planar = False, out = None) :
+		fSeq = Transform.workArray(fSeq) #Just some type assurances.
+		
+		#Adaptive mode: when the input is much bigger than a LUT, a LUT within tolerance is cheaper than the function.
+		if self.bake is not None and fSeq.size >= self.bakeMin :
+			lut = self._bakedLUT(fSeq)
+			if lut is not None: return lut.sample(fSeq, out=out)
 		
 		# Any float-returning C++ functions can be threaded with olo.gam(), but because of GIL, it won't work with Python functions.
 		if isinstance(self.func, types.BuiltinFunctionType) :
 			# \/ Just olo.gam, except fSeq is flattened to a 1D array, processed flat, then shaped back into a 3D array on the fly.
-			return olo.gam(fSeq.reshape(reduce(lambda a, b: a*b, fSeq.shape)), self.func).reshape(fSeq.shape) #OpenMP vectorized C++ motherfuckery!
+			return olo.gam(fSeq.reshape(reduce(lambda a, b: a*b, fSeq.shape)), self.func, Transform.outArray(out, fSeq)).reshape(fSeq.shape) #OpenMP vectorized C++ motherfuckery!
+		elif self._native is not None :
+			#Compiled expressions & parametric curves are evaluated in C++ too, without calling into Python at all.
+			return self._native(fSeq.reshape(fSeq.size), Transform.outArray(out, fSeq)).reshape(fSeq.shape)
+		elif self.getBackend() == 'thread' :
+			#numpy releases the GIL, so threads working through cache-sized chunks run the function concurrently.
+			res = Transform.outArray(out, fSeq, flat=False).reshape(fSeq.shape) if out is not None else np.empty(fSeq.shape, dtype=fSeq.dtype)
+			
+			def work(chunk, resChunk) :
+				resChunk[...] = self.func(chunk.astype(np.float32, copy=False))
+				
+			return chunks.run(work, fSeq, res, executor=Func._threadPool() if fSeq.size > 1 else None)
 		else :
 			#We always have the slow af fallback.
 			fVec = np.vectorize(self.func)
 			
-			out = []
+			if fSeq.ndim == 0 or len(fSeq) <= 1: return Transform.intoOut(fVec(fSeq), out)
+			
+			#One chunk per process. Each result is written into its chunk of the output.
+			plan = chunks.plan(fSeq.shape, fSeq.itemsize, parts=mp.cpu_count(), chunkBytes=0)
+			res = Transform.outArray(out, fSeq, flat=False).reshape(fSeq.shape) if out is not None else np.empty(fSeq.shape, dtype=fSeq.dtype)
+			
 			q = mp.Queue()
-			splt = Transform.spSeq(fSeq, mp.cpu_count())
-			for cpu in range(mp.cpu_count()) :
-				p = mp.Process(target=Func.__gamma, args=(q, cpu, fVec, splt[cpu]))
-				p.start()
-				
-			for num in range(len(splt)) :
-				out.append(q.get())
+			procs = [mp.Process(target=Func.__gamma, args=(q, i, fVec, fSeq[chunk])) for i, chunk in enumerate(plan)]
+			for proc in procs: proc.start()
+			
+			#Results are taken before joining: a process only exits once the queue has been drained of what it put.
+			for num in range(len(plan)) :
+				i, chunkRes = q.get()
+				res[plan[i]] = chunkRes
 				
-			return np.concatenate([seq[1] for seq in sorted(out, key=lambda seq: seq[0])], axis=0) if len(fSeq) > 1 else self.func(fSeq[0])
+			for proc in procs: proc.join()
+			
+			return res
 			
 			#~ return fVec(fSeq) if len(fSeq) > 1 else self.func(fSeq[0])
+			
+	def _dump(self, w) :
+		#The function goes by name where it can. The baked LUT isn't sent; it's cheaply rebaked where it's needed.
+		serial.dumpFunc(w, self.func)
+		w.optFloat(self.bake)
+		w.pack('?dd', self.domain is not None, *(self.domain if self.domain is not None else (0.0, 0.0)))
+		w.pack('Q', self.bakeMin)
+		w.str(self.backend if self.backend is not None else '')
+		
+	def _load(r) :
+		func = serial.loadFunc(r)
+		bake = r.optFloat()
+		hasDomain, lo, hi = r.unpack('?dd')
+		bakeMin, = r.unpack('Q')
+		backend = (r.str() or None) if r.version >= 2 else None
 		
+		return Func(func, bake=bake, domain=(lo, hi) if hasDomain else None, bakeMin=bakeMin, backend=backend)
+
+serial.register(Func, b'F')
@@ -4,62 +4,108 @@ import types
 
 import numpy as np
 
-#scipy is an optional dependency.
-MOD_SCIPY = False
-try :
-	from scipy.interpolate import splrep, splev
-	MOD_SCIPY = True
-except :
-	pass
-
 from .Transform import Transform
 from .lib import olOpt as olo
+from .lib import serial
+from .lib import cache
+from .lib import chunks
+from .lib.expr import Expr
+from .gamma import ParamCurve
+
+#scipy is an optional dependency. It's slow to import, so it's imported on first use; see LUT._interp.
+_scipyInterp = False
 
 class LUT(Transform) :
-	def __init__(self, dims = 1, size = 4096, title = "openlut_LUT", iRange = (0.0, 1.0)) :	
+	#: The default size of 1D & 3D LUTs, by dimensions.
+	SIZES = {1: 4096, 3: 33}
+	
+	#: The largest size of 3D LUTs: a 256 sized lattice is already 200MB.
+	MAX_3D = 256
+	
+	def __init__(self, dims = 1, size = None, title = "openlut_LUT", iRange = (0.0, 1.0), chans = 1) :	
 		'''
-		Create an identity LUT with given dimensions (1 or 3), size, and title.
+		Create an identity LUT with given dimensions (1 or 3), size, and title. The size defaults to :py:data:`SIZES` of the dimensions.
+		
+		1D LUTs may have 1 channel (one curve for r, g and b) or 3 channels (one curve per channel, stored as a (size, 3) array).
+		3D LUTs are stored as a (size, size, size, 3) array, indexed [r][g][b].
+		
+		:raises ValueError: When dims or chans aren't 1 or 3, iRange is empty or reversed, or a 3D LUT is bigger than :py:data:`MAX_3D`.
 		'''	
 		if dims != 1 and dims != 3: raise ValueError("Dimensions must be 1 or 3!")
+		if chans != 1 and chans != 3: raise ValueError("Channels must be 1 or 3!")
+		if not iRange[1] > iRange[0]: raise ValueError("iRange must run from low to high, not {}!".format(tuple(iRange))) #Lookups divide by its width.
+		
+		size = size if size is not None else LUT.SIZES[dims]
+		if dims == 3 and size > LUT.MAX_3D: raise ValueError("3D LUTs can't be bigger than {0} - a size {1} lattice is {2:.1f}GB!".format(LUT.MAX_3D, size, size ** 3 * 12 / 2 ** 30))
 		
 		self.title = title #The title.
 		self.size = size #The size. 1D LUTs: size numbers. 3D LUTs: size x size x size numbers.
 		self.range = iRange #The input range - creates data or legal LUTs. Should work fine, but untested.
 		self.dims = dims #The dimensions. 1 or 3; others aren't accepted.
+		self.chans = chans #The channels of a 1D LUT. 1 or 3; others aren't accepted.
 		self.ID = np.linspace(self.range[0], self.range[1], self.size, dtype=np.float32) #Read Only.
 		
 		if dims == 1 :
 			self.array = np.linspace(self.range[0], self.range[1], self.size, dtype=np.float32) #Size number of floats.
+			if chans == 3: self.array = np.repeat(self.array[:, np.newaxis], 3, axis=1) #Size triplets of floats.
 		elif dims == 3 :
-			print("3D LUT Not Implemented!")
-			#~ self.array = np.linspace(self.range[0], self.range[1], self.size**3).reshape(self.size, self.size, self.size) #Should make an identity size x size x size array.
+			self.chans = 3
+			self.array = np.stack(np.meshgrid(self.ID, self.ID, self.ID, indexing='ij'), axis=-1) #Identity size x size x size lattice of triplets.
 		
-	def lutFunc(func, size = 4096, dims = 1, title="openlut_FuncGen", iRange = (0.0, 1.0)) :
+	def lutFunc(func, size = None, dims = 1, title="openlut_FuncGen", iRange = (0.0, 1.0)) :
 		'''
-		Creates a LUT from a simple function.
+		Creates a LUT from a simple function, or an expression string (see :py:mod:`openlut.lib.expr`). Pass a sequence of three
+		functions to make a per-channel (r, g, b) LUT.
+		
+		3D LUTs are made from any Transform (or function of an (..., 3) array), sampled on the identity lattice. The size defaults
+		to :py:data:`~openlut.LUT.SIZES` of the dimensions: 4096 for 1D LUTs, 33 for 3D LUTs.
+		
+		3D LUTs, and 1D LUTs of Python functions, are cached on disk; see :py:mod:`openlut.lib.cache`.
 		'''
-		if dims == 1 :
-			lut = LUT(dims=dims, size=size, title=title, iRange=iRange)
+		size = size if size is not None else LUT.SIZES.get(dims, 0)
+		
+		funcs = func if isinstance(func, (tuple, list)) else (func,)
+		if dims == 3 or not all(isinstance(f, (types.BuiltinFunctionType, str, ParamCurve)) for f in funcs) :
+			return cache.cached('lutFunc', (func, size, dims, title, iRange), lambda: LUT._lutFunc(func, size, dims, title, iRange))
 			
-			#Use fast C++ function sampling if the function is a C++ function.
-			vFunc = lambda arr: olo.gam(arr, func) if isinstance(func, types.BuiltinFunctionType) else np.vectorize(func, otypes=[np.float32])(arr)
-			lut.array = vFunc(lut.array)
+		return LUT._lutFunc(func, size, dims, title, iRange)
+		
+	def _lutFunc(func, size, dims, title, iRange) :
+		'''
+		Uncached :py:func:`~openlut.LUT.lutFunc`.
+		'''
+		if dims == 1 :
+			if isinstance(func, (tuple, list)) :
+				lut = LUT(dims=dims, size=size, title=title, iRange=iRange, chans=3)
+				lut.array = np.stack([LUT._sampleFunc(f, lut.ID) for f in func], axis=1)
+			else :
+				lut = LUT(dims=dims, size=size, title=title, iRange=iRange)
+				lut.array = LUT._sampleFunc(func, lut.array)
 			
 			return lut
 		elif dims == 3 :
-			print("3D LUT Not Implemented!")
+			lut = LUT(dims=dims, size=size, title=title, iRange=iRange)
+			lattice = lut.array.reshape(size, size * size, 3) #Transforms handle images best, so sample the lattice as one.
+			lut.array = np.ascontiguousarray(func.sample(lattice) if isinstance(func, Transform) else func(lattice), dtype=np.float32).reshape(lut.array.shape)
+			
+			return lut
 			
 	def lutArray(array, title="Array_Generated") :
 		'''
 		Creates a LUT from a float array. Elements must be in range [0, 1].
+		
+		A (size, 3) array makes a per-channel 1D LUT. A (size, size, size, 3) array, indexed [r][g][b], makes a 3D LUT.
 		'''
-		if len(np.shape(array)) == 1 :
-			lut = LUT(dims=1, size=len(array), title=title)
-			lut.array = array
+		if len(np.shape(array)) == 1 or (len(np.shape(array)) == 2 and np.shape(array)[1] == 3) :
+			lut = LUT(dims=1, size=len(array), title=title, chans=1 if len(np.shape(array)) == 1 else 3)
+			lut.array = np.ascontiguousarray(array, dtype=np.float32)
+			
+			return lut
+		elif len(np.shape(array)) == 4 and np.shape(array)[:3] == (len(array),) * 3 and np.shape(array)[3] == 3 :
+			lut = LUT(dims=3, size=len(array), title=title)
+			lut.array = np.ascontiguousarray(array, dtype=np.float32)
 			
 			return lut
-		elif len(np.shape(array)) == 3 :
-			print("3D LUT Not Implemented!")
 		else :
 			raise ValueError("lutArray input must be 1D or 3D!")
 			
@@ -67,45 +113,143 @@ class LUT(Transform) :
 		'''
 		Creates a 1D LUT from a nonlinear mapping. Elements must be in range [0, 1].
 		'''
-		return LUT.lutArray(splev(np.linspace(0, 1, num=len(idArr)), splrep(idArr, mapArr)))
+		interp = LUT._interp()
+		if interp is None: raise ValueError("lutMapping needs scipy!")
+		
+		return LUT.lutArray(interp.splev(np.linspace(0, 1, num=len(idArr)), interp.splrep(idArr, mapArr)))
+		
+	def _interp() :
+		'''
+		Returns scipy.interpolate, importing it on first use - or None, when scipy isn't installed.
+		'''
+		global _scipyInterp
+		
+		if _scipyInterp is False :
+			try :
+				import scipy.interpolate as _scipyInterp
+			except ImportError :
+				_scipyInterp = None
+				
+		return _scipyInterp
+		
+	def _sampleFunc(func, arr) :
+		'''
+		Evaluates a Transform, C++ function, expression string or Python function over a flat float32 array. All but Python
+		functions run in fast C++.
+		'''
+		if isinstance(func, Transform) :
+			return np.asarray(func.sample(arr), dtype=np.float32)
+		elif isinstance(func, types.BuiltinFunctionType) :
+			return olo.gam(arr, func)
+		elif isinstance(func, str) :
+			return Expr(func)(arr)
+		elif isinstance(func, ParamCurve) :
+			return func(arr)
+		else :
+			return np.vectorize(func, otypes=[np.float32])(arr)
+			
+	def lutFit(func, tol = 1e-4, iRange = (0.0, 1.0), sizes = None, probes = 2 ** 18, title = "openlut_FitGen") :
+		'''
+		Creates the smallest 1D LUT whose linear interpolation error, against the exact function, is within tol.
+		
+		Bigger LUTs spill out of the L1/L2 caches and slow down every lookup, so don't just crank the size up "to be safe".
+		
+		:param func: The exact function. May be any 1D Transform (ex. a :py:class:`~openlut.Func`), C++ function or Python function.
+		:param float tol: The largest acceptable absolute error.
+		:param iRange: The domain of the LUT.
+		:type iRange: tuple[float, float]
+		:param sizes: The candidate LUT sizes. Powers of two from 16 to 65536 by default.
+		:param int probes: The number of evenly spaced points that the error is measured at.
+		:param str title: The title of the returned LUT.
+		:return: (lut, report). The report is a dict, with the list of candidates tried (their **size**, **maxErr**, **meanErr**
+			and **maxAt**, the input of the largest error), the chosen **size**, and whether tol was **met**. When no size meets
+			tol, the largest is returned. **nonFinite** counts the probes where func isn't finite; they're left out of the error.
+			Where func is finite but the LUT isn't (ex. next to a -inf point), the error is inf, so tol is never met.
+		:rtype: tuple[:py:class:`~openlut.LUT`, dict]
+		'''
+		sizes = sorted(sizes) if sizes is not None else [2 ** n for n in range(4, 17)]
+		
+		#The exact function is only evaluated once, over the probes. Non-finite outputs (ex. log of a negative) are ignored.
+		probe = np.linspace(iRange[0], iRange[1], probes, dtype=np.float32)
+		exact = LUT._sampleFunc(func, probe)
+		valid = np.isfinite(exact)
+		
+		report = {'tol': tol, 'candidates': [], 'size': None, 'met': False, 'nonFinite': int(probes - np.count_nonzero(valid))}
+		for size in sizes :
+			lut = LUT(dims=1, size=size, title=title, iRange=iRange)
+			lut.array = LUT._sampleFunc(func, lut.ID)
+			
+			#Probe with the linear C++ kernel - what will actually be used.
+			with np.errstate(invalid='ignore') :
+				err = np.abs(olo.lut1dlin(probe, lut.array, iRange[0], iRange[1]) - exact)
+			err[~valid] = 0.0
+			err[np.isnan(err)] = np.inf #Ex. inf - inf. NaN would compare false against tol, hiding the miss.
+			
+			report['candidates'].append({	'size'		: size,
+											'maxErr'	: float(np.max(err)),
+											'meanErr'	: float(np.sum(err) / max(np.count_nonzero(valid), 1)),
+											'maxAt'		: float(probe[np.argmax(err)])
+			})
+			report['size'] = size
+			
+			if report['candidates'][-1]['maxErr'] <= tol :
+				report['met'] = True
+				break
+				
+		return lut, report
 		
 #Transform Functions.
-	def _splInterp(q, cpu, spSeq, ID, array) :
-		q.put( (cpu, splev(spSeq, splrep(ID, array))) ) #Spline Interpolation. Pretty quick, considering.
+	def _splInterp(q, i, chunk, ID, array) :
+		interp = LUT._interp()
+		q.put( (i, interp.splev(chunk, interp.splrep(ID, array))) ) #Spline Interpolation. Pretty quick, considering.
 	
-	def sample(self, fSeq, spl=True) :
+	def sample(self, fSeq, spl=True, planar=False, out=None) :
 		'''
 		Apply the 1D LUT to the numpy image array, using fast C++ math.
 		
 		Latest Performance:
 			apply(ol.LUT): 0.026462205679908948,, (avg. 100 Trials) *sRGB LUT
 			
+		Per-channel LUTs need the last axis of the input array to be r, g, b; all three curves are applied in one pass.
+		With planar, it's the first axis instead, as in (3, height, width) arrays. Each curve then runs over a contiguous plane.
+		
+		With out, the result is written into that array, which may be fSeq itself. See :py:func:`~openlut.Transform.outArray`.
+			
 		:return: Returns a numpy array with identical shape to the input array.
 		'''
 				
-		fSeq = np.array(fSeq)
-		if self.dims == 1 :
+		fSeq = np.asarray(fSeq)
+		if self.dims == 1 and self.chans == 3 :
+			if fSeq.shape[Transform.rgbAxis(planar)] != 3: raise ValueError("Per-channel LUTs need an array whose {} axis is r, g, b!".format('first' if planar else 'last'))
+			
+			return olo.lut1dlin3(fSeq.reshape(fSeq.size), self.array.reshape(self.array.size), self.range[0], self.range[1], planar, Transform.outArray(out, fSeq)).reshape(fSeq.shape)
+			
+		elif self.dims == 1 :
 			
 			#Scipy must be loaded & the LUT must be rediculously small before spline interpolation sets in.
-			if (not MOD_SCIPY) or self.size > 25 :
-				return olo.lut1dlin(fSeq.reshape(reduce(lambda a, b: a*b, fSeq.shape)), self.array, self.range[0], self.range[1]).reshape(fSeq.shape)
+			if self.size > 25 or LUT._interp() is None :
+				return olo.lut1dlin(fSeq.reshape(reduce(lambda a, b: a*b, fSeq.shape)), self.array, self.range[0], self.range[1], Transform.outArray(out, fSeq)).reshape(fSeq.shape)
 				
 			else :
 				#~ return np.interp(spSeq, self.ID, self.array) #non-threaded way.
-				out = []
+				#One chunk per process. Each result is written into its chunk of the output.
+				plan = chunks.plan(fSeq.shape, fSeq.itemsize, parts=mp.cpu_count(), chunkBytes=0)
+				res = Transform.outArray(out, fSeq, flat=False).reshape(fSeq.shape) if out is not None else np.empty(fSeq.shape, dtype=np.float32)
+				
 				q = mp.Queue()
-				splt = Transform.spSeq(fSeq, mp.cpu_count())
-				for cpu in range(mp.cpu_count()) :
-					p = mp.Process(target=LUT._splInterp, args=(q, cpu, splt[cpu], self.ID, self.array))
-					p.start()
+				for i, chunk in enumerate(plan) :
+					mp.Process(target=LUT._splInterp, args=(q, i, fSeq[chunk], self.ID, self.array)).start()
 					
-				for num in range(len(splt)) :
-					out.append(q.get())
+				for num in range(len(plan)) :
+					i, chunkRes = q.get()
+					res[plan[i]] = chunkRes
 					
-				return np.concatenate([seq[1] for seq in sorted(out, key=lambda seq: seq[0])], axis=0)
+				return res
 			
 		elif self.dims == 3 :
-			print("3D LUT Not Implemented!")
+			if fSeq.shape[Transform.rgbAxis(planar)] != 3: raise ValueError("3D LUTs need an array whose {} axis is r, g, b!".format('first' if planar else 'last'))
+			
+			return olo.lut3dlin(fSeq.reshape(fSeq.size), self.array.reshape(self.array.size), self.size, self.range[0], self.range[1], planar, Transform.outArray(out, fSeq)).reshape(fSeq.shape)
 			
 #LUT Functions
 	def resized(self, newSize) :
@@ -114,25 +258,99 @@ class LUT(Transform) :
 		
 		1D LUTs: If the new size is lower, we use Linear interpolation. If the new size is higher, we use Spline interpolation.
 		* If the current size is too low, use spline regardless.
+		
+		The result is cached on disk; see :py:mod:`openlut.lib.cache`.
 		'''
 		if newSize == self.size: return self
-			
+		
+		return cache.cached('resized', (self, newSize), lambda: self._resized(newSize))
+		
+	def _resized(self, newSize) :
+		'''
+		Uncached :py:func:`~openlut.LUT.resized`.
+		'''
 		fac = newSize / self.size
 		
 		useSpl = self.size < newSize #If the new size is lower, we use Linear interpolation. If the new size is higher, we use Spline interpolation.
 		if self.size < 128: useSpl = True #If the current size is too low, use spline regardless.
 		
 		if self.dims == 1 :
-			newID = np.linspace(self.range[0], self.range[1], newSize)
+			newID = np.linspace(self.range[0], self.range[1], newSize, dtype=np.float32)
+			if self.chans == 3: newID = np.repeat(newID[:, np.newaxis], 3, axis=1) #Each channel samples its own curve.
+			
 			return LUT.lutArray(self.sample(newID, spl=useSpl), title="Resized to {0}".format(newSize))
 		if self.dims == 3 :
-			print("3D LUT Not Implemented")
+			newLUT = LUT(dims=3, size=newSize, title="Resized to {0}".format(newSize), iRange=self.range)
+			newLUT.array = self.sample(newLUT.array)
+			return newLUT
 			
-	def inverted(self) :
+	def inverted(self, newSize = None, iRange = None, cubic = False) :
+		'''
+		Return the inverse of a monotonic 1D LUT.
+		
+		The LUT values are searched with a vectorized binary search (np.searchsorted), then refined by linear or
+		monotonic cubic (Fritsch-Carlson) interpolation. Increasing and decreasing LUTs both work; flat or noisy
+		stretches are skipped rather than breaking the search.
+		
+		:param newSize: Size of the inverse LUT. Defaults to the size of this LUT.
+		:param iRange: Input range of the inverse LUT. Defaults to the input range of this LUT.
+		:param bool cubic: Use monotonic cubic refinement instead of linear.
+		:return: The inverse LUT. It's cached on disk; see :py:mod:`openlut.lib.cache`.
+		:raises ValueError: When the LUT is flat, and therefore can't be inverted.
+		'''
+		if self.dims != 1: raise ValueError("Only 1D LUTs can be inverted!")
+		
+		newSize = self.size if newSize is None else newSize
+		iRange = self.range if iRange is None else iRange
+		
+		return cache.cached('inverted', (self, newSize, tuple(iRange), cubic), lambda: self._inverted(newSize, iRange, cubic))
+		
+	def _inverted(self, newSize, iRange, cubic) :
+		'''
+		Uncached :py:func:`~openlut.LUT.inverted`.
+		'''
+		lut = LUT(dims=1, size=newSize, title="Inverse of {}".format(self.title), iRange=iRange, chans=self.chans)
+		if self.chans == 3 :
+			lut.array = np.stack([LUT._invMono(self.ID, self.array[:, c], lut.ID, cubic) for c in range(3)], axis=1).astype(np.float32)
+		else :
+			lut.array = LUT._invMono(self.ID, self.array, lut.ID, cubic).astype(np.float32)
+		
+		return lut
+		
+	def _invMono(x, y, q, cubic=False) :
 		'''
-		Return the inverse LUT.
+		Finds x at the values q of the monotonic mapping x --> y. Use inverted() instead.
 		'''
-		return LUT.lutArray(splev(np.linspace(self.range[0], self.range[1], num=self.size), splrep(self.array, np.linspace(self.range[0], self.range[1], num=self.size))))
+		x, y, q = np.asarray(x, dtype=np.float64), np.asarray(y, dtype=np.float64), np.asarray(q, dtype=np.float64)
+		if y[-1] < y[0]: x, y = x[::-1], y[::-1] #Searching needs increasing values.
+		
+		#Only keep samples that are strictly above everything before them. Flat & noisy stretches would break the search.
+		keep = np.concatenate(([True], y[1:] > np.maximum.accumulate(y)[:-1]))
+		x, y = x[keep], y[keep]
+		if len(y) < 2: raise ValueError("A flat LUT can't be inverted!")
+		
+		#Vectorized binary search for the segment containing each q. Values outside the LUT clamp to its ends.
+		i = np.clip(np.searchsorted(y, q, side='right') - 1, 0, len(y) - 2)
+		h = y[i + 1] - y[i]
+		t = np.clip((q - y[i]) / h, 0.0, 1.0)
+		
+		if not cubic :
+			return x[i] + t * (x[i + 1] - x[i])
+			
+		#Fritsch-Carlson slopes (dx/dy) keep the cubic monotonic - no overshoot between samples.
+		dY = np.diff(y)
+		delta = np.diff(x) / dY
+		m = np.empty_like(x)
+		m[0], m[-1] = delta[0], delta[-1]
+		
+		w1, w2 = 2 * dY[1:] + dY[:-1], dY[1:] + 2 * dY[:-1]
+		sameSign = delta[:-1] * delta[1:] > 0
+		with np.errstate(divide='ignore', invalid='ignore') :
+			m[1:-1] = np.where(sameSign, (w1 + w2) / (w1 / delta[:-1] + w2 / delta[1:]), 0.0)
+		
+		#Cubic Hermite basis.
+		t2, t3 = t * t, t * t * t
+		return (2*t3 - 3*t2 + 1) * x[i] + (t3 - 2*t2 + t) * h * m[i] + (3*t2 - 2*t3) * x[i + 1] + (t3 - t2) * h * m[i + 1]
 	
 #IO Functions.
 				
@@ -149,13 +367,14 @@ class LUT(Transform) :
 	def openCube(path) :
 		'''
 		Opens .cube files. They must be saved with whitespaces. Referenced by open().
+		
+		1D .cube files with differing r, g, b columns open as per-channel LUTs. 3D .cube files open as 3D LUTs.
 		'''
-		lut = LUT() #Mutable luts are not reccommended for users.
+		title, dims, size, iRange = "openlut_LUT", 1, None, (0.0, 1.0)
+		rows = []
 	
 		with open(path, 'r') as f :
-			i = 0
 			for line in f :
-				#~ if not line.strip(): continue
 				sLine = line.strip()
 				if not sLine: continue
 				
@@ -164,18 +383,33 @@ class LUT(Transform) :
 				index = sLine[:sLine.find(' ')]
 				data = sLine[sLine.find(' ') + 1:]
 				
-				if index == "TITLE": lut.title = data.strip('"'); continue
-				if index == "LUT_1D_SIZE": lut.dims = 1; lut.size = int(data); continue
-				if index == "LUT_3D_SIZE": lut.dims = 3; lut.size = int(data); continue
+				if index == "TITLE": title = data.strip('"'); continue
+				if index == "LUT_1D_SIZE": dims = 1; size = int(data); continue
+				if index == "LUT_3D_SIZE": dims = 3; size = int(data); continue
 				
-				if index == "LUT_1D_INPUT_RANGE": lut.range = (float(data[:data.find(' ')]), float(data[data.find(' ') + 1:])); continue
-								
-				if lut.dims == 1 and sLine[:sLine.find(' ')] :
-					lut.array[i] = float(sLine[:sLine.find(' ')])
-					i += 1
-				elif lut.dims == 3 :
-					print("3D LUT Not Implemened!")
+				if index in ("LUT_1D_INPUT_RANGE", "LUT_3D_INPUT_RANGE"): iRange = (float(data[:data.find(' ')]), float(data[data.find(' ') + 1:])); continue
 				
+				try :
+					rows.append([float(val) for val in sLine.split()[:3]])
+				except ValueError :
+					continue #Unknown keywords are skipped.
+				
+		array = np.array(rows, dtype=np.float32)
+		if size is not None and len(array) != size ** dims: raise ValueError("The .cube file has {} entries; expected {}!".format(len(array), size ** dims))
+		
+		if dims == 3 :
+			lut = LUT(dims=3, size=size, title=title, iRange=iRange)
+			lut.array = np.ascontiguousarray(array.reshape(size, size, size, 3).transpose(2, 1, 0, 3)) #.cube's red changes fastest; we index [r][g][b].
+			
+			return lut
+		
+		#Identical columns are stored as a single curve.
+		if array.shape[1] == 1 or (np.array_equal(array[:, 0], array[:, 1]) and np.array_equal(array[:, 0], array[:, 2])) :
+			array = array[:, 0]
+		
+		lut = LUT(dims=1, size=len(array), title=title, iRange=iRange, chans=1 if array.ndim == 1 else 3)
+		lut.array = np.ascontiguousarray(array)
+		
 		return lut
 		
 	def save(self, path) :
@@ -199,11 +433,17 @@ class LUT(Transform) :
 				print('LUT_1D_INPUT_RANGE', '{0:.6f} {1:.6f}'.format(*self.range), file=f)
 				print('# Created by openlut.\n', file=f)
 				
-				for itm in self.array :
-					entry = '{0:.6f}'.format(itm)
-					print(entry, entry, entry, file=f)
+				#Single curves are written to all three columns.
+				for itm in (self.array if self.chans == 3 else np.repeat(self.array[:, np.newaxis], 3, axis=1)) :
+					print('{0:.6f} {1:.6f} {2:.6f}'.format(*itm), file=f)
 			elif self.dims == 3 :
-				print("3D LUT Not Implemented!")
+				print('LUT_3D_SIZE', '{}'.format(self.size), file=f)
+				print('LUT_3D_INPUT_RANGE', '{0:.6f} {1:.6f}'.format(*self.range), file=f)
+				print('# Created by openlut.\n', file=f)
+				
+				#.cube's red changes fastest.
+				for itm in self.array.transpose(2, 1, 0, 3).reshape(-1, 3) :
+					print('{0:.6f} {1:.6f} {2:.6f}'.format(*itm), file=f)
 		
 #Overloaded functions
 	
@@ -217,5 +457,23 @@ class LUT(Transform) :
 	def __getitem__(self, key) :
 		return self.sample(key)
 		
+	def _dump(self, w) :
+		w.str(self.title)
+		w.pack('BBIdd', self.dims, self.chans, self.size, self.range[0], self.range[1])
+		w.array(self.array)
+		
+	def _load(r) :
+		#Skips __init__, which would make an identity array just to replace it.
+		lut = LUT.__new__(LUT)
+		lut.title = r.str()
+		lut.dims, lut.chans, lut.size, lo, hi = r.unpack('BBIdd')
+		lut.range = (lo, hi)
+		lut.ID = np.linspace(lo, hi, lut.size, dtype=np.float32)
+		lut.array = r.array()
+		
+		return lut
+		
 	def __repr__(self) :
 		return 'LUT(\tdims = {0},\n\tsize = {1},\n\ttitle = "{2}"\n\tarray = {3}\n)'.format(self.dims, self.size, self.title, '\n\t\t'.join([line.strip() for line in repr(self.array).split('\n')]))
+
+serial.register(LUT, b'L')
@@ -0,0 +1,164 @@
+import collections
+import os
+import queue
+
+import multiprocessing as mp
+
+from .ColMap import ColMap
+
+class RenderQueue :
+	'''
+	Renders a frame range through a Transform, sharded across local worker processes that are handed one frame at a time.
+
+	:param transform: The transform applied to every frame. It's pickled once per worker, and reused for each frame.
+	:type transform: :py:class:`~openlut.Transform`
+	:param str inPath: The input frames' path, with the frame number as a printf field (plate.%04d.exr) or a format field (plate.{:04d}.exr).
+	:param str outPath: The output frames' path, likewise.
+	:param workers: The number of worker processes. Set to the number of CPUs by default.
+	:type workers: int or None
+	:param threads: The OpenMP threads (OMP_NUM_THREADS) per worker. Set to the CPUs divided among the workers by default.
+	:type threads: int or None
+	:param int retries: How many times a failed frame is retried, before it's given up on.
+	:param progress: Called as progress(done, total, frame, error) after each frame, in this process. error is None on success.
+	:type progress: function or None
+
+	Each worker opens, applies & saves one frame at a time - with :py:func:`~openlut.ColMap.open`, :py:func:`~openlut.ColMap.apply`
+	and :py:func:`~openlut.ColMap.save` - then is handed the next, so slow frames don't hold up the rest. The Wand decodes & encodes
+	that serialize a single process run side by side, while each worker's C++ transforms get their share of the cores.
+
+	Workers are spawned, not forked, so they start without the parent's threads. Each has its own queue of tasks, and this process
+	tracks the frame it handed each one - so a worker that dies at any point is replaced, and its frame retried, never lost.
+
+	:raises ValueError: When there isn't at least one worker & thread.
+	:raises RuntimeError: From :py:func:`~openlut.RenderQueue.run`, when a worker can't even start, ex. as openlut fails to import.
+	'''
+	def __init__(self, transform, inPath, outPath, workers = None, threads = None, retries = 2, progress = None) :
+		cpus = os.cpu_count() or 1
+
+		self.transform = transform
+		self.inPath, self.outPath = inPath, outPath
+		self.workers = workers if workers is not None else cpus
+		self.threads = threads if threads is not None else max(1, cpus // self.workers)
+		self.retries = retries
+		self.progress = progress
+
+		if self.workers < 1 or self.threads < 1: raise ValueError('RenderQueues need at least one worker and thread!')
+
+	def framePath(path, frame) :
+		'''
+		The path of a frame, from a path with a printf or format style frame number field.
+		'''
+		return path % frame if '%' in path else path.format(frame)
+
+	def _work(wID, transform, inPath, outPath, tasks, results) :
+		'''
+		A worker process: renders the frames handed to it on its own tasks queue until it gets None, reporting to results.
+		'''
+		results.put(('ready', wID, None, None)) #openlut imported, and the transform unpickled.
+
+		frame = tasks.get()
+		while frame is not None :
+			try :
+				ColMap.open(RenderQueue.framePath(inPath, frame)).apply(transform).save(RenderQueue.framePath(outPath, frame))
+			except Exception as e :
+				results.put(('done', wID, frame, '{}: {}'.format(type(e).__name__, e)))
+			else :
+				results.put(('done', wID, frame, None))
+
+			frame = tasks.get()
+
+	def _spawn(self, ctx, wID, tasks, results) :
+		'''
+		Start a worker. OpenMP reads OMP_NUM_THREADS once, when the worker loads olOpt, so it's set in the environment it inherits.
+		'''
+		proc = ctx.Process(target=RenderQueue._work, args=(wID, self.transform, self.inPath, self.outPath, tasks, results), daemon=True)
+
+		old = os.environ.get('OMP_NUM_THREADS')
+		os.environ['OMP_NUM_THREADS'] = str(self.threads)
+		try :
+			proc.start()
+		finally :
+			if old is None :
+				del os.environ['OMP_NUM_THREADS']
+			else :
+				os.environ['OMP_NUM_THREADS'] = old
+
+		return proc
+
+	def run(self, frames) :
+		'''
+		Render the frames.
+
+		:param frames: The frame numbers, ex. range(1001, 1101).
+		:type frames: iterable of int
+		:return: A dictionary with **done**, the sorted list of rendered frames, and **failed**, mapping each frame given up on to its last error.
+		:rtype: dict
+		'''
+		frames = list(frames)
+
+		ctx = mp.get_context('spawn')
+		results = ctx.Queue()
+
+		#Every frame is always in exactly one place: pending, assigned to a worker, done or failed.
+		pending = collections.deque(frames)
+		assigned = dict() #Worker --> the frame it was handed.
+		attempts = dict.fromkeys(frames, 0)
+		done, failed = [], dict()
+
+		workers = dict() #Worker --> (process, its tasks queue).
+		ready = False #Whether any worker got as far as starting.
+
+		def start(wID) :
+			tasks = ctx.Queue() #A fresh queue, so nothing meant for a dead worker reaches its replacement.
+			workers[wID] = (self._spawn(ctx, wID, tasks, results), tasks)
+
+		def assign() :
+			for wID, (proc, tasks) in workers.items() :
+				if not pending: return
+				if wID not in assigned :
+					assigned[wID] = pending.popleft()
+					tasks.put(assigned[wID])
+
+		def finish(frame, error) :
+			if error is not None :
+				attempts[frame] += 1
+				if attempts[frame] <= self.retries :
+					pending.append(frame)
+					return
+				failed[frame] = error
+			else :
+				done.append(frame)
+
+			if self.progress is not None: self.progress(len(done) + len(failed), len(frames), frame, error)
+
+		for wID in range(min(self.workers, max(len(frames), 1))): start(wID)
+		assign()
+
+		try :
+			while len(done) + len(failed) < len(frames) :
+				try :
+					kind, wID, frame, error = results.get(timeout=0.5)
+				except queue.Empty :
+					#Replace dead workers. The frame each was handed counts as a failure.
+					for wID, (proc, tasks) in list(workers.items()) :
+						if proc.is_alive(): continue
+						if not ready: raise RuntimeError('A RenderQueue worker exited with code {} before it could start!'.format(proc.exitcode))
+
+						if wID in assigned: finish(assigned.pop(wID), 'The worker exited with code {}.'.format(proc.exitcode))
+						start(wID)
+				else :
+					ready = True
+
+					#Reports from a worker that was already given up on (ex. it died just after sending one) are stale.
+					if kind == 'done' and assigned.get(wID) == frame :
+						del assigned[wID]
+						finish(frame, error)
+
+				assign()
+		finally :
+			for proc, tasks in workers.values(): tasks.put(None)
+			for proc, tasks in workers.values() :
+				proc.join(timeout=5)
+				if proc.is_alive(): proc.terminate()
+
+		return {'done': sorted(done), 'failed': failed}
@@ -0,0 +1,92 @@
+import numpy as np
+
+from .Transform import Transform
+from .LUT import LUT
+from .lib import olOpt as olo
+from .lib import serial
+from .lib import cache
+
+class ShaperLUT(Transform) :
+	'''
+	A 1D shaper LUT in front of a 3D LUT, as used by .csp and .spi3d workflows.
+
+	:param shaper: The 1D shaper, with 1 or 3 channels. Maps the input (ex. scene-linear) into the cube's input range.
+	:type shaper: :py:class:`~openlut.LUT`
+	:param cube: The 3D LUT, whose input range should match the shaper's output range.
+	:type cube: :py:class:`~openlut.LUT`
+	:param str title: The title.
+
+	High dynamic range input wastes most of a cube's lattice; a log-like shaper spreads the lattice evenly over
+	the stops that matter. Both lookups happen per pixel in a single pass of :py:func:`~openlut.olOpt.lut3dshaper`.
+
+	:raises ValueError: When the shaper isn't a 1D LUT, or the cube isn't a 3D LUT.
+	'''
+	def __init__(self, shaper, cube, title = "openlut_ShaperLUT") :
+		if not isinstance(shaper, LUT) or shaper.dims != 1: raise ValueError("The shaper must be a 1D LUT!")
+		if not isinstance(cube, LUT) or cube.dims != 3: raise ValueError("The cube must be a 3D LUT!")
+
+		self.title = title
+		self.shaper = shaper
+		self.cube = cube
+
+	@staticmethod
+	def bake(transform, shaper, size = 33, title = "openlut_ShaperLUT") :
+		'''
+		Bake any Transform into a ShaperLUT, with the given shaper.
+
+		The cube spans the shaper's output range. Each lattice point is run backwards through the (inverted) shaper,
+		then through the transform.
+
+		:param transform: The Transform to bake. Must accept (..., 3) arrays.
+		:type transform: :py:class:`~openlut.Transform`
+		:param shaper: The 1D shaper. Must be monotonic, as it's inverted.
+		:type shaper: :py:class:`~openlut.LUT`
+		:param int size: The size of the cube.
+		:param str title: The title.
+		:return: A ShaperLUT approximating shaper, then cube == transform. It's cached on disk; see :py:mod:`openlut.lib.cache`.
+		:rtype: :py:class:`~openlut.ShaperLUT`
+		'''
+		return cache.cached('shaperBake', (transform, shaper, size, title), lambda: ShaperLUT._bake(transform, shaper, size, title))
+		
+	def _bake(transform, shaper, size, title) :
+		'''
+		Uncached :py:func:`~openlut.ShaperLUT.bake`.
+		'''
+		cRange = (float(np.min(shaper.array)), float(np.max(shaper.array)))
+
+		cube = LUT(dims=3, size=size, title=title, iRange=cRange)
+		lattice = shaper.inverted(iRange=cRange).sample(cube.array.reshape(size, size * size, 3)) #Sampled as an image.
+		cube.array = np.ascontiguousarray(transform.sample(lattice), dtype=np.float32).reshape(cube.array.shape)
+
+		return ShaperLUT(shaper, cube, title=title)
+
+	def sample(self, fSeq, planar = False, out = None) :
+		'''
+		Apply the shaper, then the cube, to the numpy image array, using fast C++ math.
+
+		:return: Returns a numpy array with identical shape to the input array, whose last axis must be r, g, b (the first, if planar).
+			Written into out, if given; see :py:func:`~openlut.Transform.outArray`.
+		'''
+		fSeq = Transform.workArray(fSeq)
+		if fSeq.shape[Transform.rgbAxis(planar)] != 3: raise ValueError("ShaperLUTs need an array whose {} axis is r, g, b!".format('first' if planar else 'last'))
+
+		return olo.lut3dshaper(	fSeq.reshape(fSeq.size),
+								self.shaper.array.reshape(self.shaper.array.size), self.shaper.chans, self.shaper.range[0], self.shaper.range[1],
+								self.cube.array.reshape(self.cube.array.size), self.cube.size, self.cube.range[0], self.cube.range[1],
+								planar,
+								Transform.outArray(out, fSeq)
+		).reshape(fSeq.shape)
+
+	def _dump(self, w) :
+		w.str(self.title)
+		w.node(self.shaper)
+		w.node(self.cube)
+
+	def _load(r) :
+		title = r.str()
+		return ShaperLUT(r.node(), r.node(), title)
+
+	def __repr__(self) :
+		return 'ShaperLUT(\n\ttitle = "{0}",\n\tshaper = {1},\n\tcube = {2}\n)'.format(self.title, repr(self.shaper), repr(self.cube))
+
+serial.register(ShaperLUT, b'S')
@@ -1,17 +1,119 @@
 import abc
+import inspect
 
 import numpy as np
 
+from .lib import serial
+from .lib import chunks
+
 class Transform :
+	_sampleParams = dict() #Class --> the keywords its sample method takes. See sampleParams.
+	
 	def spSeq(seq, outLen) :
 		"""
-		Utility function for splitting a sequence into equal parts, for multithreading.
+		Utility function for splitting a sequence into at most outLen balanced parts along its first axis, as views, for multithreading.
+		See :py:mod:`openlut.lib.chunks` for the scheduler behind it, which also tiles arrays of few rows & sizes chunks for the cache.
 		"""
-		perfSep = (1/outLen) * len(seq)
-		return list(filter(len, [seq[round(perfSep * i):round(perfSep * (i + 1))] for i in range(len(seq))])) if len(seq) > 1 else seq
+		seq = np.asarray(seq)
+		return chunks.views(seq, parts=outLen, chunkBytes=0, keepAxes=range(1, seq.ndim)) if len(seq) > 1 else seq
+		
+	def workArray(fSeq) :
+		"""
+		Utility function giving the numpy array that C++ functions work on: float16 arrays stay half floats, anything else becomes float32.
+		"""
+		fSeq = np.asarray(fSeq)
+		return fSeq if fSeq.dtype == np.float16 else fSeq.astype(np.float32, copy=False)
+		
+	def rgbAxis(planar) :
+		"""
+		Utility function giving the r, g, b axis of an image array: the first of planar, (3, height, width) arrays; otherwise the last.
+		"""
+		return 0 if planar else -1
+		
+	def outArray(out, fSeq, flat = True) :
+		"""
+		Utility function checking an out array for C++ functions to write into, instead of allocating: writable & C-contiguous, with
+		the size & storage type (float16, or else float32) of fSeq. Returns it flattened (unless not flat), or None when out is None.
+		"""
+		if out is None: return None
+		
+		dtype = np.float16 if np.asarray(fSeq).dtype == np.float16 else np.float32
+		if not (isinstance(out, np.ndarray) and out.dtype == dtype and out.flags.c_contiguous and out.flags.writeable and out.size == np.size(fSeq)) :
+			raise ValueError('out must be a writable, C-contiguous {} array the size of the input!'.format(np.dtype(dtype).name))
+			
+		return out.reshape(out.size) if flat else out
+		
+	def intoOut(res, out) :
+		"""
+		Utility function for sample methods without a C++ out: copies res into out, returning it. Returns res when out is None.
+		"""
+		if out is None: return res
+		
+		out.reshape(out.size)[:] = np.reshape(res, out.size)
+		return out
+		
+	def sampleParams(transform) :
+		"""
+		Utility function giving which of the planar & out keywords a Transform's sample method takes. Transforms written against
+		the plain sample(self, fSeq) take neither.
+		"""
+		cls = type(transform)
+		if cls not in Transform._sampleParams :
+			try :
+				params = inspect.signature(transform.sample).parameters
+			except (TypeError, ValueError) :
+				params = {}
+				
+			anyKw = any(param.kind == param.VAR_KEYWORD for param in params.values())
+			Transform._sampleParams[cls] = frozenset(name for name in ('planar', 'out') if anyKw or name in params)
+			
+		return Transform._sampleParams[cls]
+		
+	def sampleWith(transform, fSeq, planar = False, out = None) :
+		"""
+		Utility function sampling any Transform, with planar & out - even when its sample method doesn't take them. Planar arrays are
+		then given to it interleaved, and the result is copied into out. Returns the result, which is out if given.
+		"""
+		params = Transform.sampleParams(transform)
+		
+		if planar and 'planar' not in params :
+			res = np.moveaxis(np.asarray(transform.sample(np.ascontiguousarray(np.moveaxis(fSeq, 0, -1)))), -1, 0)
+			return Transform.intoOut(res, out) if out is not None else np.ascontiguousarray(res)
+			
+		kwargs = {'planar': True} if planar else {}
+		if out is not None and 'out' in params: return transform.sample(fSeq, out=out, **kwargs)
+		
+		return Transform.intoOut(transform.sample(fSeq, **kwargs), out)
+		
+	def dumps(self) :
+		"""
+		Serialize the Transform to a few bytes: a versioned header, parameters and raw array data. See :py:mod:`openlut.lib.serial`.
+		
+		:return: The serialized Transform. :py:func:`~openlut.Transform.loads` is the inverse.
+		:rtype: bytes
+		:raises ValueError: When the Transform (or a function it wraps, ex. a closure) can't be serialized.
+		"""
+		return serial.dumps(self)
+		
+	def loads(data) :
+		"""
+		Deserialize a Transform made by :py:func:`~openlut.Transform.dumps`, from bytes or any buffer. Arrays view writable
+		buffers (ex. shared memory) directly, instead of copying.
+		
+		:return: The Transform.
+		:rtype: :py:class:`~openlut.Transform`
+		"""
+		return serial.loads(data)
+		
+	def __reduce_ex__(self, protocol) :
+		#Pickling (ex. for multiprocessing) uses the compact serialization, where the Transform supports it.
+		if serial.serializable(self): return (serial.loads, (serial.dumps(self),))
+		return super().__reduce_ex__(protocol)
 		
 	@abc.abstractmethod
-	def sample(self, fSeq) :
+	def sample(self, fSeq, planar = False, out = None) :
 		"""
-		Samples the Transformation.
+		Samples the Transformation. With planar, the r, g, b axis of fSeq is the first, instead of the last.
+		
+		With out, results are written into that array instead of a new one. out may be fSeq itself, to transform in place.
 		"""
@@ -2,20 +2,60 @@
 from .Transform import Transform
 from .ColMap import ColMap
 from .LUT import LUT
+from .ShaperLUT import ShaperLUT
 from .Func import Func
 from .ColMat import ColMat
-from .Viewer import Viewer
+from .CurveMat import CurveMat
+from .CDL import CDL
+from .FrameStream import FrameStream
+from .RenderQueue import RenderQueue
 
 #Ensure the package namespace lines up.
 from . import gamma
 from . import gamut
 from .lib import olOpt
 
+class _Lazy :
+	'''
+	Stands in for a class whose module is slow to import, importing it on first use: calling it, or getting an attribute.
+	'''
+	def __init__(self, module, name) :
+		self._module = module
+		self._name = name
+		self._obj = None
+
+	def _load(self) :
+		if self._obj is None :
+			import importlib, sys
+			self._obj = getattr(importlib.import_module(self._module, __name__), self._name)
+
+			#Importing a submodule binds it as an attribute of the package - put the class back in its place.
+			setattr(sys.modules[__name__], self._name, self._obj)
+
+		return self._obj
+
+	def __call__(self, *args, **kwargs) :
+		return self._load()(*args, **kwargs)
+
+	def __getattr__(self, name) :
+		return getattr(self._load(), name)
+
+	def __repr__(self) :
+		return '<lazy {}{}.{}>'.format(__name__, self._module, self._name)
+
+#The Viewer pulls in pygame & OpenGL, which headless workers never need, so it's only imported on first use.
+Viewer = _Lazy('.Viewer', 'Viewer')
+
 __all__ = [	'ColMap',
 			'Transform',
 			'LUT',
+			'ShaperLUT',
 			'Func',
 			'ColMat',
+			'CurveMat',
+			'CDL',
+			'FrameStream',
+			'RenderQueue',
 			'Viewer',
 			'gamma',
 			'gamut',
@@ -33,6 +33,101 @@ sLog2 = olo.sLog2
 #: The lin --> DanLog gamma function. An alias for olOpt's fast fast :py:func:`~openlut.olOpt.DanLog`.
 DanLog = olo.DanLog
 
+class ParamCurve :
+	'''
+	A parametric transfer function, run natively by olOpt like the static gamma functions - so any camera's curve is fast, not
+	just the built in ones. Make one with :py:func:`power`, :py:func:`linPow` or :py:func:`log`; :py:func:`inv` gives its exact
+	inverse. Use it anywhere a gamma function goes (ex. :py:class:`~openlut.Func`, :py:func:`~openlut.LUT.lutFunc`).
+	
+	Curves go lin --> space, like the static functions. Call one on a number, or a numpy array of any shape.
+	'''
+	
+	#: The kinds of curves. They must match olOpt's.
+	POWER, LINPOW, LOG = 0, 1, 2
+	
+	#: The number of parameters of each kind.
+	NPARAMS = {POWER: 1, LINPOW: 6, LOG: 8}
+	
+	def __init__(self, kind, params, inverse = False) :
+		'''
+		:param int kind: :py:data:`POWER`, :py:data:`LINPOW` or :py:data:`LOG`.
+		:param params: The kind's parameters. See the constructor functions.
+		:param bool inverse: Whether this is the inverse, space --> lin, of the curve.
+		:raises ValueError: When the kind is unknown, or has a different number of parameters.
+		'''
+		if kind not in ParamCurve.NPARAMS or len(params) != ParamCurve.NPARAMS[kind] :
+			raise ValueError('A ParamCurve needs a known kind, and its number of parameters!')
+			
+		self.kind = kind
+		self.params = tuple(float(p) for p in params)
+		self.inverse = bool(inverse)
+		
+		self._params = np.array(self.params, dtype=np.float32)
+		
+	def power(p) :
+		'''
+		A pure power curve: :code:`x ** p`. Negative values are mirrored.
+		
+		:param float p: The exponent, ex. 1 / 2.2.
+		'''
+		return ParamCurve(ParamCurve.POWER, (p,))
+		
+	def linPow(power, scale, offset, brk, slope, linOffset = 0.0) :
+		'''
+		A power curve with a linear segment below a break point, like sRGB & Rec709:
+		:code:`scale * x ** power - offset if x >= brk else slope * x + linOffset`.
+		
+		ex. sRGB is :code:`ParamCurve.linPow(1 / 2.4, 1.055, 0.055, 0.0031308, 12.92)`.
+		'''
+		return ParamCurve(ParamCurve.LINPOW, (power, scale, offset, brk, slope, linOffset))
+		
+	def log(base, logSlope, logOffset, linSlope = 1.0, linOffset = 0.0, brk = -math.inf, toeSlope = 1.0, toeOffset = 0.0) :
+		'''
+		A log curve with an optional linear toe below a break point, like Cineon, LogC & S-Log:
+		:code:`logSlope * log(linSlope * x + linOffset, base) + logOffset if x > brk else toeSlope * x + toeOffset`.
+		
+		ex. S-Log is :code:`ParamCurve.log(10, 0.432699, 0.646596, 1, 0.037584)`. The default break of -inf has no toe.
+		'''
+		return ParamCurve(ParamCurve.LOG, (base, logSlope, logOffset, linSlope, linOffset, brk, toeSlope, toeOffset))
+		
+	def inv(self) :
+		'''
+		The exact inverse of this curve.
+		'''
+		return ParamCurve(self.kind, self.params, not self.inverse)
+		
+	def __call__(self, x, out = None) :
+		'''
+		Apply the curve to a number, or an array. float16 arrays stay float16; others are made float32.
+		
+		:param out: A flat array to write into, as in olOpt - which may be x.
+		'''
+		arr = np.asarray(x)
+		if arr.dtype not in (np.float16, np.float32): arr = arr.astype(np.float32)
+		
+		res = olo.curve(arr.reshape(arr.size), self.kind, self._params, self.inverse, out)
+		return float(res[0]) if arr.ndim == 0 else res.reshape(arr.shape)
+		
+	def __eq__(self, other) :
+		return isinstance(other, ParamCurve) and (self.kind, self.params, self.inverse) == (other.kind, other.params, other.inverse)
+		
+	def __hash__(self) :
+		return hash((self.kind, self.params, self.inverse))
+		
+	def __repr__(self) :
+		return 'ParamCurve({}, {}{})'.format(('POWER', 'LINPOW', 'LOG')[self.kind], self.params, ', inverse=True' if self.inverse else '')
+
+#Camera Curves, as ParamCurves.
+
+#: The lin --> ARRI LogC (v3, EI 800) gamma function. See http://www.arri.com/?eID=registration&file_uid=8026 .
+LogC = ParamCurve.log(10.0, 0.247190, 0.385537, 5.555556, 0.052272, brk=0.010591, toeSlope=5.367655, toeOffset=0.092809)
+
+#: The lin --> Sony S-Log3 gamma function. See the S-Log3 technical summary, above.
+sLog3 = ParamCurve.log(10.0, 261.5 / 1023, 420.0 / 1023, 1.0 / 0.19, 0.01 / 0.19, brk=0.01125, toeSlope=(171.2102946929 - 95.0) / (0.01125 * 1023), toeOffset=95.0 / 1023)
+
+#: The lin --> Cineon gamma function, with the usual black & white points of 95 and 685.
+Cineon = ParamCurve.log(10.0, 300.0 / 1023, 685.0 / 1023, 1.0 - 10 ** (-590 * 0.002 / 0.6), 10 ** (-590 * 0.002 / 0.6))
+
 class PGamma :
 	'''
 	Static class containing python versions of the C++ gamma functions.
@@ -0,0 +1,95 @@
+'''
+asyncio support: a library-managed thread pool that openlut's blocking work (Wand decodes/encodes, olOpt kernels) is offloaded to.
+
+olOpt kernels release the GIL while they run, so frames in flight on different threads really do overlap. Each of those
+threads runs OpenMP kernels of its own, so keep the worker count small.
+
+Works on Python 3.5.2 and up: 3.5.2 is where __aiter__ may return the iterator directly, as :py:class:`imap`'s does.
+'''
+
+import asyncio
+import collections
+import functools
+import os
+import threading
+
+from concurrent.futures import ThreadPoolExecutor
+
+_executor = None
+_maxWorkers = max(1, min(4, (os.cpu_count() or 1) // 2))
+_lock = threading.Lock()
+
+def maxWorkers() :
+	'''
+	The number of worker threads; the number of blocking openlut calls that may run at once.
+	'''
+	return _maxWorkers
+
+def setMaxWorkers(n) :
+	'''
+	Set the number of worker threads. The old pool finishes its queued work in the background.
+	'''
+	global _executor, _maxWorkers
+	
+	if n < 1: raise ValueError('There must be at least one worker!')
+	
+	with _lock :
+		old, _executor, _maxWorkers = _executor, None, n
+	
+	if old is not None: old.shutdown(wait=False)
+
+def getExecutor() :
+	'''
+	The shared ThreadPoolExecutor, created on first use.
+	'''
+	global _executor
+	
+	with _lock :
+		if _executor is None :
+			_executor = ThreadPoolExecutor(max_workers=_maxWorkers)
+		
+		return _executor
+
+def _loop() :
+	'''
+	The running event loop. get_running_loop is Python 3.7+; before, get_event_loop gives the running loop inside coroutines.
+	'''
+	return asyncio.get_running_loop() if hasattr(asyncio, 'get_running_loop') else asyncio.get_event_loop()
+
+async def run(func, *args, **kwargs) :
+	'''
+	Run func(*args, **kwargs) on the shared executor, without blocking the event loop.
+	'''
+	return await _loop().run_in_executor(getExecutor(), functools.partial(func, *args, **kwargs))
+
+class imap :
+	'''
+	Async iterator over func(item) for each item, in order. Calls run on the shared executor, with at most prefetch in flight.
+	
+	A class, since Python 3.5 lacks async generators.
+	'''
+	def __init__(self, func, items, prefetch = None) :
+		self.func = func
+		self.items = iter(items)
+		self.prefetch = prefetch if prefetch is not None else _maxWorkers
+		
+		self._pending = collections.deque()
+	
+	def __aiter__(self) :
+		return self
+	
+	async def __anext__(self) :
+		loop = _loop()
+		
+		#Top up the pipeline, then hand out the oldest result.
+		while len(self._pending) < self.prefetch :
+			try :
+				item = next(self.items)
+			except StopIteration :
+				break
+			
+			self._pending.append(loop.run_in_executor(getExecutor(), self.func, item))
+		
+		if not self._pending: raise StopAsyncIteration
+		
+		return await self._pending.popleft()
@@ -0,0 +1,272 @@
+'''
+A content-addressed on-disk cache of derived Transforms - inversions, resizes and bakes - shared by every process on the machine.
+
+Each result is stored under the sha256 of what made it: the operation's name, and its inputs. Transforms are hashed by
+their serialization (arrays, matrices, sizes, ranges; see :py:mod:`openlut.lib.serial`), functions by their olOpt name, or their
+bytecode together with every global they read (recursively, so editing a constant, helper function, or an attribute of one of
+your own modules makes a new entry), and
+parametric curves by their parameters. Functions with closures, or anything else that can't be hashed, are never cached.
+
+Entries are written to a temporary file, then renamed into place, so readers in other processes never see half an entry.
+When the cache grows past its size limit, the least recently used entries are deleted.
+
+The cache lives in $OPENLUT_CACHE_DIR, or ~/.cache/openlut. Setting OPENLUT_CACHE_DIR to '' turns it off.
+'''
+
+import hashlib
+import os
+import struct
+import sys
+import sysconfig
+import tempfile
+import types
+
+import numpy as np
+
+from . import olOpt as olo
+from . import serial
+from ..gamma import ParamCurve
+
+_dir = os.environ.get('OPENLUT_CACHE_DIR', os.path.join(os.environ.get('XDG_CACHE_HOME', os.path.expanduser(os.path.join('~', '.cache'))), 'openlut'))
+_maxSize = int(os.environ.get('OPENLUT_CACHE_SIZE', 256 * 2 ** 20))
+_size = None #The cache's size as of the last evict(), plus this process' puts since. None until the first put.
+
+SUFFIX = '.oltf'
+
+def cacheDir() :
+	'''
+	The cache directory, or None when caching is off.
+	'''
+	return _dir if _dir else None
+
+def setCacheDir(path) :
+	'''
+	Set the cache directory. None turns caching off.
+	'''
+	global _dir, _size
+	_dir = path
+	_size = None
+
+def maxSize() :
+	'''
+	The size limit of the cache, in bytes.
+	'''
+	return _maxSize
+
+def setMaxSize(n) :
+	'''
+	Set the size limit of the cache, in bytes. It's enforced on the next write.
+	'''
+	global _maxSize
+
+	if n < 0: raise ValueError('The cache size limit can\'t be negative!')
+	_maxSize = n
+
+def _globalNames(code) :
+	'''
+	The names a code object may read as globals, including in the functions & comprehensions nested in it.
+	'''
+	names = set(code.co_names)
+	for const in code.co_consts :
+		if isinstance(const, types.CodeType): names |= _globalNames(const)
+		
+	return names
+
+#Modules from these directories - the standard library, installed packages & openlut itself - only change when they're
+#upgraded, so they're hashed by name. Others, ex. a project's config module, are hashed by the attributes that are read.
+_libPaths = tuple(sorted({os.path.abspath(p) + os.sep for p in [sysconfig.get_paths().get(k) for k in ('stdlib', 'platstdlib', 'purelib', 'platlib')] + [os.path.dirname(os.path.dirname(__file__))] if p}))
+
+def _isLibrary(module) :
+	'''
+	True if a module is part of Python, an installed package or openlut.
+	'''
+	path = getattr(module, '__file__', None)
+	if path is None: return module.__name__ in sys.builtin_module_names
+	
+	return os.path.abspath(path).startswith(_libPaths)
+
+def _hashGlobal(h, value, names, seen) :
+	'''
+	Feed a global a function reads to the hash. Of modules that aren't libraries, the attributes among names are hashed too.
+	'''
+	if not isinstance(value, types.ModuleType) :
+		_hashPart(h, value, seen)
+		return
+		
+	_hashPart(h, ('module', value.__name__), seen)
+	if _isLibrary(value) or id(value) in seen: return
+	
+	seen.add(id(value))
+	attrs = vars(value)
+	for name in sorted(names) :
+		if name not in attrs: continue
+		
+		h.update(b'G' + name.encode('utf-8'))
+		_hashGlobal(h, attrs[name], names, seen)
+
+def _hashPart(h, part, seen = None) :
+	'''
+	Feed one input to the hash. Raises ValueError when it can't be hashed.
+	'''
+	seen = seen if seen is not None else set()
+	
+	if part is None :
+		h.update(b'N')
+	elif serial.serializable(part) :
+		data = serial.dumps(part, exact=True)
+		h.update(b'T' + struct.pack('<Q', len(data)) + data)
+	elif isinstance(part, types.FunctionType) and id(part) in seen :
+		h.update(b'R') #Recursion.
+	elif isinstance(part, types.BuiltinFunctionType) and getattr(olo, part.__name__, None) is not part :
+		#Other C functions (ex. math.exp) go by name; their behavior doesn't change between runs.
+		_hashPart(h, ('builtin', str(part.__module__), part.__qualname__), seen)
+	elif isinstance(part, np.ufunc) :
+		_hashPart(h, ('ufunc', part.__name__), seen)
+	elif isinstance(part, (types.BuiltinFunctionType, types.FunctionType, ParamCurve)) :
+		w = serial.Writer(exact=True)
+		serial.dumpFunc(w, part)
+		h.update(b'F' + struct.pack('<Q', w.size) + b''.join(w.chunks))
+		
+		#The bytecode doesn't say what the globals it reads hold. Hash those too, so editing them can't give stale results.
+		if isinstance(part, types.FunctionType) :
+			seen.add(id(part))
+			names = _globalNames(part.__code__) #Attribute names too, ex. K of cfg.K.
+			for name in sorted(names) :
+				if name not in part.__globals__: continue #Builtins, or attribute names.
+				
+				h.update(b'G' + name.encode('utf-8'))
+				_hashGlobal(h, part.__globals__[name], names, seen)
+	elif isinstance(part, np.ndarray) and part.dtype.kind in 'biuf' :
+		data = np.ascontiguousarray(part).tobytes()
+		h.update(b'A' + '{}{}'.format(part.dtype.str, part.shape).encode('utf-8') + struct.pack('<Q', len(data)) + data)
+	elif isinstance(part, (tuple, list)) :
+		h.update(b'(' + struct.pack('<Q', len(part)))
+		for p in part: _hashPart(h, p, seen)
+	elif isinstance(part, (bool, int, float, str)) :
+		data = '{}:{!r}'.format(type(part).__name__, part).encode('utf-8')
+		h.update(b'V' + struct.pack('<Q', len(data)) + data)
+	else :
+		raise ValueError('{} values can\'t be hashed!'.format(type(part).__name__))
+
+def key(op, *parts) :
+	'''
+	The cache key of an operation on some inputs: Transforms, functions, numbers, strings, None, and tuples of them.
+
+	:return: The key, as a hex string - or None, when an input can't be hashed.
+	'''
+	h = hashlib.sha256('openlut {} {}'.format(serial.VERSION, op).encode('utf-8'))
+	try :
+		for part in parts: _hashPart(h, part)
+	except ValueError :
+		return None
+
+	return h.hexdigest()
+
+def _path(k) :
+	return os.path.join(_dir, k[:2], k + SUFFIX)
+
+def get(k) :
+	'''
+	The cached Transform, or None on a miss. A hit counts as a use, for eviction.
+	'''
+	if not _dir or k is None: return None
+
+	path = _path(k)
+	try :
+		with open(path, 'rb') as f :
+			data = bytearray(os.fstat(f.fileno()).st_size) #Writable, so arrays are loaded without another copy.
+			f.readinto(data)
+		os.utime(path)
+	except OSError :
+		return None
+
+	try :
+		return serial.loads(data)
+	except Exception :
+		#Damaged (or from an incompatible version): drop it, and it'll be remade.
+		try :
+			os.remove(path)
+		except OSError :
+			pass
+		return None
+
+def put(k, transform) :
+	'''
+	Store a Transform, then evict the least recently used entries past the size limit. Failures (ex. a read-only disk) are ignored.
+
+	The cache is only walked when the running size passes the limit, not on every put. Entries from other processes are counted then.
+	'''
+	global _size
+
+	if not _dir or k is None or not serial.serializable(transform): return
+
+	try :
+		data = serial.dumps(transform)
+	except ValueError :
+		return
+
+	path = _path(k)
+	try :
+		os.makedirs(os.path.dirname(path), exist_ok=True)
+
+		fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+		try :
+			with os.fdopen(fd, 'wb') as f: f.write(data)
+			os.replace(tmp, path) #Atomic: other processes see the whole entry, or none of it.
+		except BaseException :
+			os.remove(tmp)
+			raise
+	except OSError :
+		return
+
+	if _size is not None: _size += len(data)
+	if _size is None or _size > _maxSize: evict()
+
+def evict(limit = None) :
+	'''
+	Delete the least recently used entries until the cache fits in limit bytes (by default, :py:func:`maxSize`).
+	'''
+	global _size
+
+	if not _dir: return
+	limit = _maxSize if limit is None else limit
+
+	entries = []
+	for root, dirs, files in os.walk(_dir) :
+		for name in files :
+			if not name.endswith(SUFFIX): continue
+			try :
+				st = os.stat(os.path.join(root, name))
+			except OSError :
+				continue #Evicted by another process.
+			entries.append((st.st_mtime, st.st_size, os.path.join(root, name)))
+
+	total = sum(size for mtime, size, path in entries)
+	for mtime, size, path in sorted(entries) :
+		if total <= limit: break
+		try :
+			os.remove(path)
+		except OSError :
+			pass
+		total -= size
+
+	_size = total
+
+def cached(op, parts, make) :
+	'''
+	Return the cached result of an operation on parts, or make() it and cache that.
+
+	:param str op: The operation's name. Different operations on the same inputs must use different names.
+	:param tuple parts: Every input that the result depends on. See :py:func:`key`.
+	:param make: Makes the result, a Transform, on a miss. Results of None aren't cached.
+	:type make: function
+	'''
+	if not _dir: return make()
+
+	k = key(op, *parts)
+	res = get(k)
+	if res is None :
+		res = make()
+		if res is not None: put(k, res)
+
+	return res
@@ -0,0 +1,113 @@
+'''
+A chunk scheduler: splits arrays of any rank into balanced, cache-sized blocks, for any executor to work through.
+
+Chunks are index tuples (of slices), so the same chunk indexes the input, and the output it's written to. Indexing gives views;
+nothing is copied. They're picklable, so process pools may use them too.
+
+Outer axes are split first, so chunks are runs of whole rows - contiguous in C-ordered arrays - as far as possible. Only when
+there are fewer rows than chunks needed (ex. a 3 row image on 16 cores) are the next axes split too, into tiles.
+'''
+
+import math
+import os
+
+_l2 = None
+
+def l2Bytes() :
+	'''
+	The size of a core's L2 cache, in bytes. Read once, from sysconf or sysfs; 1MB if neither knows. $OPENLUT_L2_BYTES overrides it.
+	'''
+	global _l2
+
+	if _l2 is None :
+		size = int(os.environ.get('OPENLUT_L2_BYTES', 0))
+
+		if not size :
+			try :
+				size = os.sysconf('SC_LEVEL2_CACHE_SIZE')
+			except (ValueError, OSError, AttributeError) :
+				size = 0
+
+		if size <= 0 :
+			try :
+				with open('/sys/devices/system/cpu/cpu0/cache/index2/size') as f :
+					text = f.read().strip().upper()
+				size = int(text.rstrip('KMG')) * {'K': 2 ** 10, 'M': 2 ** 20, 'G': 2 ** 30}.get(text[-1], 1)
+			except (OSError, ValueError, IndexError) :
+				size = 0
+
+		_l2 = size if size > 0 else 2 ** 20
+
+	return _l2
+
+def _bounds(n, parts) :
+	'''
+	parts + 1 balanced boundaries over range(n).
+	'''
+	return [n * i // parts for i in range(parts + 1)]
+
+def plan(shape, itemSize = 4, parts = None, chunkBytes = None, keepAxes = ()) :
+	'''
+	Plan the chunks of an array.
+
+	:param shape: The array's shape.
+	:param int itemSize: The bytes per element.
+	:param parts: The least number of chunks, so that every worker gets some. Set to the number of CPUs by default.
+	:type parts: int or None
+	:param chunkBytes: The bytes per chunk to aim for; chunks are whole slices of the split axes, so they may be up to one
+		slice bigger. Set to half of :py:func:`l2Bytes` by default, leaving the other half to the output. 0 doesn't limit the
+		chunk size; then there are just parts chunks.
+	:type chunkBytes: int or None
+	:param keepAxes: Axes that are never split, ex. the r, g, b axis for transforms that need whole pixels.
+	:return: The chunks, as tuples of slices, in C order. Their sizes differ by at most one element along each split axis.
+	:rtype: list[tuple[slice]]
+	'''
+	parts = parts if parts is not None else (os.cpu_count() or 1)
+	chunkBytes = chunkBytes if chunkBytes is not None else l2Bytes() // 2
+
+	size = 1
+	for n in shape: size *= n
+	if size == 0 or len(shape) == 0: return [tuple(slice(0, n) for n in shape)]
+
+	#The number of chunks wanted: enough for each worker, and small enough for the cache. Rounded up to a multiple of parts, for balance.
+	want = parts
+	if chunkBytes > 0: want = max(want, parts * math.ceil(size * itemSize / (chunkBytes * parts)))
+
+	#Split the outer axes first, until there are enough chunks.
+	splits = [1] * len(shape)
+	for axis, n in enumerate(shape) :
+		if want <= 1: break
+		if axis in keepAxes or (axis - len(shape)) in keepAxes: continue
+
+		splits[axis] = min(n, want)
+		want = math.ceil(want / splits[axis])
+
+	chunks = [()]
+	for n, split in zip(shape, splits) :
+		bounds = _bounds(n, split)
+		chunks = [chunk + (slice(bounds[i], bounds[i + 1]),) for chunk in chunks for i in range(split)]
+
+	return chunks
+
+def views(arr, parts = None, chunkBytes = None, keepAxes = ()) :
+	'''
+	The chunks of an array, as views. See :py:func:`plan`.
+	'''
+	return [arr[chunk] for chunk in plan(arr.shape, arr.itemsize, parts, chunkBytes, keepAxes)]
+
+def run(func, arr, out, executor = None, parts = None, chunkBytes = None, keepAxes = ()) :
+	'''
+	Call func(arr[chunk], out[chunk]) for every chunk, on an executor - ex. a :py:class:`concurrent.futures.ThreadPoolExecutor` -
+	or serially when executor is None. func writes its chunk of output into the view it's given. See :py:func:`plan`.
+
+	:return: out.
+	'''
+	chunks = plan(arr.shape, arr.itemsize, parts, chunkBytes, keepAxes)
+
+	if executor is None :
+		for chunk in chunks: func(arr[chunk], out[chunk])
+	else :
+		for future in [executor.submit(func, arr[chunk], out[chunk]) for chunk in chunks] :
+			future.result() #Raises the first error.
+
+	return out
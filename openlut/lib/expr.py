@@ -0,0 +1,252 @@
+'''
+A small expression language for 1D curves, compiled to register bytecode that olOpt evaluates natively, in parallel.
+
+Expressions are of one variable, x, ex. :code:`x > 0.04045 ? pow((x + 0.055) / 1.055, 2.4) : x / 12.92`. They have:
+
+* Numbers (1, 0.5, 1e-3), x, and the constants pi & e.
+* Arithmetic: + - * / % (fmod), and ^ or ** (power, right associative, binding tighter than unary minus).
+* Comparisons: < <= > >= == !=, which give 1 or 0. Logic: && || !, where any nonzero value is true.
+* The conditional c ? a : b. Both sides are evaluated; just one is kept.
+* Functions: pow, min, max, fmod, clamp(x, lo, hi), mix(a, b, t), exp, log, log2, log10, sqrt, abs, floor, ceil, sin, cos, tan.
+
+All math is in 32 bit floats. Constant subexpressions are folded while compiling. The bytecode is an (n, 5) int32 array of
+instructions (op, dst, a, b, c) - see OPS - over registers that each hold a block of values; register 0 is x. Constants are
+loaded by index (a) from a float32 array.
+'''
+
+import re
+
+import numpy as np
+
+from . import olOpt as olo
+
+#: The opcodes: name --> (code, arity, numpy equivalent). The codes must match olOpt's.
+OPS = {	'const'	: (0, 0, None),
+		'add'	: (1, 2, np.add),
+		'sub'	: (2, 2, np.subtract),
+		'mul'	: (3, 2, np.multiply),
+		'div'	: (4, 2, np.divide),
+		'pow'	: (5, 2, np.power),
+		'min'	: (6, 2, np.fmin),
+		'max'	: (7, 2, np.fmax),
+		'fmod'	: (8, 2, np.fmod),
+		'lt'	: (9, 2, lambda a, b: (a < b).astype(np.float32)),
+		'le'	: (10, 2, lambda a, b: (a <= b).astype(np.float32)),
+		'gt'	: (11, 2, lambda a, b: (a > b).astype(np.float32)),
+		'ge'	: (12, 2, lambda a, b: (a >= b).astype(np.float32)),
+		'eq'	: (13, 2, lambda a, b: (a == b).astype(np.float32)),
+		'ne'	: (14, 2, lambda a, b: (a != b).astype(np.float32)),
+		'and'	: (15, 2, lambda a, b: ((a != 0) & (b != 0)).astype(np.float32)),
+		'or'	: (16, 2, lambda a, b: ((a != 0) | (b != 0)).astype(np.float32)),
+		'sel'	: (17, 3, lambda c, a, b: np.where(c != 0, a, b)),
+		'neg'	: (18, 1, np.negative),
+		'not'	: (19, 1, lambda a: (a == 0).astype(np.float32)),
+		'exp'	: (20, 1, np.exp),
+		'log'	: (21, 1, np.log),
+		'log2'	: (22, 1, np.log2),
+		'log10'	: (23, 1, np.log10),
+		'sqrt'	: (24, 1, np.sqrt),
+		'abs'	: (25, 1, np.abs),
+		'floor'	: (26, 1, np.floor),
+		'ceil'	: (27, 1, np.ceil),
+		'sin'	: (28, 1, np.sin),
+		'cos'	: (29, 1, np.cos),
+		'tan'	: (30, 1, np.tan)
+}
+
+_ARITY = {code: arity for code, arity, f in OPS.values()}
+_NUMPY = {code: f for code, arity, f in OPS.values()}
+
+FUNCS = {name for name, (code, arity, f) in OPS.items() if name not in ('const', 'add', 'sub', 'mul', 'div', 'lt', 'le', 'gt', 'ge', 'eq', 'ne', 'and', 'or', 'sel', 'neg', 'not')}
+CONSTS = {'pi': np.pi, 'e': np.e}
+
+_BINARY = {	'||': 'or', '&&': 'and',
+			'<': 'lt', '<=': 'le', '>': 'gt', '>=': 'ge', '==': 'eq', '!=': 'ne',
+			'+': 'add', '-': 'sub', '*': 'mul', '/': 'div', '%': 'fmod', '^': 'pow', '**': 'pow'
+}
+
+_TOKEN = re.compile(r'\s*(?:(\d+\.?\d*(?:[eE][-+]?\d+)?|\.\d+(?:[eE][-+]?\d+)?)|([A-Za-z_]\w*)|(\*\*|<=|>=|==|!=|&&|\|\||[-+*/%^<>!?:(),]))')
+
+class Expr :
+	'''
+	A compiled expression. Call it on an array, like a function.
+
+	:param str src: The expression. See :py:mod:`openlut.lib.expr`.
+	:raises ValueError: When the expression doesn't parse.
+	'''
+	def __init__(self, src) :
+		self.src = src
+
+		self._tokens = Expr._tokenize(src)
+		self._pos = 0
+		tree = self._ternary()
+		if self._pos != len(self._tokens): self._fail('Unexpected {!r}'.format(self._tokens[self._pos][1]))
+		del self._tokens
+
+		#Compile the tree to instructions, reusing registers as soon as they're free.
+		self._code, self._consts, self._free, self.nRegs = [], [], [], 1
+		self.result = self._emit(tree)
+		if self.result == 0: #Just x. Copy it, so the result register isn't the input.
+			self.result = self._emitOp('add', [0, self._emit(('num', 0.0))])
+
+		self.code = np.array(self._code, dtype=np.int32).reshape(-1, 5)
+		self.consts = np.array(self._consts + [0.0], dtype=np.float32)
+		del self._code, self._consts, self._free
+
+	def _tokenize(src) :
+		tokens, pos = [], 0
+		src = src.rstrip()
+		while pos < len(src) :
+			match = _TOKEN.match(src, pos)
+			if not match: raise ValueError('Bad expression {!r}: unexpected {!r}'.format(src, src[pos:].strip()[:10]))
+
+			num, name, op = match.groups()
+			tokens.append(('num', float(num)) if num is not None else (('name', name) if name is not None else ('op', op)))
+			pos = match.end()
+
+		return tokens
+
+	def _fail(self, msg) :
+		raise ValueError('Bad expression {!r}: {}'.format(self.src, msg))
+
+	def _peek(self) :
+		return self._tokens[self._pos] if self._pos < len(self._tokens) else (None, None)
+
+	def _accept(self, *ops) :
+		kind, val = self._peek()
+		if kind == 'op' and val in ops :
+			self._pos += 1
+			return val
+		return None
+
+	def _expect(self, op) :
+		if self._accept(op) is None: self._fail('Expected {!r}'.format(op))
+
+	#Recursive descent, loosest binding first. Nodes are ('num', val), ('x',) and (op, *args).
+	def _ternary(self) :
+		cond = self._binary(0)
+		if self._accept('?') is None: return cond
+
+		a = self._ternary()
+		self._expect(':')
+		return ('sel', cond, a, self._ternary())
+
+	_LEVELS = (('||',), ('&&',), ('<', '<=', '>', '>=', '==', '!='), ('+', '-'), ('*', '/', '%'))
+
+	def _binary(self, level) :
+		if level == len(Expr._LEVELS): return self._unary()
+
+		node = self._binary(level + 1)
+		op = self._accept(*Expr._LEVELS[level])
+		while op is not None :
+			node = (_BINARY[op], node, self._binary(level + 1))
+			op = self._accept(*Expr._LEVELS[level])
+
+		return node
+
+	def _unary(self) :
+		op = self._accept('-', '+', '!')
+		if op == '-': return ('neg', self._unary())
+		if op == '!': return ('not', self._unary())
+		if op == '+': return self._unary()
+
+		base = self._atom()
+		if self._accept('^', '**') is not None: return ('pow', base, self._unary()) #Right associative.
+		return base
+
+	def _atom(self) :
+		kind, val = self._peek()
+		self._pos += 1
+
+		if kind == 'num': return ('num', val)
+		if kind == 'op' and val == '(' :
+			node = self._ternary()
+			self._expect(')')
+			return node
+
+		if kind == 'name' :
+			if val == 'x': return ('x',)
+			if val in CONSTS: return ('num', CONSTS[val])
+			if val not in FUNCS and val not in ('clamp', 'mix'): self._fail('Unknown name {!r}'.format(val))
+
+			self._expect('(')
+			args = [self._ternary()]
+			while self._accept(',') is not None: args.append(self._ternary())
+			self._expect(')')
+
+			#clamp & mix are written in terms of the other ops.
+			if val == 'clamp' and len(args) == 3: return ('min', ('max', args[0], args[1]), args[2])
+			if val == 'mix' and len(args) == 3: return ('add', args[0], ('mul', ('sub', args[1], args[0]), args[2]))
+			if val in ('clamp', 'mix') or len(args) != OPS[val][1]: self._fail('Wrong number of arguments to {}'.format(val))
+
+			return (val,) + tuple(args)
+
+		self._fail('Unexpected {!r}'.format(val) if kind is not None else 'Unexpected end')
+
+	def _fold(node) :
+		'''
+		The value of a constant node, or None.
+		'''
+		if node[0] == 'num': return np.float32(node[1])
+		if node[0] == 'x': return None
+
+		args = [Expr._fold(arg) for arg in node[1:]]
+		if any(arg is None for arg in args): return None
+
+		with np.errstate(all='ignore') :
+			return np.float32(OPS[node[0]][2](*[np.float32(arg) for arg in args]))
+
+	def _alloc(self) :
+		if self._free: return self._free.pop()
+
+		self.nRegs += 1
+		return self.nRegs - 1
+
+	def _release(self, reg) :
+		if reg != 0 and reg not in self._free: self._free.append(reg)
+
+	def _emitOp(self, op, regs) :
+		for reg in regs: self._release(reg)
+		dst = self._alloc()
+
+		self._code.append([OPS[op][0], dst] + regs + [0] * (3 - len(regs)))
+		return dst
+
+	def _emit(self, node) :
+		'''
+		Emit the instructions computing a node, returning the register holding it.
+		'''
+		if node[0] == 'x': return 0
+
+		val = Expr._fold(node)
+		if val is not None :
+			self._consts.append(float(val))
+			dst = self._alloc()
+			self._code.append([OPS['const'][0], dst, len(self._consts) - 1, 0, 0])
+			return dst
+
+		return self._emitOp(node[0], [self._emit(arg) for arg in node[1:]])
+
+	def __call__(self, arr, out = None) :
+		'''
+		Evaluate the expression over a flat array, natively & in parallel. float16 arrays stay float16.
+		'''
+		return olo.expr(arr, self.code, self.consts, self.nRegs, self.result, out)
+
+	def evalNumpy(self, arr) :
+		'''
+		Evaluate the expression with numpy, instruction by instruction. For checking the native evaluator.
+		'''
+		regs = [None] * self.nRegs
+		regs[0] = np.asarray(arr, dtype=np.float32)
+		with np.errstate(all='ignore') :
+			for op, dst, a, b, c in self.code :
+				if op == OPS['const'][0] :
+					regs[dst] = np.full(regs[0].shape, self.consts[a], dtype=np.float32)
+				else :
+					regs[dst] = _NUMPY[op](*[regs[reg] for reg in (a, b, c)[:_ARITY[op]]]).astype(np.float32)
+
+		return regs[self.result]
+
+	def __repr__(self) :
+		return 'Expr({!r})'.format(self.src)
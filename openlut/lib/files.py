@@ -17,6 +17,9 @@ Copyright 2016 Sofus Rose
 '''
 
 import sys, os, time
+import atexit
+import threading
+import weakref
 import multiprocessing as mp
 
 import numpy as np
@@ -25,7 +28,6 @@ import numpy as np
 MOD_MATPLOTLIB = False
 try:
 	import matplotlib.pyplot as plt
-	import matplotlib.mlab as mlab
 	
 	MOD_MATPLOTLIB = True
 except:
@@ -210,21 +212,102 @@ class Log(ColLib) :
 			raise ValueError('Run wasn\'t found!!')
 			
 	@staticmethod
-	def bench(f, args=[], kwargs={}, trials=15, graph=False) :
-		def t(): l = Log(); l.startTime(0); f(*args, **kwargs); return l.getTime(0)
-		
-		data = np.array([t() for i in range(trials)])
-		anyl = {		'mean'		: np.mean(data),
-						'median'	: np.median(data),
-						'std_dev'	: np.std(data),
-						'vari'		: np.std(data) ** 2,
-						'total'		: sum(data)
+	def bench(f, args=[], kwargs={}, trials=None, graph=False, warmup=3, minTime=1.0, minTrial=2e-3, data=None, memory=False, label=None, jsonPath=None) :
+		"""
+		Micro-benchmarks f(*args, **kwargs), returning a JSON-serializable dict of timings, in seconds per call.
+		
+		*warmup: Untimed calls first, to settle caches, allocators & OpenMP's thread pool.
+		*minTrial: Each trial loops over f enough times (number) to take at least this long, so timer resolution doesn't matter.
+		*trials: The number of timed trials. None fits as many into minTime seconds as possible, between 5 and 1000.
+		*data: The image array that f processes. Adds throughput - pixelsPerSec & bytesPerSec - at the median time.
+		*memory: Adds peakBytes, the peak of Python allocations (numpy's included) in one extra call, measured with tracemalloc.
+		*jsonPath: Appends the results as a JSON line, labeled with label & the machine, to compare across runs. See Log.benchCompare.
+		
+		The result has the min, median, mean, p95 & p99 - and the raw per-call times, as times.
+		"""
+		call = lambda: f(*args, **kwargs)
+		for i in range(warmup): call()
+		
+		def timeIt(number) :
+			t = time.perf_counter_ns()
+			for i in range(number): call()
+			return time.perf_counter_ns() - t
+		
+		#Calibrate the calls per trial, doubling until a trial is long enough.
+		number = 1
+		tTrial = timeIt(number)
+		while tTrial < minTrial * 1e9 :
+			number *= 2
+			tTrial = timeIt(number)
+		
+		if trials is None: trials = int(min(1000, max(5, minTime * 1e9 // tTrial)))
+		
+		times = np.array([timeIt(number) for i in range(trials)]) / (number * 1e9)
+		anyl = {		'label'		: label,
+						'trials'	: trials,
+						'number'	: number,
+						'min'		: float(np.min(times)),
+						'median'	: float(np.median(times)),
+						'mean'		: float(np.mean(times)),
+						'p95'		: float(np.percentile(times, 95)),
+						'p99'		: float(np.percentile(times, 99)),
+						'std_dev'	: float(np.std(times)),
+						'vari'		: float(np.std(times) ** 2),
+						'total'		: float(np.sum(times) * number),
+						'times'		: times.tolist()
 		}
 		
+		if data is not None :
+			data = np.asarray(data)
+			anyl['pixelsPerSec'] = data.size // 3 / anyl['median']
+			anyl['bytesPerSec'] = data.nbytes / anyl['median']
+			
+		if memory :
+			import tracemalloc
+			
+			wasTracing = tracemalloc.is_tracing()
+			if not wasTracing: tracemalloc.start()
+			if hasattr(tracemalloc, 'reset_peak') :
+				tracemalloc.reset_peak()
+			else :
+				tracemalloc.clear_traces() #Before Python 3.9, this is what resets the peak.
+			
+			base = tracemalloc.get_traced_memory()[0]
+			call()
+			anyl['peakBytes'] = tracemalloc.get_traced_memory()[1] - base
+			
+			if not wasTracing: tracemalloc.stop()
+		
+		if jsonPath is not None :
+			import json, platform
+			
+			rec = dict(anyl, time=time.time(), machine=platform.node(), python=platform.python_version(), cpus=os.cpu_count())
+			with open(jsonPath, 'a') as f: print(json.dumps(rec), file=f)
+			
 		if graph: Log.graphBench(anyl)
 			
 		return anyl
 		
+	@staticmethod
+	def benchCompare(base, new) :
+		"""
+		Compares two Log.bench results - dicts, or the label of the latest line in a JSON file made with jsonPath as (path, label).
+		Returns the speedup of new over base (>1 is faster) at each statistic.
+		"""
+		def load(res) :
+			if isinstance(res, dict): return res
+			
+			import json
+			
+			path, label = res
+			with open(path) as f: recs = [json.loads(line) for line in f if line.strip()]
+			recs = [rec for rec in recs if rec['label'] == label]
+			if not recs: raise ValueError('No benchmark labeled {} in {}!'.format(label, path))
+			return recs[-1]
+			
+		base, new = load(base), load(new)
+		return {stat: base[stat] / new[stat] for stat in ('min', 'median', 'mean', 'p95', 'p99') if new[stat] > 0}
+		
 	@staticmethod
 	def graphBench(anyl) :
 		if MOD_MATPLOTLIB :
@@ -232,7 +315,10 @@ class Log(ColLib) :
 			
 			x = np.linspace(-3 * anyl['std_dev'] + anyl['mean'], 3 * anyl['std_dev'] + anyl['mean'], 100)
 			
-			plt.plot(x, mlab.normpdf(x, anyl['mean'], anyl['std_dev']))
+			#The measured distribution, against a normal distribution of the same mean & standard deviation.
+			if 'times' in anyl: plt.hist(anyl['times'], bins='auto', density=True, alpha=0.5)
+			if anyl['std_dev'] > 0 :
+				plt.plot(x, np.exp(-0.5 * ((x - anyl['mean']) / anyl['std_dev']) ** 2) / (anyl['std_dev'] * np.sqrt(2 * np.pi)))
 			
 			plt.axvline(x = anyl['mean'], color='red', linestyle = "--")
 			plt.text(	anyl['mean'] - 0.2 * anyl['std_dev'], 0, 'mean',
@@ -446,72 +532,169 @@ class LogFile() :
 	Similar to a normal file, except it splits into several files. On the frontend, however, it acts as if it were a single file.
 	
 	*Writes to 'path'.log.
-	*When maxLen is exceeded, lines are pushed into 'path'.0.log, then 'path'.1.log, etc. .
+	*When maxLen lines have been written to it, 'path'.log is renamed to 'path'.<time>.<pid>.log, and a new 'path'.log is started.
+	 Only that one file is renamed, however many there are. With keep, only the newest keep of those are kept.
+	
+	Lines are buffered, and written with one append per flush: when bufLines lines are waiting, or bufSecs have passed since the
+	last flush. bufLines=1 writes every line as it comes. Several processes may write to the same LogFile path: appends don't
+	interleave within a flush, and a process notices when another rotated path.log away, and reopens it. Each process counts
+	its own lines towards maxLen.
 	"""
-	def __init__(self, path, maxLen=1000, trunc=False) : #Make maxLen 1000 later.
+	def __init__(self, path, maxLen=1000, trunc=False, keep=None, bufLines=64, bufSecs=1.0) :
 		"""
 		Constructor accepts a path (extension will be rewritten to '.log'), a maximum length, and will optionally truncate
-		any previous logfiles.
+		any previous logfiles. Existing logs are otherwise left alone, and appended to.
 		"""
 		self.path = os.path.splitext(path)[0] + '.log'
 		self.bPath = os.path.splitext(self.path)[0]
 		
 		self.maxLen = maxLen
-		self.name = '<{0}.log, {0}.0...n.log>'.format(self.bPath)
+		self.keep = keep
+		self.bufLines = bufLines
+		self.bufSecs = bufSecs
+		self.name = '<{0}.log, {0}.*.log>'.format(self.bPath)
 		
-		self.lines = 0
-		self.fileNum = 0
+		self.lines = 0 #Lines this LogFile wrote to the current path.log.
+		
+		self._buf = []
+		self._lastFlush = time.perf_counter()
+		self._fd = None
+		self._lock = threading.Lock()
+		
+		if trunc: self.truncate()
+		
+		#Flush at exit - through a weak reference, so the hook doesn't keep this LogFile (and its fd) alive.
+		self._exitHook = LogFile._flushRef(weakref.ref(self))
+		atexit.register(self._exitHook)
 		
-		#If the logfile already exists, it's read + rewritten using the current maxLen.
-		if os.path.exists(self.path) :
-			if trunc: self.truncate(); return
+	def _flushRef(ref) :
+		"""
+		A function flushing the referenced LogFile, if it still exists.
+		"""
+		def flush() :
+			log = ref()
+			if log is not None: log.flush()
 			
-			inLines = open(self.path, 'r').readlines()[::-1]
-			os.remove(os.path.abspath(self.path)) #Remove the old path.log.
+		return flush
+		
+	def _open(self) :
+		"""
+		(Re)open path.log for appending.
+		"""
+		if self._fd is not None: os.close(self._fd)
+		self._fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+		self.lines = 0
+		
+	def _rotated(self) :
+		"""
+		The rotated files, from oldest to newest.
+		"""
+		head, base = os.path.split(self.bPath)
+		
+		found = []
+		for name in os.listdir(head or '.') :
+			parts = name.split('.')
+			if name.startswith(base + '.') and name.endswith('.log') and len(parts) >= 4 and parts[-3].isdigit() and parts[-2].isdigit() :
+				if '.'.join(parts[:-3]) == base: found.append(((int(parts[-3]), int(parts[-2])), os.path.join(head, name)))
+				
+		return [path for key, path in sorted(found)]
+		
+	def _rotate(self) :
+		"""
+		Move path.log aside, and start a new one. Another process may have beaten us to it; then its new path.log is used.
+		
+		Checking path.log is ours, then renaming it, would race: another process could rotate in between, so we'd move its
+		new path.log instead. So it's renamed first, to a name only this process uses, and checked after. A path.log that
+		wasn't ours is linked back - unless yet another path.log was started meanwhile, when it stays a rotated file.
+		"""
+		rotated = '{0}.{1:d}.{2:d}.log'.format(self.bPath, int(time.time() * 1e6), os.getpid())
+		try :
+			os.rename(self.path, rotated)
 			
-			i = 0
-			while os.path.exists('{0}.{1}.log'.format(self.bPath, i)) :
-				inLines += open('{0}.{1}.log'.format(self.bPath, i), 'r').readlines()[::-1]
-				os.remove(os.path.abspath('{0}.{1}.log'.format(self.bPath, i)))
-				i += 1
-							
-			self.write(''.join(reversed(inLines)))
+			if os.stat(rotated).st_ino != os.fstat(self._fd).st_ino :
+				try :
+					os.link(rotated, self.path)
+					os.remove(rotated)
+				except FileExistsError :
+					pass
+		except FileNotFoundError :
+			pass
 			
-	
+		self._open()
+		
+		if self.keep is not None :
+			for old in self._rotated()[:-self.keep or None] :
+				try :
+					os.remove(old)
+				except FileNotFoundError :
+					pass #Another process removed it.
+		
 	def write(self, *inStr) :
 		apnd = list(filter(bool, ''.join(inStr).strip().split('\n')))
 		
 		if not apnd: return #Nothing to append = don't even try!
-		if not os.path.exists(self.path): open(self.path, 'w').close() #Make sure path.log exists.
-				
-		#Empty apnd line by line.
-		while len(apnd) > 0 :
-			toWrite = self.maxLen * (self.fileNum + 1) - self.lines #Lines needed to fill up path.log
-			if toWrite == 0 : #Time to make new files.		
-						
-				#Rename upwards. path.n.log -> path.(n+1).log, etc. . path.log becomes path.0.log.
-				for i in reversed(range(self.fileNum)) :
-					os.rename('{0}.{1}.log'.format(self.bPath, i), '{0}.{1}.log'.format(self.bPath, i+1))
-				os.rename('{0}.log'.format(self.bPath), '{0}.0.log'.format(self.bPath))
-				
-				#Make new path.log.
-				open(self.path, 'w').close() #Just create the file.
-				
-				#Number of files just increased.
-				self.fileNum += 1
-			else : #Fill up path.log.
-				print(apnd.pop(0), file=open(self.path, 'a'))
+		
+		with self._lock :
+			self._buf += apnd
+			if len(self._buf) >= self.bufLines or time.perf_counter() - self._lastFlush >= self.bufSecs: self._flush()
+			
+	def flush(self) :
+		"""
+		Write out the buffered lines.
+		"""
+		with self._lock :
+			self._flush()
+			
+	def _flush(self) :
+		self._lastFlush = time.perf_counter()
+		if not self._buf: return
+		
+		if self._fd is None :
+			self._open()
+		else :
+			#Reopen if another process rotated path.log away.
+			try :
+				if os.fstat(self._fd).st_ino != os.stat(self.path).st_ino: self._open()
+			except FileNotFoundError :
+				self._open()
 				
-				#Number of written lines just increasd.
-				self.lines += 1
+		#Fill path.log up to maxLen lines, rotating as needed. Each chunk is one append.
+		while self._buf :
+			if self.lines >= self.maxLen: self._rotate()
+			
+			chunk, self._buf = self._buf[:self.maxLen - self.lines], self._buf[self.maxLen - self.lines:]
+			data = ''.join(line + '\n' for line in chunk).encode('utf-8')
+			
+			done = 0
+			while done < len(data): done += os.write(self._fd, data[done:])
+			self.lines += len(chunk)
+			
+	def close(self) :
+		"""
+		Flush, and close path.log.
+		"""
+		with self._lock :
+			self._flush()
+			if self._fd is not None: os.close(self._fd)
+			self._fd = None
+			
+		atexit.unregister(self._exitHook)
+		
+	def __del__(self) :
+		try :
+			self.close()
+		except Exception :
+			pass #Ex. at interpreter shutdown.
 		
 	def read(self) :
-		collec = []
+		self.flush()
 		
-		for i in reversed(range(self.fileNum)) :
-			collec += open('{0}.{1}.log'.format(self.bPath, i), 'r').readlines()
-			
-		collec += open(self.path, 'r').readlines()
+		collec = []
+		for path in self._rotated() + [self.path] :
+			try :
+				with open(path, 'r') as f: collec += f.readlines()
+			except FileNotFoundError :
+				pass
 		
 		return ''.join(collec)
 		
@@ -519,15 +702,17 @@ class LogFile() :
 		"""
 		Deletes all associated files + resets the instance.
 		"""
-		i = 0
-		
-		os.remove(os.path.abspath(self.path)) #Remove the old path.log.
-		while os.path.exists('{0}.{1}.log'.format(self.bPath, i)) : #Remove all log files.
-			os.remove(os.path.abspath('{0}.{1}.log'.format(self.bPath, i)))
-			i += 1
-			
-		self.lines = 0
-		self.fileNum = 0
+		with self._lock :
+			self._buf = []
+			for path in self._rotated() + [self.path] :
+				try :
+					os.remove(os.path.abspath(path))
+				except FileNotFoundError :
+					pass
+					
+			if self._fd is not None: os.close(self._fd)
+			self._fd = None
+			self.lines = 0
 		
 	def readlines(self) :
 		return self.read().split('\n')
@@ -538,6 +723,12 @@ class LogFile() :
 		"""
 		return False
 		
+	def __enter__(self) :
+		return self
+		
+	def __exit__(self, *exc) :
+		self.close()
+		
 	def __iter__(self) :
 		return (line for line in self.readlines())
 		
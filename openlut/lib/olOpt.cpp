@@ -7,6 +7,11 @@
 
 #include <iostream>
 #include <cmath>
+#include <stdexcept>
+#include <vector>
+#include <algorithm>
+#include <cstring>
+#include <cstdint>
 
 //~ #include "samplers.h"
 
@@ -17,6 +22,104 @@ using namespace std;
 
 
 
+//Images may be stored as float32, or as IEEE 754 half floats (numpy's float16) to halve memory & bandwidth.
+//Kernels read & write the stored type, but all math happens in float.
+typedef uint16_t half;
+
+//halfToFloat widens a half to a float. Exact, for all values.
+inline float halfToFloat(half h) {
+	uint32_t	sign = (uint32_t)(h & 0x8000) << 16,
+				expo = (h >> 10) & 0x1f,
+				mant = h & 0x3ff,
+				bits;
+	
+	if (expo == 0x1f) {
+		bits = sign | 0x7f800000 | (mant << 13); //Inf & NaN.
+	} else if (expo != 0) {
+		bits = sign | ((expo + 112) << 23) | (mant << 13); //Normal: rebias 15 to 127.
+	} else {
+		float f = (float)mant * 5.9604644775390625e-8f; //Subnormal (or zero): mant * 2^-24.
+		return sign ? -f : f;
+	}
+	
+	float f;
+	memcpy(&f, &bits, sizeof(f));
+	return f;
+}
+
+//floatToHalf narrows a float to a half, rounding to nearest even. Too large values become inf.
+inline half floatToHalf(float f) {
+	uint32_t bits;
+	memcpy(&bits, &f, sizeof(bits));
+	
+	half		sign = (bits >> 16) & 0x8000;
+	uint32_t	absBits = bits & 0x7fffffff;
+	
+	if (absBits >= 0x7f800000) return sign | 0x7c00 | (absBits > 0x7f800000 ? 0x200 : 0); //Inf & NaN.
+	if (absBits >= 0x477ff000) return sign | 0x7c00; //Rounds past 65504.
+	if (absBits < 0x38800000) return sign | (half)nearbyintf(fabsf(f) * 16777216.0f); //Subnormal: round(|f| / 2^-24).
+	
+	//Normal: rebias 127 to 15, then round the 13 dropped mantissa bits. A carry into the exponent is correct.
+	uint32_t	rebiased = absBits - 0x38000000,
+				rem = rebiased & 0x1fff,
+				res = rebiased >> 13;
+	
+	if (rem > 0x1000 || (rem == 0x1000 && (res & 1))) res++;
+	
+	return sign | (half)res;
+}
+
+//load & store move one value between a float or half buffer and a float.
+inline float load(const float *ptr, size_t i) { return ptr[i]; }
+inline float load(const half *ptr, size_t i) { return halfToFloat(ptr[i]); }
+inline void store(float *ptr, size_t i, float val) { ptr[i] = val; }
+inline void store(half *ptr, size_t i, float val) { ptr[i] = floatToHalf(val); }
+
+//imgIn gets a C-contiguous image array. float16 arrays are kept as they are, setting isHalf; anything else is cast to float32.
+inline py::array imgIn(py::array img, bool &isHalf) {
+	isHalf = img.dtype().kind() == 'f' && img.dtype().itemsize() == 2;
+	
+	if (isHalf) return py::array::ensure(img, py::array::c_style);
+	return py::array_t<float, py::array::c_style | py::array::forcecast>::ensure(img);
+}
+
+//imgOut makes numpy allocate an output array of the given shape, stored like the input.
+//Or, it checks an out array passed in to be written to instead: C-contiguous, with as many values, stored the same. It may be the input.
+inline py::array imgOut(const std::vector<py::ssize_t> &shape, bool isHalf, py::object out) {
+	py::dtype dt = isHalf ? py::dtype("e") : py::dtype::of<float>();
+	if (out.is_none()) return py::array(dt, shape);
+	
+	py::ssize_t size = 1;
+	for (py::ssize_t dim : shape) size *= dim;
+	
+	if (!py::isinstance<py::array>(out)) throw std::invalid_argument("out must be a numpy array!");
+	py::array arr = py::reinterpret_borrow<py::array>(out);
+	
+	if (!arr.dtype().is(dt) || !(arr.flags() & py::array::c_style) || !arr.writeable() || arr.size() != size) {
+		throw std::invalid_argument("out must be a writable, C-contiguous array, of the image's size & type!");
+	}
+	
+	return arr;
+}
+
+//withStorage calls kernel(in, out) with buffer pointers of the stored type - so kernels are written once, as generic lambdas.
+template <typename Kernel>
+inline void withStorage(bool isHalf, const py::buffer_info &bufIn, const py::buffer_info &bufOut, Kernel kernel) {
+	if (isHalf) {
+		kernel((const half *) bufIn.ptr, (half *) bufOut.ptr);
+	} else {
+		kernel((const float *) bufIn.ptr, (float *) bufOut.ptr);
+	}
+}
+
+//Images are interleaved (r, g, b, r, g, b, ...) or planar (r, r, ..., g, g, ..., b, b, ...) - like (3, height, width) arrays.
+//chan gives the index of channel c of pixel i, in an image of n pixels.
+inline size_t chan(size_t i, int c, size_t n, bool planar) { return planar ? c * n + i : i * 3 + c; }
+
+
+
+//Kernels release the GIL (py::gil_scoped_release) around their loops: only raw buffers are touched there, so other Python threads may run meanwhile.
+
 //Gamma functions, ported to C++ for efficiency.
 
 float lin(float x) { return x; }
@@ -29,121 +132,843 @@ float sLog2(float x) { return ( 0.432699 * log10( (155.0 * x) / 219.0 + 0.037584
 float DanLog(float x) { return x > 0.1496582 ? (pow(10.0, ((x - 0.385537) / 0.2471896)) - 0.071272) / 3.555556 : (x - 0.092809) / 5.367655; }
 
 //gam lets the user pass in any 1D array, any one-arg C++ function, and get a result. It's multithreaded, vectorized, etc. .
-py::array_t<float> gam(py::array_t<float> arr, const std::function<float(float)> &g_func) {
-	py::buffer_info bufIn = arr.request();
+py::array gam(py::array arr, const std::function<float(float)> &g_func, py::object out) {
+	bool isHalf;
+	py::array img = imgIn(arr, isHalf);
+	py::buffer_info bufIn = img.request();
 	
 	//To use with an image, MAKE SURE to flatten the 3D array to a 1D array, then back out to a 3D array after.
 	if (bufIn.ndim == 1) {
 		//Make numpy allocate the buffer.
-		auto result = py::array_t<float>(bufIn.size);
+		py::array result = imgOut({bufIn.size}, isHalf, out);
 		
 		//Get the pointers that we can manipulate from C++.
 		auto bufOut = result.request();
 		
-		float 	*ptrIn = (float *) bufIn.ptr,
-				*ptrOut = (float *) bufOut.ptr;
-		
 		//The reason for all this bullshit as opposed to vectorizing is this pragma!!!
-		#pragma omp parallel for
-		for (size_t i = 0; i < bufIn.shape[0]; i++) {
-			//~ std::cout << g_func(ptrIn[i]) << std::endl;
-			ptrOut[i] = g_func(ptrIn[i]);
+		{
+			py::gil_scoped_release release; //C++ functions run without the GIL. Python functions take it back, per call.
+			
+			withStorage(isHalf, bufIn, bufOut, [&](auto *ptrIn, auto *ptrOut) {
+				#pragma omp parallel for
+				for (size_t i = 0; i < bufIn.shape[0]; i++) {
+					store(ptrOut, i, g_func(load(ptrIn, i)));
+				}
+			});
 		}
 		
 		return result;
 	}
+	
+	throw std::invalid_argument("gam needs a flattened array!");
+}
+
+
+//Parametric curve kinds - see openlut.gamma.ParamCurve, whose codes must match. Each is lin --> space; inverse goes back.
+//	POWER	(p):											sign(x) * |x|^p
+//	LINPOW	(p, k, a, brk, s, t):							x >= brk ? k * x^p - a : s * x + t					(the sRGB/Rec709 family)
+//	LOG		(base, logS, logO, linS, linO, brk, toeS, toeO):	x > brk ? logS * log_base(linS * x + linO) + logO : toeS * x + toeO	(the Cineon/LogC/S-Log family)
+enum CurveKind { CURVE_POWER, CURVE_LINPOW, CURVE_LOG, CURVE_COUNT };
+const int CURVE_PARAMS[CURVE_COUNT] = {1, 6, 8};
+
+//curveLoop applies a per-value function over a whole flattened array. Each kind gets its own loop, which the compiler can vectorize.
+template <typename In, typename Out, typename F>
+inline void curveLoop(const In *ptrIn, Out *ptrOut, size_t n, F f) {
+	#pragma omp parallel for
+	for (size_t i = 0; i < n; i++) store(ptrOut, i, f(load(ptrIn, i)));
+}
+
+//curve applies a parametric curve, or its exact inverse, to a flattened numpy array; vectorized & parallel.
+py::array curve(py::array arr, int kind, py::array_t<float, py::array::c_style | py::array::forcecast> params, bool inverse, py::object out) {
+	bool isHalf;
+	py::array img = imgIn(arr, isHalf);
+	py::buffer_info bufIn = img.request(), bufParams = params.request();
+	
+	if (bufIn.ndim != 1) throw std::invalid_argument("curve needs a flattened array!");
+	if (kind < 0 || kind >= CURVE_COUNT || bufParams.size != CURVE_PARAMS[kind]) throw std::invalid_argument("curve needs a known kind, and its number of parameters!");
+	
+	py::array result = imgOut({bufIn.size}, isHalf, out);
+	auto bufOut = result.request();
+	
+	float p[8];
+	std::copy((float *) bufParams.ptr, (float *) bufParams.ptr + bufParams.size, p);
+	size_t n = bufIn.size;
+	
+	{
+		py::gil_scoped_release release;
+		
+		withStorage(isHalf, bufIn, bufOut, [&](auto *ptrIn, auto *ptrOut) {
+			if (kind == CURVE_POWER) {
+				float e = inverse ? 1.0f / p[0] : p[0];
+				curveLoop(ptrIn, ptrOut, n, [=](float x) { return copysignf(powf(fabsf(x), e), x); });
+			} else if (kind == CURVE_LINPOW) {
+				float pw = p[0], k = p[1], a = p[2], brk = p[3], s = p[4], t = p[5];
+				float brkY = s * brk + t, invPw = 1.0f / pw; //The break, on the output side: where the linear segment ends.
+				
+				if (!inverse) {
+					curveLoop(ptrIn, ptrOut, n, [=](float x) { return x >= brk ? k * powf(x, pw) - a : s * x + t; });
+				} else {
+					curveLoop(ptrIn, ptrOut, n, [=](float y) { return y >= brkY ? powf((y + a) / k, invPw) : (y - t) / s; });
+				}
+			} else {
+				float lnBase = logf(p[0]), logS = p[1], logO = p[2], linS = p[3], linO = p[4], brk = p[5], toeS = p[6], toeO = p[7];
+				float brkY = std::isinf(brk) ? brk : logS * logf(linS * brk + linO) / lnBase + logO;
+				
+				if (!inverse) {
+					float scl = logS / lnBase;
+					curveLoop(ptrIn, ptrOut, n, [=](float x) { return x > brk ? scl * logf(linS * x + linO) + logO : toeS * x + toeO; });
+				} else {
+					float scl = lnBase / logS;
+					curveLoop(ptrIn, ptrOut, n, [=](float y) { return y > brkY ? (expf((y - logO) * scl) - linO) / linS : (y - toeO) / toeS; });
+				}
+			}
+		});
+	}
+	
+	return result;
+}
+
+
+//Expression opcodes - the register bytecode of openlut/lib/expr.py. The codes must match its OPS.
+enum ExprOp {	OP_CONST, OP_ADD, OP_SUB, OP_MUL, OP_DIV, OP_POW, OP_MIN, OP_MAX, OP_FMOD,
+				OP_LT, OP_LE, OP_GT, OP_GE, OP_EQ, OP_NE, OP_AND, OP_OR, OP_SEL,
+				OP_NEG, OP_NOT, OP_EXP, OP_LOG, OP_LOG2, OP_LOG10, OP_SQRT, OP_ABS, OP_FLOOR, OP_CEIL, OP_SIN, OP_COS, OP_TAN,
+				OP_COUNT
+};
+
+//Expressions run over blocks of values: each instruction is a tight loop over a block, which the compiler can vectorize.
+const size_t EXPR_BLOCK = 256;
+
+//expr evaluates compiled expression bytecode (n, 5 instructions of op, dst, a, b, c) over a flattened numpy array; vectorized & parallel.
+py::array expr(	py::array arr,
+				py::array_t<int32_t, py::array::c_style | py::array::forcecast> code,
+				py::array_t<float, py::array::c_style | py::array::forcecast> consts,
+				size_t nRegs, size_t result, py::object out
+) {
+	bool isHalf;
+	py::array img = imgIn(arr, isHalf);
+	py::buffer_info bufIn = img.request(), bufCode = code.request(), bufConsts = consts.request();
+	
+	if (bufIn.ndim != 1) throw std::invalid_argument("expr needs a flattened array!");
+	if (bufCode.ndim != 2 || bufCode.shape[1] != 5) throw std::invalid_argument("expr needs (n, 5) bytecode!");
+	
+	//Check the bytecode up front, so the loop can trust every register & constant index.
+	const int32_t *ptrCode = (const int32_t *) bufCode.ptr;
+	size_t nCode = bufCode.shape[0], nConsts = bufConsts.size;
+	
+	if (nRegs < 1 || result >= nRegs) throw std::invalid_argument("expr's result register is out of range!");
+	for (size_t k = 0; k < nCode; k++) {
+		const int32_t *ins = ptrCode + k * 5;
+		
+		bool ok = ins[0] >= 0 && ins[0] < OP_COUNT && ins[1] > 0 && (size_t)ins[1] < nRegs;
+		if (ins[0] == OP_CONST) {
+			ok = ok && ins[2] >= 0 && (size_t)ins[2] < nConsts;
+		} else {
+			for (int j = 2; j < 5; j++) ok = ok && ins[j] >= 0 && (size_t)ins[j] < nRegs;
+		}
+		
+		if (!ok) throw std::invalid_argument("expr's bytecode is malformed!");
+	}
+	
+	py::array resArr = imgOut({bufIn.size}, isHalf, out);
+	auto bufOut = resArr.request();
+	
+	const float *ptrConsts = (const float *) bufConsts.ptr;
+	size_t n = bufIn.size, nBlocks = (n + EXPR_BLOCK - 1) / EXPR_BLOCK;
+	
+	{
+		py::gil_scoped_release release;
+		
+		withStorage(isHalf, bufIn, bufOut, [&](auto *ptrIn, auto *ptrOut) {
+			#pragma omp parallel
+			{
+				std::vector<float> regs(nRegs * EXPR_BLOCK); //Each thread's register file.
+				
+				#pragma omp for schedule(static)
+				for (size_t blk = 0; blk < nBlocks; blk++) {
+					size_t start = blk * EXPR_BLOCK, len = std::min(EXPR_BLOCK, n - start);
+					float *x = regs.data();
+					
+					for (size_t j = 0; j < len; j++) x[j] = load(ptrIn, start + j);
+					
+					for (size_t k = 0; k < nCode; k++) {
+						const int32_t *ins = ptrCode + k * 5;
+						float *d = x + ins[1] * EXPR_BLOCK;
+						const float *a = x + ins[2] * EXPR_BLOCK, *b = x + ins[3] * EXPR_BLOCK, *c = x + ins[4] * EXPR_BLOCK;
+						
+						switch (ins[0]) {
+							case OP_CONST: { float v = ptrConsts[ins[2]]; for (size_t j = 0; j < len; j++) d[j] = v; break; }
+							case OP_ADD: for (size_t j = 0; j < len; j++) d[j] = a[j] + b[j]; break;
+							case OP_SUB: for (size_t j = 0; j < len; j++) d[j] = a[j] - b[j]; break;
+							case OP_MUL: for (size_t j = 0; j < len; j++) d[j] = a[j] * b[j]; break;
+							case OP_DIV: for (size_t j = 0; j < len; j++) d[j] = a[j] / b[j]; break;
+							case OP_POW: for (size_t j = 0; j < len; j++) d[j] = powf(a[j], b[j]); break;
+							case OP_MIN: for (size_t j = 0; j < len; j++) d[j] = fminf(a[j], b[j]); break;
+							case OP_MAX: for (size_t j = 0; j < len; j++) d[j] = fmaxf(a[j], b[j]); break;
+							case OP_FMOD: for (size_t j = 0; j < len; j++) d[j] = fmodf(a[j], b[j]); break;
+							case OP_LT: for (size_t j = 0; j < len; j++) d[j] = a[j] < b[j]; break;
+							case OP_LE: for (size_t j = 0; j < len; j++) d[j] = a[j] <= b[j]; break;
+							case OP_GT: for (size_t j = 0; j < len; j++) d[j] = a[j] > b[j]; break;
+							case OP_GE: for (size_t j = 0; j < len; j++) d[j] = a[j] >= b[j]; break;
+							case OP_EQ: for (size_t j = 0; j < len; j++) d[j] = a[j] == b[j]; break;
+							case OP_NE: for (size_t j = 0; j < len; j++) d[j] = a[j] != b[j]; break;
+							case OP_AND: for (size_t j = 0; j < len; j++) d[j] = a[j] != 0.0f && b[j] != 0.0f; break;
+							case OP_OR: for (size_t j = 0; j < len; j++) d[j] = a[j] != 0.0f || b[j] != 0.0f; break;
+							case OP_SEL: for (size_t j = 0; j < len; j++) d[j] = a[j] != 0.0f ? b[j] : c[j]; break; //a ? b : c.
+							case OP_NEG: for (size_t j = 0; j < len; j++) d[j] = -a[j]; break;
+							case OP_NOT: for (size_t j = 0; j < len; j++) d[j] = a[j] == 0.0f; break;
+							case OP_EXP: for (size_t j = 0; j < len; j++) d[j] = expf(a[j]); break;
+							case OP_LOG: for (size_t j = 0; j < len; j++) d[j] = logf(a[j]); break;
+							case OP_LOG2: for (size_t j = 0; j < len; j++) d[j] = log2f(a[j]); break;
+							case OP_LOG10: for (size_t j = 0; j < len; j++) d[j] = log10f(a[j]); break;
+							case OP_SQRT: for (size_t j = 0; j < len; j++) d[j] = sqrtf(a[j]); break;
+							case OP_ABS: for (size_t j = 0; j < len; j++) d[j] = fabsf(a[j]); break;
+							case OP_FLOOR: for (size_t j = 0; j < len; j++) d[j] = floorf(a[j]); break;
+							case OP_CEIL: for (size_t j = 0; j < len; j++) d[j] = ceilf(a[j]); break;
+							case OP_SIN: for (size_t j = 0; j < len; j++) d[j] = sinf(a[j]); break;
+							case OP_COS: for (size_t j = 0; j < len; j++) d[j] = cosf(a[j]); break;
+							case OP_TAN: for (size_t j = 0; j < len; j++) d[j] = tanf(a[j]); break;
+						}
+					}
+					
+					const float *res = x + result * EXPR_BLOCK;
+					for (size_t j = 0; j < len; j++) store(ptrOut, start + j, res[j]);
+				}
+			}
+		});
+	}
+	
+	return resArr;
 }
 
 
+//lerpLUT linearly interpolates a 1D LUT at val. stride lets it read one channel of an interleaved (size, 3) LUT.
+inline float lerpLUT(const float *lut, size_t size, size_t stride, float val, float lBound, float hBound) {
+	if (!(val > lBound)) return lut[0]; //NaN's clip low too.
+	if (val >= hBound) return lut[(size - 1) * stride]; //Some simple clipping. So it's safe to index.
+	
+	float lutVal = (val - lBound) / (hBound - lBound) * (size - 1); //Need the value in relation to LUT indices.
+	
+	// Linear Interpolation: y = y0 + (x - x0) * ( (y1 - y0) / (x1 - x0) )
+	// See https://en.wikipedia.org/wiki/Linear_interpolation#Linear_interpolation_between_two_known_points .
+	// x1 - x0 is always 1, so there's no need to divide.
+	size_t x0 = (size_t)lutVal;
+	size_t x1 = x0 + 1 < size ? x0 + 1 : x0;
+	
+	float y0 = lut[x0 * stride];
+	float y1 = lut[x1 * stride];
+	
+	return y0 + (lutVal - (float)x0) * (y1 - y0);
+}
+
 //lut1d takes a flattened image array and a flattened 1D array, and returns a linearly interpolated result.
-py::array_t<float> lut1dlin(py::array_t<float> img, py::array_t<float> lut, float lBound, float hBound) {
+py::array lut1dlin(py::array arr, py::array_t<float, py::array::c_style | py::array::forcecast> lut, float lBound, float hBound, py::object out) {
+	bool isHalf;
+	py::array img = imgIn(arr, isHalf);
 	py::buffer_info bufImg = img.request(), bufLUT = lut.request();
 	
 	//To use with an image, MAKE SURE to flatten the 3D array to a 1D array, then back out to a 3D array after.
 	if (bufImg.ndim == 1 && bufLUT.ndim == 1) {
 		//Make numpy allocate the buffer of the new array.
-		auto result = py::array_t<float>(bufImg.size);
+		py::array result = imgOut({bufImg.size}, isHalf, out);
 		
 		//Get the bufOut pointers that we can manipulate from C++.
 		auto bufOut = result.request();
 		
-		float 	*ptrImg = (float *) bufImg.ptr,
-				*ptrLUT = (float *) bufLUT.ptr,
-				*ptrOut = (float *) bufOut.ptr;
+		float *ptrLUT = (float *) bufLUT.ptr;
+		size_t lutSize = bufLUT.shape[0];
 		
 		//Iterate over flat array. Each value gets scaled according to the LUT.
-		#pragma omp parallel for
-		for (size_t i = 0; i < bufImg.shape[0]; i++) {
-			//~ std::cout << g_func(ptrImg[i]) << std::endl;
-			//~ std::cout << g_func(ptrImg[i]) << std::endl;
-			
-			float val = ptrImg[i];
-			
-			if (val <= lBound) { ptrOut[i] = ptrLUT[0]; continue; }
-			else if (val >= hBound) { ptrOut[i] = ptrLUT[bufLUT.shape[0] - 1]; continue; } //Some simple clipping. So it's safe to index.
-			
-			float lutVal = val * bufLUT.shape[0]; //Need the value in relation to LUT indices.
-			//Essentially, we're gonna index by this above with simple math.
-			
-			// Linear Interpolation: y = y0 + (x - x0) * ( (y1 - y0) / (x1 - x0) )
-			// See https://en.wikipedia.org/wiki/Linear_interpolation#Linear_interpolation_between_two_known_points .
-			// (x0, y0) is lower point, (x, y) is higher point.
-			int x0 = (int)floor(lutVal);
-			int x1 = (int)ceil(lutVal); //Internet says this is safe. Yay internet...
+		{
+			py::gil_scoped_release release;
 			
-			float y0 = ptrLUT[x0];
-			float y1 = ptrLUT[x1];
-			
-			// (y1 - y0) is divided by the result of (float)(x1 - x0) - but no need to write it; a ceil'ed minus a floor'ed int is just 1.
-			ptrOut[i] = y0 + (lutVal - (float)x0) * ( (y1 - y0) );
+			withStorage(isHalf, bufImg, bufOut, [&](auto *ptrImg, auto *ptrOut) {
+				#pragma omp parallel for
+				for (size_t i = 0; i < bufImg.shape[0]; i++) {
+					store(ptrOut, i, lerpLUT(ptrLUT, lutSize, 1, load(ptrImg, i), lBound, hBound));
+				}
+			});
 		}
 		
 		return result;
 	}
+	
+	throw std::invalid_argument("lut1dlin needs a flattened image and a flattened LUT!");
+}
+
+//lut1dlin3 takes a flattened RGB image array (interleaved, or planar) and a flattened (size, 3) LUT; each channel is looked up in its own curve.
+py::array lut1dlin3(py::array arr, py::array_t<float, py::array::c_style | py::array::forcecast> lut, float lBound, float hBound, bool planar, py::object out) {
+	bool isHalf;
+	py::array img = imgIn(arr, isHalf);
+	py::buffer_info bufImg = img.request(), bufLUT = lut.request();
+	
+	if (bufImg.ndim != 1 || bufLUT.ndim != 1 || bufImg.size % 3 != 0 || bufLUT.size % 3 != 0) {
+		throw std::invalid_argument("lut1dlin3 needs a flattened RGB image and a flattened (size, 3) LUT!");
+	}
+	
+	//Make numpy allocate the buffer of the new array.
+	py::array result = imgOut({bufImg.size}, isHalf, out);
+	auto bufOut = result.request();
+	
+	float *ptrLUT = (float *) bufLUT.ptr;
+	size_t lutSize = bufLUT.size / 3, n = bufImg.size / 3;
+	
+	//Channel c reads every third LUT entry, starting at c.
+	{
+		py::gil_scoped_release release;
+		
+		withStorage(isHalf, bufImg, bufOut, [&](auto *ptrImg, auto *ptrOut) {
+			if (planar) {
+				//Each plane is contiguous, and has one curve: three plain 1D LUT passes.
+				for (int c = 0; c < 3; c++) {
+					#pragma omp parallel for
+					for (size_t i = c * n; i < (c + 1) * n; i++) {
+						store(ptrOut, i, lerpLUT(ptrLUT + c, lutSize, 3, load(ptrImg, i), lBound, hBound));
+					}
+				}
+			} else {
+				//One pass over interleaved r, g, b.
+				#pragma omp parallel for
+				for (size_t i = 0; i < bufImg.size; i+=3) {
+					store(ptrOut, i, lerpLUT(ptrLUT, lutSize, 3, load(ptrImg, i), lBound, hBound));
+					store(ptrOut, i + 1, lerpLUT(ptrLUT + 1, lutSize, 3, load(ptrImg, i + 1), lBound, hBound));
+					store(ptrOut, i + 2, lerpLUT(ptrLUT + 2, lutSize, 3, load(ptrImg, i + 2), lBound, hBound));
+				}
+			}
+		});
+	}
+	
+	return result;
+}
+
+
+//lerpCube trilinearly interpolates a (size, size, size, 3) cube, indexed [r][g][b], at r, g, b - normalized to [0, 1].
+inline void lerpCube(const float *cube, size_t size, float r, float g, float b, float *out) {
+	float	pos[3] = {r, g, b};
+	size_t	i0[3], i1[3];
+	float	f[3];
+	
+	//Clamp each coordinate to the lattice, and find the surrounding lattice points.
+	for (int c = 0; c < 3; c++) {
+		float p = pos[c] > 0.0f ? (pos[c] < 1.0f ? pos[c] * (size - 1) : (float)(size - 1)) : 0.0f; //NaN's clip low too.
+		
+		i0[c] = (size_t)p;
+		i1[c] = i0[c] + 1 < size ? i0[c] + 1 : i0[c];
+		f[c] = p - (float)i0[c];
+	}
+	
+	//Flat index of lattice point (r, g, b); each point holds an r, g, b triplet.
+	#define CUBE_AT(ir, ig, ib) (cube + (((ir) * size + (ig)) * size + (ib)) * 3)
+	
+	const float	*c000 = CUBE_AT(i0[0], i0[1], i0[2]), *c001 = CUBE_AT(i0[0], i0[1], i1[2]),
+				*c010 = CUBE_AT(i0[0], i1[1], i0[2]), *c011 = CUBE_AT(i0[0], i1[1], i1[2]),
+				*c100 = CUBE_AT(i1[0], i0[1], i0[2]), *c101 = CUBE_AT(i1[0], i0[1], i1[2]),
+				*c110 = CUBE_AT(i1[0], i1[1], i0[2]), *c111 = CUBE_AT(i1[0], i1[1], i1[2]);
+	
+	#undef CUBE_AT
+	
+	//Interpolate along b, then g, then r.
+	for (int c = 0; c < 3; c++) {
+		float	c00 = c000[c] + f[2] * (c001[c] - c000[c]),
+				c01 = c010[c] + f[2] * (c011[c] - c010[c]),
+				c10 = c100[c] + f[2] * (c101[c] - c100[c]),
+				c11 = c110[c] + f[2] * (c111[c] - c110[c]);
+		
+		float	c0 = c00 + f[1] * (c01 - c00),
+				c1 = c10 + f[1] * (c11 - c10);
+		
+		out[c] = c0 + f[0] * (c1 - c0);
+	}
+}
+
+//lut3dlin takes a flattened RGB image array (interleaved, or planar) and a flattened (size, size, size, 3) cube, and returns a trilinearly interpolated result.
+py::array lut3dlin(py::array arr, py::array_t<float, py::array::c_style | py::array::forcecast> cube, size_t size, float lBound, float hBound, bool planar, py::object out) {
+	bool isHalf;
+	py::array img = imgIn(arr, isHalf);
+	py::buffer_info bufImg = img.request(), bufCube = cube.request();
+	
+	if (bufImg.ndim != 1 || bufImg.size % 3 != 0 || (size_t)bufCube.size != size * size * size * 3) {
+		throw std::invalid_argument("lut3dlin needs a flattened RGB image and a flattened (size, size, size, 3) cube!");
+	}
+	
+	//Make numpy allocate the buffer of the new array.
+	py::array result = imgOut({bufImg.size}, isHalf, out);
+	auto bufOut = result.request();
+	
+	float *ptrCube = (float *) bufCube.ptr;
+	float scl = 1.0f / (hBound - lBound);
+	size_t n = bufImg.size / 3;
+	
+	{
+		py::gil_scoped_release release;
+		
+		withStorage(isHalf, bufImg, bufOut, [&](auto *ptrImg, auto *ptrOut) {
+			#pragma omp parallel for
+			for (size_t i = 0; i < n; i++) {
+				float rgb[3];
+				lerpCube(	ptrCube, size,
+							(load(ptrImg, chan(i, 0, n, planar)) - lBound) * scl,
+							(load(ptrImg, chan(i, 1, n, planar)) - lBound) * scl,
+							(load(ptrImg, chan(i, 2, n, planar)) - lBound) * scl,
+							rgb
+				);
+				
+				for (int c = 0; c < 3; c++) store(ptrOut, chan(i, c, n, planar), rgb[c]);
+			}
+		});
+	}
+	
+	return result;
+}
+
+//lut3dshaper applies a 1D shaper LUT (1 or 3 channels, flattened), then a flattened 3D cube, per pixel, in one pass. The image may be planar.
+py::array lut3dshaper(	py::array arr,
+						py::array_t<float, py::array::c_style | py::array::forcecast> shaper, int shaperChans, float sLBound, float sHBound,
+						py::array_t<float, py::array::c_style | py::array::forcecast> cube, size_t size, float cLBound, float cHBound, bool planar, py::object out) {
+	bool isHalf;
+	py::array img = imgIn(arr, isHalf);
+	py::buffer_info bufImg = img.request(), bufShaper = shaper.request(), bufCube = cube.request();
+	
+	if (bufImg.ndim != 1 || bufImg.size % 3 != 0 || (shaperChans != 1 && shaperChans != 3) || bufShaper.size % shaperChans != 0 || (size_t)bufCube.size != size * size * size * 3) {
+		throw std::invalid_argument("lut3dshaper needs a flattened RGB image, a flattened 1D shaper and a flattened (size, size, size, 3) cube!");
+	}
+	
+	py::array result = imgOut({bufImg.size}, isHalf, out);
+	auto bufOut = result.request();
+	
+	float 	*ptrShaper = (float *) bufShaper.ptr,
+			*ptrCube = (float *) bufCube.ptr;
+	
+	size_t shaperSize = bufShaper.size / shaperChans;
+	size_t cOff = shaperChans == 3 ? 1 : 0; //Per-channel shapers offset each channel's curve by one.
+	float scl = 1.0f / (cHBound - cLBound);
+	size_t n = bufImg.size / 3;
+	
+	//The shaped pixel never leaves registers - no intermediate frame.
+	{
+		py::gil_scoped_release release;
+		
+		withStorage(isHalf, bufImg, bufOut, [&](auto *ptrImg, auto *ptrOut) {
+			#pragma omp parallel for
+			for (size_t i = 0; i < n; i++) {
+				float	r = lerpLUT(ptrShaper, shaperSize, shaperChans, load(ptrImg, chan(i, 0, n, planar)), sLBound, sHBound),
+						g = lerpLUT(ptrShaper + cOff, shaperSize, shaperChans, load(ptrImg, chan(i, 1, n, planar)), sLBound, sHBound),
+						b = lerpLUT(ptrShaper + 2 * cOff, shaperSize, shaperChans, load(ptrImg, chan(i, 2, n, planar)), sLBound, sHBound),
+						rgb[3];
+				
+				lerpCube(ptrCube, size, (r - cLBound) * scl, (g - cLBound) * scl, (b - cLBound) * scl, rgb);
+				
+				for (int c = 0; c < 3; c++) store(ptrOut, chan(i, c, n, planar), rgb[c]);
+			}
+		});
+	}
+	
+	return result;
+}
+
+
+//loadMat reads a flattened 3x3 or 3x4 (affine) matrix into a 3x4 matrix, with zero offsets for 3x3 matrices.
+inline void loadMat(const float *ptrMat, size_t matSize, float *m) {
+	if (matSize != 9 && matSize != 12) throw std::invalid_argument("Color matrices must be flattened 3x3 or 3x4 (affine) matrices!");
+	
+	size_t cols = matSize / 3;
+	for (size_t row = 0; row < 3; row++) {
+		for (size_t col = 0; col < 4; col++) {
+			m[row * 4 + col] = col < cols ? ptrMat[row * cols + col] : 0.0f;
+		}
+	}
 }
 
+//mulMat multiplies r, g, b by a 3x4 matrix from loadMat. Indices are:
+/*	0	1	2	3
+*	4	5	6	7
+* 	8	9	10	11
+*/
+inline void mulMat(const float *m, float r, float g, float b, float *out) {
+	out[0] = r * m[0] + g * m[1] + b * m[2] + m[3]; //Red
+	out[1] = r * m[4] + g * m[5] + b * m[6] + m[7]; //Green
+	out[2] = r * m[8] + g * m[9] + b * m[10] + m[11]; //Blue
+}
 
-//matr takes a flattened image array and a flattened 3x3 matrix.
-py::array_t<float> matr(py::array_t<float> img, py::array_t<float> mat) {
+//matr takes an image array of any shape whose last axis is r, g, b (or a flattened one), and a flattened 3x3 or 3x4 (affine) matrix.
+//The output has the input's shape; there's no need to reshape batches of frames or point clouds.
+//Planar images have r, g, b as their first axis instead, like (3, height, width).
+py::array matr(py::array arr, py::array_t<float, py::array::c_style | py::array::forcecast> mat, bool planar, py::object out) {
+	bool isHalf;
+	py::array img = imgIn(arr, isHalf);
 	py::buffer_info bufImg = img.request(), bufMat = mat.request();
 	
-	//To use with an image, MAKE SURE to flatten the 3D array to a 1D array, then back out to a 3D array after.
-	if (bufImg.ndim == 1 && bufMat.ndim == 1) {
-		//Make numpy allocate the buffer of the new array.
-		auto result = py::array_t<float>(bufImg.size);
+	if (bufImg.ndim == 0 || bufImg.size % 3 != 0 || (bufImg.ndim > 1 && bufImg.shape[planar ? 0 : bufImg.ndim - 1] != 3)) {
+		throw std::invalid_argument(planar ? "matr needs a planar image array whose first axis is r, g, b!" : "matr needs an image array whose last axis is r, g, b!");
+	}
+	
+	//Make numpy allocate the buffer of the new array, with the same shape.
+	py::array result = imgOut(bufImg.shape, isHalf, out);
+	
+	//Get the bufOut pointers that we can manipulate from C++.
+	auto bufOut = result.request();
+	
+	float m[12];
+	loadMat((float *) bufMat.ptr, bufMat.size, m);
+	
+	size_t n = bufImg.size / 3;
+	
+	//We flatly (parallelly) iterate by pixels - r, g, b. To do matrix math. Yay!
+	{
+		py::gil_scoped_release release;
 		
-		//Get the bufOut pointers that we can manipulate from C++.
-		auto bufOut = result.request();
+		withStorage(isHalf, bufImg, bufOut, [&](auto *ptrImg, auto *ptrOut) {
+			#pragma omp parallel for
+			for (size_t i = 0; i < n; i++) {
+				float rgb[3];
+				mulMat(m, load(ptrImg, chan(i, 0, n, planar)), load(ptrImg, chan(i, 1, n, planar)), load(ptrImg, chan(i, 2, n, planar)), rgb);
+				
+				for (int c = 0; c < 3; c++) store(ptrOut, chan(i, c, n, planar), rgb[c]);
+			}
+		});
+	}
+	
+	return result;
+}
+
+//curvematr applies a 1D LUT, then a 3x3 or 3x4 matrix, then another 1D LUT, per pixel, in one pass. The classic IDT/ODT shape.
+//Each LUT is flattened, with 1 or 3 channels; 0 channels skips it. The image may be planar.
+py::array curvematr(	py::array arr,
+						py::array_t<float, py::array::c_style | py::array::forcecast> pre, int preChans, float preLBound, float preHBound,
+						py::array_t<float, py::array::c_style | py::array::forcecast> mat,
+						py::array_t<float, py::array::c_style | py::array::forcecast> post, int postChans, float postLBound, float postHBound, bool planar, py::object out) {
+	bool isHalf;
+	py::array img = imgIn(arr, isHalf);
+	py::buffer_info bufImg = img.request(), bufPre = pre.request(), bufMat = mat.request(), bufPost = post.request();
+	
+	if (bufImg.ndim != 1 || bufImg.size % 3 != 0 || preChans < 0 || preChans > 3 || postChans < 0 || postChans > 3 || preChans == 2 || postChans == 2) {
+		throw std::invalid_argument("curvematr needs a flattened RGB image, and 0, 1 or 3 channel flattened LUTs!");
+	}
+	
+	py::array result = imgOut({bufImg.size}, isHalf, out);
+	auto bufOut = result.request();
+	
+	float 	*ptrPre = (float *) bufPre.ptr,
+			*ptrPost = (float *) bufPost.ptr;
+	
+	float m[12];
+	loadMat((float *) bufMat.ptr, bufMat.size, m);
+	
+	size_t	preSize = preChans ? bufPre.size / preChans : 0, preOff = preChans == 3 ? 1 : 0,
+			postSize = postChans ? bufPost.size / postChans : 0, postOff = postChans == 3 ? 1 : 0,
+			n = bufImg.size / 3;
+	
+	{
+		py::gil_scoped_release release;
 		
-		float 	*ptrImg = (float *) bufImg.ptr,
-				*ptrMat = (float *) bufMat.ptr,
-				*ptrOut = (float *) bufOut.ptr;
+		withStorage(isHalf, bufImg, bufOut, [&](auto *ptrImg, auto *ptrOut) {
+			#pragma omp parallel for
+			for (size_t i = 0; i < n; i++) {
+				float	rgb[3] = {load(ptrImg, chan(i, 0, n, planar)), load(ptrImg, chan(i, 1, n, planar)), load(ptrImg, chan(i, 2, n, planar))},
+						mixed[3];
+				
+				if (preChans) {
+					for (int c = 0; c < 3; c++) rgb[c] = lerpLUT(ptrPre + c * preOff, preSize, preChans, rgb[c], preLBound, preHBound);
+				}
+				
+				mulMat(m, rgb[0], rgb[1], rgb[2], mixed);
+				
+				if (postChans) {
+					for (int c = 0; c < 3; c++) mixed[c] = lerpLUT(ptrPost + c * postOff, postSize, postChans, mixed[c], postLBound, postHBound);
+				}
+				
+				for (int c = 0; c < 3; c++) store(ptrOut, chan(i, c, n, planar), mixed[c]);
+			}
+		});
+	}
+	
+	return result;
+}
+
+//cdl applies an ASC CDL per pixel in one pass: slope, offset & power per channel, then saturation around Rec709 luma.
+//sop is (slope r, g, b, offset r, g, b, power r, g, b). With clamp, values clamp to [0, 1] after SOP & after saturation, as the
+//ASC specifies. Without, negative values skip the power, and nothing clamps. The image may be planar.
+py::array cdl(py::array arr, py::array_t<float, py::array::c_style | py::array::forcecast> sop, float sat, bool clamp, bool planar, py::object out) {
+	bool isHalf;
+	py::array img = imgIn(arr, isHalf);
+	py::buffer_info bufImg = img.request(), bufSop = sop.request();
+	
+	if (bufImg.ndim != 1 || bufImg.size % 3 != 0 || bufSop.size != 9) {
+		throw std::invalid_argument("cdl needs a flattened RGB image, and 9 slope, offset & power values!");
+	}
+	
+	py::array result = imgOut({bufImg.size}, isHalf, out);
+	auto bufOut = result.request();
+	
+	const float *p = (const float *) bufSop.ptr;
+	float	slope[3] = {p[0], p[1], p[2]}, offset[3] = {p[3], p[4], p[5]}, power[3] = {p[6], p[7], p[8]},
+			luma[3] = {0.2126f, 0.7152f, 0.0722f};
+	size_t n = bufImg.size / 3;
+	
+	{
+		py::gil_scoped_release release;
 		
-		//We flatly (parallelly) iterate by threes - r, g, b. To do matrix math. Yay!
-		#pragma omp parallel for
-		for (size_t i = 0; i < bufImg.shape[0]; i+=3) {
-			//~ std::cout << g_func(ptrImg[i]) << std::endl;
-			//~ std::cout << g_func(ptrImg[i]) << std::endl;
-			
-			/* Remember: We're dealing with a flattened matrix here. Indices for ptrMat:
-			*	0	1	2
-			*	3	4	5
-			* 	6	7	8
-			*/
+		withStorage(isHalf, bufImg, bufOut, [&](auto *ptrImg, auto *ptrOut) {
+			#pragma omp parallel for
+			for (size_t i = 0; i < n; i++) {
+				float rgb[3];
+				
+				for (int c = 0; c < 3; c++) {
+					float v = load(ptrImg, chan(i, c, n, planar)) * slope[c] + offset[c];
+					if (clamp) v = std::min(std::max(v, 0.0f), 1.0f);
+					rgb[c] = (v > 0.0f && power[c] != 1.0f) ? powf(v, power[c]) : v;
+				}
+				
+				float y = luma[0] * rgb[0] + luma[1] * rgb[1] + luma[2] * rgb[2];
+				
+				for (int c = 0; c < 3; c++) {
+					float v = y + sat * (rgb[c] - y);
+					if (clamp) v = std::min(std::max(v, 0.0f), 1.0f);
+					store(ptrOut, chan(i, c, n, planar), v);
+				}
+			}
+		});
+	}
+	
+	return result;
+}
+
+//stats scans an RGB image array (any shape, last axis r, g, b) once, returning per-channel statistics as a dict of numpy arrays.
+//min, max and mean only count finite values. Finite values outside [lBound, hBound] are counted, and land in the edge bins of the histogram.
+py::dict stats(py::array_t<float, py::array::c_style | py::array::forcecast> img, size_t bins, float lBound, float hBound) {
+	py::buffer_info bufImg = img.request();
+	
+	if (bufImg.ndim == 0 || bufImg.size % 3 != 0 || (bufImg.ndim > 1 && bufImg.shape[bufImg.ndim - 1] != 3) || bins == 0 || !(hBound > lBound)) {
+		throw std::invalid_argument("stats needs an image array whose last axis is r, g, b, at least one bin, and hBound > lBound!");
+	}
+	
+	float *ptrImg = (float *) bufImg.ptr;
+	size_t size = bufImg.size;
+	float scl = bins / (hBound - lBound);
+	
+	double		vMin[3] = {INFINITY, INFINITY, INFINITY}, vMax[3] = {-INFINITY, -INFINITY, -INFINITY}, vSum[3] = {0, 0, 0};
+	long long	nFinite[3] = {0, 0, 0}, nNan[3] = {0, 0, 0}, nInf[3] = {0, 0, 0}, nUnder[3] = {0, 0, 0}, nOver[3] = {0, 0, 0};
+	std::vector<long long> hist(3 * bins, 0);
+	
+	//Each thread reduces into its own accumulators, which are merged once at the end.
+	{
+		py::gil_scoped_release release;
+		
+		#pragma omp parallel
+		{
+			double		tMin[3] = {INFINITY, INFINITY, INFINITY}, tMax[3] = {-INFINITY, -INFINITY, -INFINITY}, tSum[3] = {0, 0, 0};
+			long long	tFinite[3] = {0, 0, 0}, tNan[3] = {0, 0, 0}, tInf[3] = {0, 0, 0}, tUnder[3] = {0, 0, 0}, tOver[3] = {0, 0, 0};
+			std::vector<long long> tHist(3 * bins, 0);
 			
-			float	r = ptrImg[i],
-					g = ptrImg[i + 1],
-					b = ptrImg[i + 2];
+			#pragma omp for nowait
+			for (size_t i = 0; i < size; i+=3) {
+				for (int c = 0; c < 3; c++) {
+					float val = ptrImg[i + c];
+					
+					if (std::isnan(val)) { tNan[c]++; continue; }
+					if (std::isinf(val)) { tInf[c]++; continue; }
+					
+					if (val < tMin[c]) tMin[c] = val;
+					if (val > tMax[c]) tMax[c] = val;
+					tSum[c] += val;
+					tFinite[c]++;
+					
+					long long bin;
+					if (val < lBound) { tUnder[c]++; bin = 0; }
+					else if (val > hBound) { tOver[c]++; bin = bins - 1; }
+					else {
+						bin = (long long)((val - lBound) * scl);
+						if (bin >= (long long)bins) bin = bins - 1; //hBound itself goes in the last bin.
+					}
+					
+					tHist[c * bins + bin]++;
+				}
+			}
 			
-			ptrOut[i] = r * ptrMat[0] + g * ptrMat[1] + b * ptrMat[2]; //Red
-			ptrOut[i + 1] = r * ptrMat[3] + g * ptrMat[4] + b * ptrMat[5]; //Green
-			ptrOut[i + 2] = r * ptrMat[6] + g * ptrMat[7] + b * ptrMat[8]; //Blue
+			#pragma omp critical
+			{
+				for (int c = 0; c < 3; c++) {
+					if (tMin[c] < vMin[c]) vMin[c] = tMin[c];
+					if (tMax[c] > vMax[c]) vMax[c] = tMax[c];
+					vSum[c] += tSum[c];
+					nFinite[c] += tFinite[c]; nNan[c] += tNan[c]; nInf[c] += tInf[c]; nUnder[c] += tUnder[c]; nOver[c] += tOver[c];
+				}
+				for (size_t b = 0; b < 3 * bins; b++) hist[b] += tHist[b];
+			}
 		}
+	}
+	
+	py::array_t<double> aMin(3), aMax(3), aMean(3);
+	py::array_t<long long> aFinite(3), aNan(3), aInf(3), aUnder(3), aOver(3), aHist({(size_t) 3, bins});
+	
+	for (int c = 0; c < 3; c++) {
+		aMin.mutable_at(c) = nFinite[c] ? vMin[c] : NAN;
+		aMax.mutable_at(c) = nFinite[c] ? vMax[c] : NAN;
+		aMean.mutable_at(c) = nFinite[c] ? vSum[c] / nFinite[c] : NAN;
+		aFinite.mutable_at(c) = nFinite[c]; aNan.mutable_at(c) = nNan[c]; aInf.mutable_at(c) = nInf[c];
+		aUnder.mutable_at(c) = nUnder[c]; aOver.mutable_at(c) = nOver[c];
+	}
+	std::copy(hist.begin(), hist.end(), aHist.mutable_data());
+	
+	py::dict result;
+	result["min"] = aMin; result["max"] = aMax; result["mean"] = aMean;
+	result["finite"] = aFinite; result["nan"] = aNan; result["inf"] = aInf;
+	result["under"] = aUnder; result["over"] = aOver;
+	result["hist"] = aHist;
+	
+	return result;
+}
+
+
+//labCIE converts linear r, g, b to CIE L*a*b*, through a 3x3 matrix to XYZ. The white point is the matrix applied to (1, 1, 1).
+inline void labCIE(const float *m, const double *white, double r, double g, double b, double *lab) {
+	double xyz[3] = {	(r * m[0] + g * m[1] + b * m[2]) / white[0],
+						(r * m[3] + g * m[4] + b * m[5]) / white[1],
+						(r * m[6] + g * m[7] + b * m[8]) / white[2]	};
+	
+	for (int c = 0; c < 3; c++) {
+		xyz[c] = xyz[c] > 216.0 / 24389.0 ? cbrt(xyz[c]) : xyz[c] * (24389.0 / 27.0) / 116.0 + 16.0 / 116.0;
+	}
+	
+	lab[0] = 116.0 * xyz[1] - 16.0;
+	lab[1] = 500.0 * (xyz[0] - xyz[1]);
+	lab[2] = 200.0 * (xyz[1] - xyz[2]);
+}
+
+//deltaE2000 is the CIEDE2000 color difference of two L*a*b* colors. See http://www2.ece.rochester.edu/~gsharma/ciede2000/ .
+inline double deltaE2000(const double *lab1, const double *lab2) {
+	const double deg = M_PI / 180.0, pow25_7 = 6103515625.0; //25^7
+	
+	double	C1 = sqrt(lab1[1] * lab1[1] + lab1[2] * lab1[2]),
+			C2 = sqrt(lab2[1] * lab2[1] + lab2[2] * lab2[2]),
+			Cbar7 = pow((C1 + C2) / 2.0, 7.0),
+			G = 0.5 * (1.0 - sqrt(Cbar7 / (Cbar7 + pow25_7)));
+	
+	double	a1 = (1.0 + G) * lab1[1], a2 = (1.0 + G) * lab2[1],
+			C1p = sqrt(a1 * a1 + lab1[2] * lab1[2]), C2p = sqrt(a2 * a2 + lab2[2] * lab2[2]),
+			h1p = (a1 == 0.0 && lab1[2] == 0.0) ? 0.0 : atan2(lab1[2], a1) / deg,
+			h2p = (a2 == 0.0 && lab2[2] == 0.0) ? 0.0 : atan2(lab2[2], a2) / deg;
+	
+	if (h1p < 0.0) h1p += 360.0;
+	if (h2p < 0.0) h2p += 360.0;
+	
+	//Hue difference & mean hue, going the short way around the circle.
+	double dhp = 0.0, hBarp = h1p + h2p;
+	if (C1p * C2p != 0.0) {
+		dhp = h2p - h1p;
+		if (dhp > 180.0) dhp -= 360.0;
+		else if (dhp < -180.0) dhp += 360.0;
 		
-		return result;
+		if (fabs(h1p - h2p) <= 180.0) hBarp = (h1p + h2p) / 2.0;
+		else hBarp = (h1p + h2p < 360.0) ? (h1p + h2p + 360.0) / 2.0 : (h1p + h2p - 360.0) / 2.0;
+	}
+	
+	double	dLp = lab2[0] - lab1[0],
+			dCp = C2p - C1p,
+			dHp = 2.0 * sqrt(C1p * C2p) * sin(dhp / 2.0 * deg);
+	
+	double	LBarp50 = (lab1[0] + lab2[0]) / 2.0 - 50.0,
+			CBarp = (C1p + C2p) / 2.0,
+			CBarp7 = pow(CBarp, 7.0);
+	
+	double	T = 1.0 - 0.17 * cos((hBarp - 30.0) * deg) + 0.24 * cos(2.0 * hBarp * deg) + 0.32 * cos((3.0 * hBarp + 6.0) * deg) - 0.20 * cos((4.0 * hBarp - 63.0) * deg),
+			dTheta = 30.0 * exp(-((hBarp - 275.0) / 25.0) * ((hBarp - 275.0) / 25.0)),
+			RC = 2.0 * sqrt(CBarp7 / (CBarp7 + pow25_7)),
+			SL = 1.0 + 0.015 * LBarp50 * LBarp50 / sqrt(20.0 + LBarp50 * LBarp50),
+			SC = 1.0 + 0.045 * CBarp,
+			SH = 1.0 + 0.015 * CBarp * T,
+			RT = -sin(2.0 * dTheta * deg) * RC;
+	
+	double tL = dLp / SL, tC = dCp / SC, tH = dHp / SH;
+	return sqrt(tL * tL + tC * tC + tH * tH + RT * tC * tH);
+}
+
+//compare reduces the difference of two same-shaped RGB image arrays (last axis r, g, b) in one pass, without making a difference image.
+//Per channel: max & mean absolute error and mean squared error. With deltaE, also the mean & max CIEDE2000, through the flattened 3x3 xyzMat.
+py::dict compare(	py::array_t<float, py::array::c_style | py::array::forcecast> imgA,
+					py::array_t<float, py::array::c_style | py::array::forcecast> imgB,
+					py::array_t<float, py::array::c_style | py::array::forcecast> xyzMat, bool deltaE) {
+	py::buffer_info bufA = imgA.request(), bufB = imgB.request(), bufMat = xyzMat.request();
+	
+	if (bufA.shape != bufB.shape || bufA.ndim == 0 || bufA.size % 3 != 0 || (bufA.ndim > 1 && bufA.shape[bufA.ndim - 1] != 3)) {
+		throw std::invalid_argument("compare needs two same-shaped image arrays whose last axis is r, g, b!");
+	}
+	if (deltaE && bufMat.size != 9) throw std::invalid_argument("compare needs a flattened 3x3 XYZ matrix for deltaE!");
+	
+	float	*ptrA = (float *) bufA.ptr,
+			*ptrB = (float *) bufB.ptr,
+			*m = (float *) bufMat.ptr;
+	size_t size = bufA.size;
+	
+	double white[3] = {1.0, 1.0, 1.0};
+	if (deltaE) {
+		for (int c = 0; c < 3; c++) white[c] = (double)m[c * 3] + m[c * 3 + 1] + m[c * 3 + 2];
 	}
+	
+	double vMaxAbs[3] = {0, 0, 0}, vSumAbs[3] = {0, 0, 0}, vSumSq[3] = {0, 0, 0}, vSumDE = 0, vMaxDE = 0;
+	
+	//Each thread reduces into its own accumulators, which are merged once at the end.
+	{
+		py::gil_scoped_release release;
+		
+		#pragma omp parallel
+		{
+			double tMaxAbs[3] = {0, 0, 0}, tSumAbs[3] = {0, 0, 0}, tSumSq[3] = {0, 0, 0}, tSumDE = 0, tMaxDE = 0;
+			
+			#pragma omp for nowait
+			for (size_t i = 0; i < size; i+=3) {
+				for (int c = 0; c < 3; c++) {
+					double diff = (double)ptrA[i + c] - ptrB[i + c], absDiff = fabs(diff);
+					
+					if (absDiff > tMaxAbs[c]) tMaxAbs[c] = absDiff;
+					tSumAbs[c] += absDiff;
+					tSumSq[c] += diff * diff;
+				}
+				
+				if (deltaE) {
+					double labA[3], labB[3];
+					labCIE(m, white, ptrA[i], ptrA[i + 1], ptrA[i + 2], labA);
+					labCIE(m, white, ptrB[i], ptrB[i + 1], ptrB[i + 2], labB);
+					
+					double dE = deltaE2000(labA, labB);
+					tSumDE += dE;
+					if (dE > tMaxDE) tMaxDE = dE;
+				}
+			}
+			
+			#pragma omp critical
+			{
+				for (int c = 0; c < 3; c++) {
+					if (tMaxAbs[c] > vMaxAbs[c]) vMaxAbs[c] = tMaxAbs[c];
+					vSumAbs[c] += tSumAbs[c];
+					vSumSq[c] += tSumSq[c];
+				}
+				vSumDE += tSumDE;
+				if (tMaxDE > vMaxDE) vMaxDE = tMaxDE;
+			}
+		}
+	}
+	
+	double pixels = size / 3 ? size / 3 : 1;
+	py::array_t<double> aMaxAbs(3), aMeanAbs(3), aMSE(3);
+	
+	for (int c = 0; c < 3; c++) {
+		aMaxAbs.mutable_at(c) = vMaxAbs[c];
+		aMeanAbs.mutable_at(c) = vSumAbs[c] / pixels;
+		aMSE.mutable_at(c) = vSumSq[c] / pixels;
+	}
+	
+	py::dict result;
+	result["maxAbs"] = aMaxAbs; result["meanAbs"] = aMeanAbs; result["mse"] = aMSE;
+	if (deltaE) {
+		result["dE2000"] = vSumDE / pixels;
+		result["dE2000Max"] = vMaxDE;
+	}
+	
+	return result;
 }
 
+
 //grey_to_rgb takes a flattened greyscale image array and outputs a flattened numpy image array.
 py::array_t<float> grey_to_rgb(py::array_t<float> arr) {
 	py::buffer_info bufIn = arr.request();
@@ -160,17 +985,23 @@ py::array_t<float> grey_to_rgb(py::array_t<float> arr) {
 				*ptrOut = (float *) bufOut.ptr;
 		
 		//The reason for all this bullshit as opposed to vectorizing is this pragma!!!
-		#pragma omp parallel for
-		for (size_t i = 0; i < bufOut.shape[0]; i+=3) {
-			float val = ptrIn[(i+1)/3 - 1]; //Little bit of indexing math to get the value; remember we're skipping by threes.
+		{
+			py::gil_scoped_release release;
 			
-			ptrOut[i] = val;
-			ptrOut[i + 1] = val;
-			ptrOut[i + 2] = val;
+			#pragma omp parallel for
+			for (size_t i = 0; i < bufOut.shape[0]; i+=3) {
+				float val = ptrIn[i / 3]; //Little bit of indexing math to get the value; remember we're skipping by threes.
+				
+				ptrOut[i] = val;
+				ptrOut[i + 1] = val;
+				ptrOut[i + 2] = val;
+			}
 		}
 		
 		return result;
 	}
+	
+	throw std::invalid_argument("grey_to_rgb needs a flattened array!");
 }
 
 
@@ -181,16 +1012,86 @@ PYBIND11_PLUGIN(olOpt) {
 	
 	mod.def(	"gam",
 				&gam,
-				"Apply any one-argument C++ function to a flattened numpy array; vectorized & parallel.",
+				"Apply any one-argument C++ function to a flattened numpy array; vectorized & parallel. Writes into out, if given - which may be the input.",
 				py::arg("arr"),
-				py::arg("g_func")
+				py::arg("g_func"),
+				py::arg("out") = py::none()
+	);
+	
+	mod.def(	"curve",
+				&curve,
+				"Apply a parametric curve (see openlut.gamma.ParamCurve) of some kind & parameters, or its inverse, to a flattened numpy array; vectorized & parallel. Writes into out, if given - which may be the input.",
+				py::arg("arr"),
+				py::arg("kind"),
+				py::arg("params"),
+				py::arg("inverse") = false,
+				py::arg("out") = py::none()
+	);
+	
+	mod.def(	"expr",
+				&expr,
+				"Evaluate compiled expression bytecode (see openlut.lib.expr) over a flattened numpy array; vectorized & parallel. Writes into out, if given - which may be the input.",
+				py::arg("arr"),
+				py::arg("code"),
+				py::arg("consts"),
+				py::arg("nRegs"),
+				py::arg("result"),
+				py::arg("out") = py::none()
 	);
 	
 	mod.def(	"matr",
 				&matr,
-				"Apply any flattened color matrix to a flattened numpy image array; vectorized & parallel.",
+				"Apply any flattened 3x3 or 3x4 (affine) color matrix to a numpy array whose last axis is r, g, b (or first, if planar); vectorized & parallel. Writes into out, if given - which may be the input.",
+				py::arg("img"),
+				py::arg("mat"),
+				py::arg("planar") = false,
+				py::arg("out") = py::none()
+	);
+	
+	mod.def(	"curvematr",
+				&curvematr,
+				"Apply a flattened 1D LUT, a flattened 3x3 or 3x4 matrix, then another flattened 1D LUT to a flattened numpy RGB image array (interleaved, or planar) in one pass; vectorized & parallel. Writes into out, if given - which may be the input.",
 				py::arg("img"),
-				py::arg("mat")
+				py::arg("pre"),
+				py::arg("preChans"),
+				py::arg("preLBound"),
+				py::arg("preHBound"),
+				py::arg("mat"),
+				py::arg("post"),
+				py::arg("postChans"),
+				py::arg("postLBound"),
+				py::arg("postHBound"),
+				py::arg("planar") = false,
+				py::arg("out") = py::none()
+	);
+	
+	mod.def(	"cdl",
+				&cdl,
+				"Apply an ASC CDL - flattened slope, offset & power, then saturation - to a flattened numpy RGB image array (interleaved, or planar) in one pass; vectorized & parallel. Writes into out, if given - which may be the input.",
+				py::arg("img"),
+				py::arg("sop"),
+				py::arg("sat"),
+				py::arg("clamp") = true,
+				py::arg("planar") = false,
+				py::arg("out") = py::none()
+	);
+	
+	mod.def(	"stats",
+				&stats,
+				"Scan a numpy RGB image array once for per-channel min, max, mean, finite/NaN/inf/out-of-range counts and a histogram; parallel.",
+				py::arg("img"),
+				py::arg("bins"),
+				py::arg("lBound"),
+				py::arg("hBound")
+	);
+	
+	mod.def(	"compare",
+				&compare,
+				"Compare two same-shaped numpy RGB image arrays in one pass: per-channel max/mean absolute & squared error, optionally CIEDE2000; parallel.",
+				py::arg("imgA"),
+				py::arg("imgB"),
+				py::arg("xyzMat"),
+				py::arg("deltaE")
 	);
 	
 	mod.def(	"grey_to_rgb",
@@ -201,11 +1102,51 @@ PYBIND11_PLUGIN(olOpt) {
 	
 	mod.def(	"lut1dlin",
 				&lut1dlin,
-				"Apply any 1D LUT to a flattened numpy image array; vectorized & parallel.",
+				"Apply any 1D LUT to a flattened numpy image array; vectorized & parallel. Writes into out, if given - which may be the input.",
 				py::arg("img"),
 				py::arg("lut"),
 				py::arg("lBound"),
-				py::arg("hBound")
+				py::arg("hBound"),
+				py::arg("out") = py::none()
+	);
+	
+	mod.def(	"lut1dlin3",
+				&lut1dlin3,
+				"Apply a per-channel (size, 3) 1D LUT, flattened, to a flattened numpy RGB image array (interleaved, or planar) in one pass; vectorized & parallel. Writes into out, if given - which may be the input.",
+				py::arg("img"),
+				py::arg("lut"),
+				py::arg("lBound"),
+				py::arg("hBound"),
+				py::arg("planar") = false,
+				py::arg("out") = py::none()
+	);
+	
+	mod.def(	"lut3dlin",
+				&lut3dlin,
+				"Apply a flattened (size, size, size, 3) 3D LUT to a flattened numpy RGB image array (interleaved, or planar), with trilinear interpolation; vectorized & parallel. Writes into out, if given - which may be the input.",
+				py::arg("img"),
+				py::arg("cube"),
+				py::arg("size"),
+				py::arg("lBound"),
+				py::arg("hBound"),
+				py::arg("planar") = false,
+				py::arg("out") = py::none()
+	);
+	
+	mod.def(	"lut3dshaper",
+				&lut3dshaper,
+				"Apply a flattened 1D shaper LUT, then a flattened 3D LUT, to a flattened numpy RGB image array (interleaved, or planar) in one pass; vectorized & parallel. Writes into out, if given - which may be the input.",
+				py::arg("img"),
+				py::arg("shaper"),
+				py::arg("shaperChans"),
+				py::arg("sLBound"),
+				py::arg("sHBound"),
+				py::arg("cube"),
+				py::arg("size"),
+				py::arg("cLBound"),
+				py::arg("cHBound"),
+				py::arg("planar") = false,
+				py::arg("out") = py::none()
 	);
 	
 	
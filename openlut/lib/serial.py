@@ -0,0 +1,239 @@
+'''
+Compact, versioned binary serialization of Transforms, for handing them to other processes cheaply.
+
+The format is a small header - the magic bytes OLTF, then a format version byte - followed by one node per Transform:
+a tag byte, then its parameters. Arrays are raw little-endian data behind a dtype, shape & alignment padding. Composite
+Transforms hold their parts as nested nodes. Builtin olOpt functions are stored by name, importable Python functions by
+module & qualified name, and other functions (ex. lambdas) as marshalled bytecode, which only loads on the same Python version.
+'''
+
+import importlib
+import marshal
+import struct
+import sys
+import types
+
+import numpy as np
+
+from . import olOpt as olo
+from ..gamma import ParamCurve
+
+MAGIC = b'OLTF'
+VERSION = 4 #2: Func backends. 3: Expression strings. 4: Parametric curves.
+
+_tags = dict() #Class --> tag.
+_classes = dict() #Tag --> class.
+
+def register(cls, tag) :
+	'''
+	Make a Transform class serializable, under a one byte tag. The class needs methods _dump(self, w), which writes its
+	parameters to a :py:class:`Writer`, and _load(r), which reads them back from a :py:class:`Reader` as a new Transform.
+	'''
+	if tag in _classes and _classes[tag] is not cls: raise ValueError('The serialization tag {} is taken!'.format(tag))
+
+	_tags[cls] = tag
+	_classes[tag] = cls
+
+class Writer :
+	'''
+	Appends the parts of a serialized Transform. Exact writers store every Python function as bytecode, even importable
+	ones, so the output changes when the function does - for hashing, not loading elsewhere.
+	'''
+	def __init__(self, exact = False) :
+		self.chunks = []
+		self.size = 0
+		self.exact = exact
+
+	def raw(self, data) :
+		self.chunks.append(data)
+		self.size += len(data)
+
+	def pack(self, fmt, *vals) :
+		self.raw(struct.pack('<' + fmt, *vals))
+
+	def optFloat(self, val) :
+		self.pack('?d', val is not None, val if val is not None else 0.0)
+
+	def str(self, val) :
+		data = val.encode('utf-8')
+		self.pack('I', len(data))
+		self.raw(data)
+
+	def array(self, arr) :
+		arr = np.ascontiguousarray(arr)
+		if arr.dtype.kind != 'f': arr = arr.astype(np.float64)
+
+		self.pack('cB', arr.dtype.char.encode(), arr.ndim)
+		self.pack('{}I'.format(arr.ndim), *arr.shape)
+		self.raw(bytes((-self.size) % 8)) #Align the data to 8 bytes.
+		self.raw(arr.astype(arr.dtype.newbyteorder('<'), copy=False).tobytes())
+
+	def node(self, transform) :
+		if transform is None :
+			self.raw(b'\x00')
+			return
+
+		if type(transform) not in _tags :
+			raise ValueError('{} Transforms can\'t be serialized!'.format(type(transform).__name__))
+
+		self.raw(_tags[type(transform)])
+		transform._dump(self)
+
+class Reader :
+	'''
+	Reads back the parts of a serialized Transform.
+	'''
+	def __init__(self, data) :
+		self.data = memoryview(data).cast('B')
+		self.pos = 0
+		self.version = VERSION #The format version being read, for _load to read older formats.
+
+	def raw(self, n) :
+		if self.pos + n > len(self.data): raise ValueError('The serialized Transform is truncated!')
+
+		self.pos += n
+		return self.data[self.pos - n:self.pos]
+
+	def unpack(self, fmt) :
+		return struct.unpack_from('<' + fmt, self.raw(struct.calcsize('<' + fmt)))
+
+	def optFloat(self) :
+		present, val = self.unpack('?d')
+		return val if present else None
+
+	def str(self) :
+		return bytes(self.raw(*self.unpack('I'))).decode('utf-8')
+
+	def array(self) :
+		char, ndim = self.unpack('cB')
+		shape = self.unpack('{}I'.format(ndim))
+		self.raw((-self.pos) % 8)
+
+		dtype = np.dtype(char.decode()).newbyteorder('<')
+		arr = np.frombuffer(self.raw(dtype.itemsize * int(np.prod(shape))), dtype=dtype).reshape(shape)
+
+		#Writable buffers (ex. shared memory) are viewed as they are; anything else is copied, so arrays stay writable.
+		return arr.astype(arr.dtype.newbyteorder('='), copy=self.data.readonly)
+
+	def node(self) :
+		tag = bytes(self.raw(1))
+		if tag == b'\x00': return None
+
+		if tag not in _classes: raise ValueError('Unknown serialized Transform type {}!'.format(tag))
+		return _classes[tag]._load(self)
+
+def dumps(transform, exact = False) :
+	'''
+	Serialize a Transform to bytes. See :py:func:`loads` for the inverse. See :py:class:`Writer` for exact.
+
+	:raises ValueError: When the Transform (or a part of it) can't be serialized.
+	'''
+	w = Writer(exact)
+	w.raw(MAGIC)
+	w.pack('B', VERSION)
+	w.node(transform)
+
+	return b''.join(w.chunks)
+
+def loads(data) :
+	'''
+	Deserialize a Transform from bytes - or any buffer - made by :py:func:`dumps`.
+
+	:raises ValueError: When data isn't a serialized Transform, or is from a newer version of openlut.
+	'''
+	r = Reader(data)
+	if bytes(r.raw(len(MAGIC))) != MAGIC: raise ValueError('Not a serialized Transform!')
+
+	r.version, = r.unpack('B')
+	if r.version > VERSION: raise ValueError('Serialized Transform format {} is newer than this openlut\'s ({})!'.format(r.version, VERSION))
+
+	return r.node()
+
+def serializable(transform) :
+	'''
+	True if the Transform's class can be serialized.
+	'''
+	return type(transform) in _tags
+
+#Functions
+def dumpFunc(w, func) :
+	'''
+	Write a one-argument function: builtin olOpt functions by name, expression strings as they are, parametric curves by their
+	parameters, importable functions by module & qualified name, and others as marshalled bytecode.
+	'''
+	if isinstance(func, str) :
+		w.raw(b's') #An expression; see openlut.lib.expr.
+		w.str(func)
+		return
+		
+	if isinstance(func, ParamCurve) :
+		w.raw(b'p')
+		w.pack('B?B', func.kind, func.inverse, len(func.params))
+		w.pack('{}d'.format(len(func.params)), *func.params)
+		return
+		
+	name = getattr(func, '__name__', None)
+	if isinstance(func, types.BuiltinFunctionType) and getattr(olo, name, None) is func :
+		w.raw(b'b')
+		w.str(name)
+		return
+
+	if not isinstance(func, types.FunctionType): raise ValueError('Only olOpt & Python functions can be serialized!')
+
+	try :
+		found = importlib.import_module(func.__module__)
+		for part in func.__qualname__.split('.'): found = getattr(found, part)
+	except Exception :
+		found = None
+
+	if found is func and not w.exact :
+		w.raw(b'i')
+		w.str(func.__module__)
+		w.str(func.__qualname__)
+		return
+
+	if func.__closure__: raise ValueError('Functions with closures can only be serialized when importable!')
+
+	try :
+		code = marshal.dumps((func.__code__, func.__defaults__))
+	except ValueError :
+		raise ValueError('The function\'s default arguments can\'t be serialized!')
+
+	w.raw(b'c')
+	w.pack('BB', *sys.version_info[:2])
+	w.str(func.__module__ or '') #Functions made by exec may have none.
+	w.pack('I', len(code))
+	w.raw(code)
+
+def loadFunc(r) :
+	'''
+	Read back a function written by :py:func:`dumpFunc`.
+	'''
+	kind = bytes(r.raw(1))
+	if kind == b'b': return getattr(olo, r.str())
+	if kind == b's': return r.str()
+	
+	if kind == b'p' :
+		curveKind, inverse, n = r.unpack('B?B')
+		return ParamCurve(curveKind, r.unpack('{}d'.format(n)), inverse)
+
+	if kind == b'i' :
+		found = importlib.import_module(r.str())
+		for part in r.str().split('.'): found = getattr(found, part)
+		return found
+
+	if kind != b'c': raise ValueError('Unknown serialized function type {}!'.format(kind))
+	
+	major, minor = r.unpack('BB')
+	module = r.str()
+	code = r.raw(*r.unpack('I'))
+	if (major, minor) != sys.version_info[:2] :
+		raise ValueError('This function was serialized as bytecode by Python {}.{}; it only loads there!'.format(major, minor))
+
+	try :
+		globs = vars(importlib.import_module(module))
+	except (ImportError, ValueError) :
+		globs = {'__builtins__': __builtins__, 'np': np}
+
+	code, defaults = marshal.loads(bytes(code))
+	return types.FunctionType(code, globs, code.co_name, defaults)
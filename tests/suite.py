@@ -19,9 +19,11 @@ def runTest(inPath, path) :
 	#gamma Functions: sRGB --> Linear.
 	gFunc = Func(gamma.sRGBinv) #A Func Transform object using the sRGB-->Linear gamma formula. Apply to ColMaps!
 	gFuncManualsRGB = Func(lambda val: ((val + 0.055) / 1.055) ** 2.4 if val > 0.04045 else val / 12.92) #It's generic - specify any gamma function, even inline with a lambda!
+	gFuncExprsRGB = Func("x > 0.04045 ? pow((x + 0.055) / 1.055, 2.4) : x / 12.92") #Or write it as an expression, which is compiled to run as fast as the builtins!
+	gFuncParamsRGB = Func(gamma.ParamCurve.linPow(1 / 2.4, 1.055, 0.055, 0.0031308, 12.92).inv()) #Or build it from parameters, natively. Camera curves, like gamma.LogC, are made the same way.
 
 	#LUT from Function: sRGB --> Linear
-	oLut = LUT.lutFunc(gamma.sRGBinv) #A LUT Transform object, created from a gamma function. Size is 16384 by default. LUTs are faster!
+	oLut = LUT.lutFunc(gamma.sRGBinv) #A LUT Transform object, created from a gamma function. Size is 4096 by default; LUT.lutFit finds the smallest accurate size. LUTs are faster!
 	oLut.save(path + '/sRGB-->Lin.cube') #Saves the LUT to a format inferred from the extension. cube only for now!
 
 	#Opening LUTs from .cube files.
@@ -38,6 +40,7 @@ def runTest(inPath, path) :
 	img.apply(lut).save(path + '/openlut_lut-lin-16384.png') #apply applies any color transformation object that inherits from Transform - LUT, Func, ColMat, etc., or make your own! It's easy ;) .
 	img.apply(lut.resized(17)).save(path + '/openlut_lut-lin-17.png') #Why so small? Because spline interpolation automatically turns on. It's identical to the larger LUT!
 	img.apply(mat).save(path + '/openlut_mat.png') #Applies the gamut transformation.
+	img.apply(CDL((1.1, 1.0, 0.9), (0.01, 0.0, -0.02), (0.9, 1.0, 1.1), sat=1.2)).save(path + '/openlut_cdl.png') #An ASC CDL grade, in one pass. CDL.openAll reads every shot's grade from .cdl/.ccc/.cc files.
 
 	#As a proof of concept, here's a long list of transformations that should, in sum, do nothing :) :
 
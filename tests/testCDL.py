@@ -0,0 +1,104 @@
+import os, sys
+
+import unittest as ut
+
+from os import path
+
+import tempfile
+
+import numpy as np
+
+sys.path.insert(0, path.abspath(path.join(path.dirname(__file__), '..')))
+
+from openlut import *
+from openlut.lib import cache
+
+CCC = '''<?xml version="1.0" encoding="UTF-8"?>
+<ColorCorrectionCollection xmlns="urn:ASC:CDL:v1.01">
+	<ColorCorrection id="sh010">
+		<SOPNode>
+			<Description>Warm</Description>
+			<Slope>1.1 1.0 0.9</Slope>
+			<Offset>0.01 0.0 -0.02</Offset>
+			<Power>0.9 1.0 1.1</Power>
+		</SOPNode>
+		<SatNode>
+			<Saturation>1.2</Saturation>
+		</SatNode>
+	</ColorCorrection>
+	<ColorCorrection id="sh020">
+		<SOPNode>
+			<Slope>0.8 0.8 0.8</Slope>
+			<Offset>0 0 0</Offset>
+			<Power>1 1 1</Power>
+		</SOPNode>
+	</ColorCorrection>
+	<ColorCorrection>
+		<SATNode>
+			<Saturation>0</Saturation>
+		</SATNode>
+	</ColorCorrection>
+</ColorCorrectionCollection>
+'''
+
+#Keep the tests out of the user's on-disk cache.
+_cache = None
+
+def setUpModule() :
+	global _cache
+	_cache = (cache.cacheDir(), tempfile.TemporaryDirectory())
+	cache.setCacheDir(_cache[1].name)
+
+def tearDownModule() :
+	cache.setCacheDir(_cache[0])
+	_cache[1].cleanup()
+
+def refCDL(img, cdl) :
+	'''
+	The ASC CDL, in numpy.
+	'''
+	rgb = np.clip(img * cdl.slope + cdl.offset, 0, 1) ** cdl.power
+	luma = (rgb * CDL.LUMA).sum(axis=-1, keepdims=True)
+
+	return np.clip(luma + cdl.sat * (rgb - luma), 0, 1)
+
+class testCDL(ut.TestCase) :
+	def test_sample(self) :
+		img = np.random.rand(32, 48, 3).astype(np.float32) * 1.2 - 0.1
+		cdl = CDL((1.1, 1.0, 0.9), (0.01, 0.0, -0.02), (0.9, 1.0, 1.1), 1.2)
+
+		np.testing.assert_allclose(cdl.sample(img), refCDL(img, cdl), atol=1e-5)
+		np.testing.assert_allclose(cdl.sample(img.transpose(2, 0, 1).copy(), planar=True), refCDL(img, cdl).transpose(2, 0, 1), atol=1e-5)
+		self.assertEqual(cdl.sample(img.astype(np.float16)).dtype, np.float16)
+
+		#Without clamping, negative values pass through the power.
+		self.assertAlmostEqual(float(CDL(power=2.0, clamp=False).sample(np.full((1, 3), -0.5))[0, 0]), -0.5)
+
+		with self.assertRaises(ValueError) :
+			CDL(power=0)
+
+	def test_files(self) :
+		with tempfile.TemporaryDirectory() as tmp :
+			cccPath = path.join(tmp, 'grade.ccc')
+			with open(cccPath, 'w') as f: f.write(CCC)
+
+			cdls = CDL.openAll(cccPath)
+			self.assertEqual(list(cdls), ['sh010', 'sh020', 2]) #Corrections without an ID go by position.
+			self.assertEqual(cdls['sh010'].slope, (1.1, 1.0, 0.9))
+			self.assertEqual(cdls['sh010'].sat, 1.2)
+			self.assertEqual(cdls[2].sat, 0.0)
+
+			self.assertEqual(list(CDL.openAll(cccPath, ids=['sh020'])), ['sh020'])
+			self.assertEqual(CDL.open(cccPath, 'sh020').slope, (0.8, 0.8, 0.8))
+			with self.assertRaises(ValueError) :
+				CDL.open(cccPath, 'sh999')
+
+			#Saved corrections read back the same, and serialize too.
+			CDL.saveAll(cdls.values(), path.join(tmp, 'copy.ccc'))
+			cdls['sh010'].save(path.join(tmp, 'sh010.cc'))
+
+			for cdl in (CDL.open(path.join(tmp, 'copy.ccc')), CDL.open(path.join(tmp, 'sh010.cc')), Transform.loads(cdls['sh010'].dumps())) :
+				self.assertEqual(repr(cdl), repr(cdls['sh010']))
+
+if __name__ == "__main__" :
+	ut.main()
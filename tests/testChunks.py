@@ -0,0 +1,44 @@
+import os, sys
+
+import unittest as ut
+
+from os import path
+
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+sys.path.insert(0, path.abspath(path.join(path.dirname(__file__), '..')))
+
+from openlut.lib import chunks
+
+class testChunks(ut.TestCase) :
+	def test_plan(self) :
+		for shape in ((1080, 1920, 3), (3, 4000, 3), (3, 64, 48), (7,)) :
+			plan = chunks.plan(shape, 4, parts=8, chunkBytes=2 ** 16, keepAxes=(-1,) if len(shape) > 1 else ())
+
+			#Every element is covered exactly once, by views.
+			hits = np.zeros(shape, dtype=np.int32)
+			for chunk in plan :
+				self.assertTrue(np.shares_memory(hits[chunk], hits))
+				hits[chunk] += 1
+			np.testing.assert_array_equal(hits, 1)
+
+			if len(shape) > 1 :
+				self.assertGreaterEqual(len(plan), 8)
+				self.assertLessEqual(max(hits[chunk].nbytes for chunk in plan), 2 ** 16 + hits[0].nbytes) #Up to a row over.
+
+		#Too few rows for the workers: rows are tiled along the next axis.
+		self.assertEqual(len(chunks.plan((3, 4000, 3), 4, parts=12, chunkBytes=0, keepAxes=(-1,))), 12)
+
+	def test_run(self) :
+		arr = np.random.rand(300, 200, 3).astype(np.float32)
+		out = np.empty_like(arr)
+
+		with ThreadPoolExecutor(4) as pool :
+			chunks.run(lambda a, o: np.sqrt(a, out=o), arr, out, executor=pool, chunkBytes=2 ** 14)
+
+		np.testing.assert_array_equal(out, np.sqrt(arr))
+
+if __name__ == "__main__" :
+	ut.main()
@@ -0,0 +1,193 @@
+import os, sys
+
+import unittest as ut
+
+from os import path
+
+import asyncio
+import tempfile
+
+import numpy as np
+
+sys.path.insert(0, path.abspath(path.join(path.dirname(__file__), '..')))
+
+from openlut import *
+from openlut.lib import cache
+
+#Keep the tests out of the user's on-disk cache.
+_cache = None
+
+def setUpModule() :
+	global _cache
+	_cache = (cache.cacheDir(), tempfile.TemporaryDirectory())
+	cache.setCacheDir(_cache[1].name)
+
+def tearDownModule() :
+	cache.setCacheDir(_cache[0])
+	_cache[1].cleanup()
+
+class Gain(Transform) :
+	'''
+	A minimal user Transform, written against the plain sample(self, fSeq).
+	'''
+	def __init__(self, gain) :
+		self.gain = gain
+
+	def sample(self, fSeq) :
+		if np.shape(fSeq)[-1] != 3: raise ValueError('Gain needs interleaved r, g, b!')
+		return np.asarray(fSeq) * np.array([self.gain, 1.0, 1.0], dtype=np.float32)
+
+class testColMap(ut.TestCase) :
+	def test_stats(self) :
+		arr = np.random.rand(64, 48, 3).astype(np.float32) * 1.2 - 0.1
+		arr[0, 0, 0] = np.nan
+		arr[1, 1, 2] = np.inf
+
+		st = ColMap.fromArray(arr).stats(bins=256)
+		finite = np.where(np.isfinite(arr), arr, np.nan)
+
+		np.testing.assert_allclose(st['min'], np.nanmin(finite, axis=(0, 1)), rtol=1e-6)
+		np.testing.assert_allclose(st['max'], np.nanmax(finite, axis=(0, 1)), rtol=1e-6)
+		np.testing.assert_allclose(st['mean'], np.nanmean(finite, axis=(0, 1)), rtol=1e-5)
+		np.testing.assert_array_equal(st['nan'], [1, 0, 0])
+		np.testing.assert_array_equal(st['inf'], [0, 0, 1])
+		np.testing.assert_array_equal(st['under'], np.sum(finite < 0, axis=(0, 1)))
+		np.testing.assert_array_equal(st['hist'].sum(axis=1), st['finite'])
+
+		np.testing.assert_allclose(st['percentiles'][50], np.nanpercentile(finite, 50, axis=(0, 1)), atol=1 / 256)
+
+		#Empty or reversed ranges, and histograms without bins, have no sensible statistics.
+		for kwargs in ({'iRange': (1.0, 1.0)}, {'iRange': (1.0, 0.0)}, {'bins': 0}, {'bins': -1}) :
+			with self.assertRaises(ValueError) :
+				ColMap.fromArray(arr).stats(**kwargs)
+
+	def test_compare(self) :
+		arr = np.random.rand(64, 48, 3).astype(np.float32)
+		img = ColMap.fromArray(arr)
+
+		same = img.compare(img)
+		np.testing.assert_array_equal(same['maxAbs'], 0)
+		self.assertEqual(same['psnr'], np.inf)
+		self.assertEqual(same['dE2000'], 0)
+
+		off = img.compare(arr + 0.01, metrics=('maxAbs', 'meanAbs', 'psnr'))
+		np.testing.assert_allclose(off['maxAbs'], 0.01, rtol=1e-3)
+		np.testing.assert_allclose(off['meanAbs'], 0.01, rtol=1e-3)
+		self.assertAlmostEqual(off['psnr'], 40.0, places=2)
+		self.assertNotIn('dE2000', off)
+
+		#Known CIEDE2000 values: pairs from Sharma, Wu & Dalal's test data, taken from L*a*b* back to linear ACES.
+		M = gamut.XYZ.reshape(3, 3).astype(np.float64)
+		white = M @ np.ones(3)
+
+		def fromLab(L, a, b) :
+			f = np.array([(L + 16) / 116 + a / 500, (L + 16) / 116, (L + 16) / 116 - b / 200])
+			xyz = np.where(f > 6 / 29, f ** 3, (f - 16 / 116) * 116 * 27 / 24389) * white
+			return np.linalg.solve(M, xyz).reshape(1, 1, 3).astype(np.float32)
+
+		for labA, labB, dE in (	((50.0, 2.6772, -79.7751), (50.0, 0.0, -82.7485), 2.0425),
+								((50.0, 0.0, 0.0), (50.0, -1.0, 2.0), 2.3669),
+								((50.0, 2.5, 0.0), (73.0, 25.0, -18.0), 27.1492),
+								((50.0, 2.5, 0.0), (61.0, -5.0, 29.0), 22.8977),
+								((50.0, 2.5, 0.0), (50.0, 3.1736, 0.5854), 1.0000),
+								((60.2574, -34.0099, 36.2677), (60.4626, -34.1751, 39.4387), 1.2644)	) :
+			res = ColMap.fromArray(fromLab(*labA)).compare(fromLab(*labB), metrics=('dE2000',))
+			self.assertAlmostEqual(res['dE2000'], dE, places=3)
+			self.assertAlmostEqual(res['dE2000Max'], dE, places=3)
+
+	def test_async(self) :
+		arr = np.random.rand(32, 32, 3).astype(np.float32)
+		lut = LUT.lutFunc(gamma.sRGB)
+
+		async def run() :
+			return await asyncio.gather(*[ColMap.fromArray(arr * i / 8).aapply(lut) for i in range(8)])
+
+		loop = asyncio.new_event_loop()
+		try :
+			imgs = loop.run_until_complete(run())
+		finally :
+			loop.close()
+
+		for i, img in enumerate(imgs) :
+			np.testing.assert_allclose(img.asarray(), lut.sample(arr * i / 8), atol=1e-6)
+
+	def test_memmap(self) :
+		arr = np.random.rand(32, 24, 3).astype(np.float32)
+		lut = LUT.lutFunc(gamma.sRGB)
+
+		with tempfile.TemporaryDirectory() as tmp :
+			img = ColMap.fromArray(arr).toMemmap(path.join(tmp, 'plate.npy'))
+			self.assertIsInstance(img.asarray(), np.memmap)
+
+			out = ColMap.fromMemmap(path.join(tmp, 'plate.npy')).apply(lut, path=path.join(tmp, 'out.raw'), rows=5)
+			np.testing.assert_allclose(out.asarray(), lut.sample(arr), atol=1e-6)
+
+			reopened = ColMap.fromMemmap(path.join(tmp, 'out.raw'), shape=(32, 24))
+			np.testing.assert_array_equal(reopened.asarray(), out.asarray())
+
+			del img, out, reopened #Unmap before the directory goes.
+
+	def test_half(self) :
+		arr = np.random.rand(32, 24, 3).astype(np.float32)
+		img = ColMap.fromArray(arr).asHalf()
+
+		self.assertTrue(img.isHalf())
+		self.assertEqual(img.asarray().nbytes, arr.nbytes // 2)
+
+		#Each transform reads & writes half floats, with float32 math in between.
+		for transform in (LUT.lutFunc(gamma.sRGB), Func(gamma.sRGB), ColMat(gamut.sRGB), LUT.lutFunc(Func(gamma.sRGB), dims=3, size=17)) :
+			out = img.apply(transform)
+
+			self.assertTrue(out.isHalf())
+			np.testing.assert_array_equal(out.asarray(), transform.sample(img.asarray().astype(np.float32)).astype(np.float16))
+
+		self.assertFalse(img.asFull().isHalf())
+
+	def test_planar(self) :
+		arr = np.random.rand(32, 24, 3).astype(np.float32)
+		img = ColMap.fromArray(arr.transpose(2, 0, 1), planar=True)
+
+		self.assertTrue(img.isPlanar())
+		self.assertEqual(img.asarray().shape, (3, 32, 24))
+
+		#The r, g, b axis must be there: first when planar, else last.
+		with self.assertRaises(ValueError) :
+			ColMap.fromArray(arr, planar=True)
+		with self.assertRaises(ValueError) :
+			ColMap.fromArray(arr.transpose(2, 0, 1))
+		np.testing.assert_array_equal(img.asInterleaved().asarray(), arr)
+
+		#Planar images go through each transform as is, matching the interleaved result.
+		pre = LUT.lutFunc((gamma.sRGB, gamma.Rec709, gamma.lin))
+		for transform in (pre, Func(gamma.sRGB), ColMat(gamut.sRGB), CurveMat(pre, gamut.XYZ), LUT.lutFunc(Func(gamma.sRGB), dims=3, size=17)) :
+			out = img.apply(transform)
+
+			self.assertTrue(out.isPlanar())
+			np.testing.assert_allclose(out.asInterleaved().asarray(), transform.sample(arr), atol=1e-6)
+
+	def test_grey(self) :
+		grey = np.random.rand(32, 24).astype(np.float32)
+
+		#Each pixel's value lands in its own r, g, b.
+		np.testing.assert_array_equal(ColMap.fromArray(grey).asarray(), np.stack([grey] * 3, axis=-1))
+		np.testing.assert_array_equal(ColMap.fromArray(grey, planar=True).asarray(), np.stack([grey] * 3))
+
+		with self.assertRaises(ValueError) :
+			olOpt.grey_to_rgb(grey)
+
+	def test_custom(self) :
+		arr = np.random.rand(32, 24, 3).astype(np.float32)
+
+		#Transforms without planar or out in their sample still apply, to interleaved & planar images alike.
+		for img in (ColMap.fromArray(arr), ColMap.fromArray(arr.transpose(2, 0, 1), planar=True)) :
+			out = img.apply(Gain(2.0))
+
+			self.assertEqual(out.isPlanar(), img.isPlanar())
+			np.testing.assert_allclose(out.asInterleaved().asarray(), arr * [2.0, 1.0, 1.0], atol=1e-6)
+
+		with tempfile.TemporaryDirectory() as tmp :
+			out = ColMap.fromArray(arr.transpose(2, 0, 1), planar=True).apply(Gain(2.0), path=path.join(tmp, 'gain.npy'), rows=5)
+			np.testing.assert_allclose(out.asInterleaved().asarray(), arr * [2.0, 1.0, 1.0], atol=1e-6)
+
+if __name__ == "__main__" :
+	ut.main()
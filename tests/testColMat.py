@@ -0,0 +1,65 @@
+import os, sys
+
+import unittest as ut
+
+from os import path
+
+import tempfile
+
+import numpy as np
+
+sys.path.insert(0, path.abspath(path.join(path.dirname(__file__), '..')))
+
+from openlut import *
+from openlut.lib import cache
+
+#An affine matrix: sRGB, with a black level offset.
+AFFINE = np.hstack([gamut.sRGB, [[0.1], [-0.05], [0.02]]])
+
+#Keep the tests out of the user's on-disk cache.
+_cache = None
+
+def setUpModule() :
+	global _cache
+	_cache = (cache.cacheDir(), tempfile.TemporaryDirectory())
+	cache.setCacheDir(_cache[1].name)
+
+def tearDownModule() :
+	cache.setCacheDir(_cache[0])
+	_cache[1].cleanup()
+
+class testColMat(ut.TestCase) :
+	def test_affine(self) :
+		mat = ColMat(AFFINE)
+		img = np.random.rand(16, 16, 3).astype(np.float32)
+
+		self.assertTrue(mat.isAffine())
+		np.testing.assert_allclose(mat.sample(img), img.dot(AFFINE[:, :3].T) + AFFINE[:, 3], atol=1e-5)
+		np.testing.assert_allclose((~mat).sample(mat.sample(img)), img, atol=1e-5)
+
+		#Combining with a 3x3 matrix stays affine.
+		combined = ColMat(gamut.XYZ, mat)
+		self.assertTrue(combined.isAffine())
+		np.testing.assert_allclose(combined.sample(img), mat.sample(ColMat(gamut.XYZ).sample(img)), atol=1e-5)
+
+	def test_batch(self) :
+		mat = ColMat(gamut.sRGB)
+
+		for shape in ((5, 3), (2, 8, 8, 3), (2, 2, 4, 4, 3)) :
+			arr = np.random.rand(*shape).astype(np.float32)
+			out = mat.sample(arr)
+
+			self.assertEqual(out.shape, shape)
+			np.testing.assert_allclose(out, arr.dot(gamut.sRGB.T), atol=1e-5)
+
+	def test_curveMat(self) :
+		pre = LUT.lutFunc(gamma.sRGBinv)
+		post = LUT.lutFunc((gamma.sRGB, gamma.Rec709, gamma.lin), iRange=(-0.5, 1.5))
+		img = np.random.rand(16, 16, 3).astype(np.float32)
+
+		fused = CurveMat(pre, ColMat(AFFINE), post)
+
+		np.testing.assert_allclose(fused.sample(img), post.sample(ColMat(AFFINE).sample(pre.sample(img))), atol=1e-6)
+
+if __name__ == "__main__" :
+	ut.main()
@@ -0,0 +1,91 @@
+import os, sys
+
+import unittest as ut
+
+from os import path
+
+import gc
+import multiprocessing as mp
+import tempfile
+import weakref
+
+import numpy as np
+
+sys.path.insert(0, path.abspath(path.join(path.dirname(__file__), '..')))
+
+from openlut.lib.files import LogFile, Log
+
+def logLines(logPath, worker) :
+	with LogFile(logPath, maxLen=50, bufLines=7) as log :
+		for i in range(200): log.write('worker {} line {}'.format(worker, i))
+
+class testFiles(ut.TestCase) :
+	def test_rotate(self) :
+		with tempfile.TemporaryDirectory() as tmp :
+			with LogFile(path.join(tmp, 'render'), maxLen=3, bufLines=2) as log :
+				print('a', 'b', 'c', 'd', 'e', 'f', 'g', file=log, sep='\n')
+				self.assertEqual(log.read(), 'a\nb\nc\nd\ne\nf\ng\n')
+
+			self.assertEqual(len(os.listdir(tmp)), 3) #render.log, and two rotated files.
+
+			#Existing logs are appended to. After the next rotation, only the newest rotated file is kept.
+			with LogFile(path.join(tmp, 'render'), maxLen=3, keep=1) as log :
+				log.write('h\ni\nj\nk')
+				self.assertEqual(log.read(), 'g\nh\ni\nj\nk\n')
+
+	def test_rotateRace(self) :
+		with tempfile.TemporaryDirectory() as tmp :
+			a, b = LogFile(path.join(tmp, 'farm'), maxLen=2, bufLines=1), LogFile(path.join(tmp, 'farm'), maxLen=2, bufLines=1)
+			a.write('a1\na2')
+			b.write('b1')
+
+			#a rotates first. When b then rotates too - as if it had checked before a renamed - it moves a's new path.log aside,
+			#sees that it isn't its own, and puts it back. The rotation isn't split in two.
+			a.write('a3')
+			b._rotate()
+			self.assertEqual(len(os.listdir(tmp)), 2)
+
+			b.write('b2')
+			with open(path.join(tmp, 'farm.log')) as f: self.assertEqual(f.read(), 'a3\nb2\n')
+
+			a.close()
+			b.close()
+
+		#Nothing, not even the exit hook, keeps an unclosed LogFile alive.
+		with tempfile.TemporaryDirectory() as tmp :
+			log = LogFile(path.join(tmp, 'gone'))
+			log.write('kept')
+			ref = weakref.ref(log)
+			del log
+			gc.collect()
+
+			self.assertIsNone(ref())
+			with open(path.join(tmp, 'gone.log')) as f: self.assertEqual(f.read(), 'kept\n') #Flushed when collected.
+
+	def test_processes(self) :
+		with tempfile.TemporaryDirectory() as tmp :
+			logPath = path.join(tmp, 'farm.log')
+
+			procs = [mp.Process(target=logLines, args=(logPath, w)) for w in range(3)]
+			for proc in procs: proc.start()
+			for proc in procs: proc.join()
+
+			#Every line arrives whole, exactly once.
+			lines = LogFile(logPath).readlines()
+			self.assertEqual(sorted(line for line in lines if line), sorted('worker {} line {}'.format(w, i) for w in range(3) for i in range(200)))
+
+	def test_bench(self) :
+		arr = np.random.rand(64, 64, 3).astype(np.float32)
+
+		with tempfile.TemporaryDirectory() as tmp :
+			res = Log.bench(np.sqrt, [arr], minTime=0.05, data=arr, memory=True, label='sqrt', jsonPath=path.join(tmp, 'bench.jsonl'))
+
+			self.assertEqual(len(res['times']), res['trials'])
+			self.assertTrue(res['min'] <= res['median'] <= res['p95'] <= res['p99'])
+			self.assertAlmostEqual(res['bytesPerSec'], arr.nbytes / res['median'])
+			self.assertGreaterEqual(res['peakBytes'], arr.nbytes) #The output array.
+
+			self.assertEqual(Log.benchCompare((path.join(tmp, 'bench.jsonl'), 'sqrt'), res)['median'], 1.0)
+
+if __name__ == "__main__" :
+	ut.main()
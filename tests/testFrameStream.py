@@ -0,0 +1,75 @@
+import os, sys
+
+import unittest as ut
+
+from os import path
+
+import io
+import tempfile
+
+import numpy as np
+
+sys.path.insert(0, path.abspath(path.join(path.dirname(__file__), '..')))
+
+from openlut import *
+from openlut.lib import cache
+
+#Keep the tests out of the user's on-disk cache.
+_cache = None
+
+def setUpModule() :
+	global _cache
+	_cache = (cache.cacheDir(), tempfile.TemporaryDirectory())
+	cache.setCacheDir(_cache[1].name)
+
+def tearDownModule() :
+	cache.setCacheDir(_cache[0])
+	_cache[1].cleanup()
+
+class testFrameStream(ut.TestCase) :
+	def test_process(self) :
+		frames = np.random.rand(4, 16, 24, 3).astype(np.float32)
+		lut = LUT.lutFunc((gamma.sRGB, gamma.Rec709, gamma.lin))
+
+		#Planar g, b, r frames in; transformed in place; interleaved frames out.
+		inFile = io.BytesIO(b''.join(np.ascontiguousarray(f.transpose(2, 0, 1)[[1, 2, 0]]).tobytes() for f in frames))
+		outFile = io.BytesIO()
+
+		count = FrameStream(24, 16, 'gbrpf32le', inFile, outFile, outFmt='rgbf32le', ring=2).process(lut)
+
+		self.assertEqual(count, 4)
+		out = np.frombuffer(outFile.getvalue(), dtype='<f4').reshape(frames.shape)
+		np.testing.assert_allclose(out, lut.sample(frames), atol=1e-6)
+
+	def test_custom(self) :
+		frames = np.random.rand(3, 8, 12, 3).astype(np.float32)
+
+		#Transforms without planar or out in their sample work too; their result is copied into the frame.
+		class Double(Transform) :
+			def sample(self, fSeq) :
+				if np.shape(fSeq)[-1] != 3: raise ValueError('Double needs interleaved r, g, b!')
+				return np.asarray(fSeq) * 2
+
+		inFile = io.BytesIO(b''.join(np.ascontiguousarray(f.transpose(2, 0, 1)[[1, 2, 0]]).tobytes() for f in frames))
+		outFile = io.BytesIO()
+
+		self.assertEqual(FrameStream(12, 8, 'gbrpf32le', inFile, outFile, outFmt='rgbf32le', ring=2).process(Double()), 3)
+		np.testing.assert_allclose(np.frombuffer(outFile.getvalue(), dtype='<f4').reshape(frames.shape), frames * 2, atol=1e-6)
+
+	def test_rgb48(self) :
+		frames = np.random.randint(0, 65536, size=(3, 8, 8, 3)).astype('<u2')
+		stream = FrameStream(8, 8, 'rgb48le', io.BytesIO(frames.tobytes()), io.BytesIO(), ring=2)
+
+		#A frame stays valid until the ring wraps around to it.
+		first, second = stream.read(), stream.read()
+		np.testing.assert_allclose(first.asarray(), frames[0] / 65535, atol=1e-7)
+		np.testing.assert_allclose(second.asarray(), frames[1] / 65535, atol=1e-7)
+
+		self.assertIs(stream.read(), first)
+		self.assertIsNone(stream.read())
+
+		stream.write(second)
+		np.testing.assert_array_equal(np.frombuffer(stream.outFile.getvalue(), dtype='<u2').reshape(8, 8, 3), frames[1])
+
+if __name__ == "__main__" :
+	ut.main()
@@ -0,0 +1,168 @@
+import os, sys
+
+import unittest as ut
+
+from os import path
+
+import random
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+sys.path.insert(0, path.abspath(path.join(path.dirname(__file__), '..')))
+
+from openlut import *
+from openlut.lib import cache
+from openlut.lib.expr import Expr
+
+#Keep the tests out of the user's on-disk cache.
+_cache = None
+
+def setUpModule() :
+	global _cache
+	_cache = (cache.cacheDir(), tempfile.TemporaryDirectory())
+	cache.setCacheDir(_cache[1].name)
+
+def tearDownModule() :
+	cache.setCacheDir(_cache[0])
+	_cache[1].cleanup()
+
+def randomExpr(rng, depth) :
+	'''
+	A random expression, using only ops that IEEE 754 rounds exactly - so numpy & C++ must agree to the bit.
+	'''
+	if depth == 0 or rng.random() < 0.2 :
+		return rng.choice(['x', 'x', '{:.3f}'.format(rng.uniform(-3, 3)), 'pi'])
+
+	form = rng.choice([	'({} ' + rng.choice(['+', '-', '*', '/', '%', '<', '<=', '>', '>=', '==', '!=', '&&', '||']) + ' {})',
+						rng.choice(['sqrt', 'abs', 'floor', 'ceil']) + '({})',
+						rng.choice(['min', 'max', 'fmod']) + '({}, {})',
+						'clamp({}, {}, {})',
+						'({} ? {} : {})',
+						'-{}',
+						'!{}'
+	])
+
+	return form.format(*[randomExpr(rng, depth - 1) for i in range(form.count('{}'))])
+
+class testFunc(ut.TestCase) :
+	def test_bake(self) :
+		img = np.random.rand(64, 64, 3).astype(np.float32) * 2
+
+		exact = Func(gamma.sRGB).sample(img)
+		adaptive = Func(gamma.sRGB, bake=1e-4, bakeMin=1)
+
+		np.testing.assert_allclose(adaptive.sample(img), exact, atol=1e-4)
+
+		#The LUT covers the input's range, and is reused for inputs within it.
+		(lo, hi), lut = adaptive._baked
+		self.assertLessEqual(lo, img.min())
+		self.assertGreaterEqual(hi, img.max())
+
+		adaptive.sample(img[:8])
+		self.assertIs(adaptive._baked[1], lut)
+
+	def test_backend(self) :
+		img = np.random.rand(64, 48, 3).astype(np.float32)
+		exact = Func(gamma.sRGBinv).sample(img)
+
+		#numpy-vectorizable functions run in threads, over chunks. Others run per value, in processes.
+		vec = Func(lambda x: np.where(x > 0.04045, np.power((x + 0.055) / 1.055, 2.4), x / 12.92))
+		scalar = Func(lambda x: ((x + 0.055) / 1.055) ** 2.4 if x > 0.04045 else x / 12.92)
+
+		self.assertEqual(vec.getBackend(), 'thread')
+		self.assertEqual(scalar.getBackend(), 'process')
+		np.testing.assert_allclose(vec.sample(img), exact, atol=1e-6)
+		np.testing.assert_allclose(scalar.sample(img[:4]), exact[:4], atol=1e-6)
+
+		out = np.empty_like(img)
+		self.assertTrue(np.shares_memory(vec.sample(img, out=out), out))
+
+		with self.assertRaises(ValueError) :
+			Func(vec.func, backend='gpu')
+
+		#Detection probes the function once, even with many threads asking at the same time. An explicit backend never probes.
+		calls = []
+		def counted(x) :
+			calls.append(len(x))
+			time.sleep(0.01)
+			return x * 2
+
+		auto = Func(counted)
+		threads = [threading.Thread(target=auto.getBackend) for i in range(8)]
+		for t in threads: t.start()
+		for t in threads: t.join()
+		self.assertEqual(calls, [7])
+
+		del calls[:]
+		np.testing.assert_allclose(Func(counted, backend='thread').sample(img[:1, :1]), img[:1, :1] * 2)
+		self.assertEqual(len(calls), 1)
+
+	def test_expr(self) :
+		img = np.random.rand(64, 48, 3).astype(np.float32) * 1.2 - 0.1
+		srcs = {	'x > 0.04045 ? pow((x + 0.055) / 1.055, 2.4) : x / 12.92'	: gamma.sRGBinv,
+					'clamp(-x^2 + 2 * x, 0, 1)'									: lambda x: np.clip(-x ** 2 + 2 * x, 0, 1),
+					'x < 0 || x > 1 ? 0 : log2(1 + x) % 0.5'					: lambda x: np.where((x < 0) | (x > 1), 0, np.fmod(np.log2(1 + x), 0.5))
+		}
+
+		for src, exact in srcs.items() :
+			func = Func(src)
+			ref = Func(exact).sample(img)
+			np.testing.assert_allclose(func.sample(img), ref, atol=1e-6)
+
+			#Expressions serialize as they are, and run in C++ wherever they're loaded.
+			np.testing.assert_allclose(Transform.loads(func.dumps()).sample(img), ref, atol=1e-6)
+
+		np.testing.assert_allclose(LUT.lutFunc('x ^ 2', size=256).array, np.linspace(0, 1, 256) ** 2, atol=1e-6)
+
+		#Constant subexpressions fold to one load, and registers are reused as soon as they're free.
+		self.assertEqual(len(Expr('2 * pi - sqrt(4) + x').code), 2)
+		self.assertEqual(Expr('(x + 1) * (x + 2) * (x + 3) * (x + 4)').nRegs, 3)
+
+		#The native evaluator runs the same bytecode as Expr.evalNumpy, instruction by instruction.
+		vals = np.concatenate([np.random.rand(4096).astype(np.float32) * 8 - 4, np.float32([0, 1, -1, np.inf, -np.inf, np.nan])])
+		for src in (	'x', '2 * pi - sqrt(4) + x', '(x + 1) * (x + 2) * (x + 3) * (x + 4)',
+						'((x + 1) * (x + 2)) / ((x - 3) * (x - 4)) + sqrt(abs(x - 5))',
+						'x > 0 ? (x < 1 ? x : 1 + log(x)) : -exp(x) + 1', 'mix(sin(x), cos(x), x) * tan(x / 4)',
+						'pow(abs(x), 1 / 2.4) + log2(abs(x) + 1) - log10(abs(x) + 1) + e ^ -x ^ 2'
+		) :
+			expr = Expr(src)
+			np.testing.assert_allclose(expr(vals), expr.evalNumpy(vals), rtol=1e-5, atol=1e-6, err_msg=src)
+
+		#Random expressions of exactly rounded ops must agree exactly.
+		rng = random.Random(42)
+		for i in range(200) :
+			expr = Expr(randomExpr(rng, 5))
+			np.testing.assert_array_equal(expr(vals), expr.evalNumpy(vals), err_msg=expr.src)
+
+		for bad in ('x +', 'pow(x)', 'x ? 1', 'foo(x)', 'x $ 2') :
+			with self.assertRaises(ValueError) :
+				Func(bad)
+
+	def test_paramCurve(self) :
+		img = np.random.rand(64, 48, 3).astype(np.float32)
+		curves = {	gamma.ParamCurve.linPow(1 / 2.4, 1.055, 0.055, 0.0031308, 12.92)	: gamma.sRGB,
+					gamma.ParamCurve.log(10, 0.432699, 0.646596, 1, 0.037584)			: gamma.sLog,
+					gamma.ParamCurve.power(1 / 2.2)										: lambda x: x ** (1 / 2.2)
+		}
+
+		for curve, exact in curves.items() :
+			np.testing.assert_allclose(Func(curve).sample(img), Func(exact).sample(img), atol=1e-5)
+
+			#Inverses are exact, and curves serialize by their parameters.
+			np.testing.assert_allclose(curve.inv()(curve(img)), img, atol=1e-5)
+			self.assertEqual(Transform.loads(Func(curve.inv()).dumps()).func, curve.inv())
+
+		#The camera curves hit their published 18% grey code values.
+		self.assertAlmostEqual(gamma.sLog3(0.18) * 1023, 420.0, places=3)
+		self.assertAlmostEqual(gamma.LogC(0.18), 0.391007, places=5)
+		np.testing.assert_allclose(gamma.LogC.inv()(gamma.LogC(img)), img, atol=1e-5)
+
+		self.assertEqual(LUT.lutFunc(gamma.Cineon, size=16).array.dtype, np.float32)
+		with self.assertRaises(ValueError) :
+			gamma.ParamCurve(gamma.ParamCurve.LOG, (10, 1))
+
+if __name__ == "__main__" :
+	ut.main()
@@ -0,0 +1,71 @@
+import os, sys
+
+import unittest as ut
+
+from os import path
+
+import json
+import statistics
+import subprocess
+
+#Each run is a fresh interpreter, so nothing is already imported.
+ROOT = path.abspath(path.join(path.dirname(__file__), '..'))
+HEAVY = ('wand', 'pygame', 'OpenGL', 'scipy', 'matplotlib', 'asyncio')
+
+PROBE = '''
+import sys, time, json
+sys.path.insert(0, {root!r})
+
+t = time.perf_counter()
+import numpy
+tNumpy = time.perf_counter() - t
+
+t = time.perf_counter()
+import openlut
+from openlut import *
+tImport = time.perf_counter() - t
+
+t = time.perf_counter()
+openlut.LUT.lutFunc(openlut.gamma.sRGB)
+tLUT = time.perf_counter() - t
+
+print(json.dumps({{'numpy': tNumpy, 'import': tImport, 'lutFunc': tLUT, 'heavy': [m for m in {heavy!r} if m in sys.modules]}}))
+'''
+
+def probe() :
+	'''
+	Time "import openlut; LUT.lutFunc(...)" in a fresh interpreter. numpy is imported first, and timed apart.
+	'''
+	out = subprocess.check_output([sys.executable, '-c', PROBE.format(root=ROOT, heavy=HEAVY)], env=dict(os.environ, OPENLUT_CACHE_DIR=''))
+	return json.loads(out.decode().strip().splitlines()[-1])
+
+def bench(runs = 10) :
+	'''
+	Print the min & median of each timing, over fresh interpreters.
+	'''
+	res = [probe() for i in range(runs)]
+	for k in ('numpy', 'import', 'lutFunc') :
+		times = [r[k] * 1000 for r in res]
+		print('{:>8}: min {:8.2f} ms, median {:8.2f} ms'.format(k, min(times), statistics.median(times)))
+
+class testImport(ut.TestCase) :
+	def test_lazy(self) :
+		#Headless use mustn't pull in the GUI, Wand, scipy or asyncio.
+		self.assertEqual(probe()['heavy'], [])
+
+	def test_viewer(self) :
+		#The Viewer is exported, and becomes the real class on first use.
+		code = 'import sys; sys.path.insert(0, {!r}); import openlut; openlut.Viewer.run; print(openlut.Viewer.__name__, type(openlut.Viewer).__name__, "Viewer" in openlut.__all__)'.format(ROOT)
+		out = subprocess.check_output([sys.executable, '-c', code], env=dict(os.environ, OPENLUT_CACHE_DIR='', PYGAME_HIDE_SUPPORT_PROMPT='1'))
+
+		self.assertEqual(out.decode().split()[-3:], ['Viewer', 'type', 'True'])
+
+	def test_time(self) :
+		#A generous bound, that still catches an eager import of the Viewer or Wand sneaking back in.
+		self.assertLess(min(probe()['import'] for i in range(3)), 1.0)
+
+if __name__ == "__main__" :
+	if sys.argv[1:2] == ['bench'] :
+		bench(int(sys.argv[2]) if len(sys.argv) > 2 else 10)
+	else :
+		ut.main()
@@ -4,33 +4,198 @@ import unittest as ut
 
 from os import path
 
-sys.path.append(0, path.abspath('..'))
+import pickle
+import tempfile
+import types
+
+import numpy as np
+
+sys.path.insert(0, path.abspath(path.join(path.dirname(__file__), '..')))
 
 from openlut import *
+from openlut.lib import cache
+
+#Keep the tests out of the user's on-disk cache.
+_cache = None
+
+def setUpModule() :
+	global _cache
+	_cache = (cache.cacheDir(), tempfile.TemporaryDirectory())
+	cache.setCacheDir(_cache[1].name)
+
+def tearDownModule() :
+	cache.setCacheDir(_cache[0])
+	_cache[1].cleanup()
 
-def verifyLUT(lut, title, size, iRange) :
-	assertEqual(lut.title, title)
-	assertEqual(lut.size, size)
-	assertEqual(lut.range, iRange)
-	assertEqual(lut.dims, 1)
-	assertEqual(lut.ID, np.linspace(iRange[0], iRange[1], size))
-	
-	assertEqual(str(lut.array), 'float32')
+def verifyLUT(test, lut, title, size, iRange) :
+	test.assertEqual(lut.title, title)
+	test.assertEqual(lut.size, size)
+	test.assertEqual(lut.range, iRange)
+	test.assertEqual(lut.dims, 1)
+	np.testing.assert_allclose(lut.ID, np.linspace(iRange[0], iRange[1], size), rtol=1e-6)
+
+	test.assertEqual(str(lut.array.dtype), 'float32')
 
 class testLUT(ut.TestCase) :
 	def test_init(self) :
 		lut = LUT(title="test", size=4096, iRange=(-0.125, 1.125))
-		
-		verifyLUT(lut, 'test', 4096, (-0.125, 1.125))
-		
+
+		verifyLUT(self, lut, 'test', 4096, (-0.125, 1.125))
+
+		#Lookups scale by the range's width, so it can't be empty or reversed.
+		for iRange in ((0.5, 0.5), (1.0, 0.0), (0.0, float('nan'))) :
+			with self.assertRaises(ValueError) :
+				LUT(iRange=iRange)
+			with self.assertRaises(ValueError) :
+				LUT.lutFunc(gamma.sRGB, iRange=iRange)
+
 		#~ assertEqual(lut.title, 'test')
 		#~ assertEqual(lut.size, 4096)
 		#~ assertEqual(lut.range, (-0.125, 1.125))
 		#~ assertEqual(lut.dims, 1)
 		#~ assertEqual(lut.ID, np.linspace(-0.125, 1.125, 4096))
 		#~ assertEqual(lut.array, np.linspace(-0.125, 1.125, 4096))
-		
+
 	def test_func(self) :
 		lut = LUT.lutFunc(gamma.sRGB, title='test', size=4096, iRange=(-0.125, 1.125))
+
+		verifyLUT(self, lut, 'test', 4096, (-0.125, 1.125))
+
+	def test_inverted(self) :
+		lut = LUT.lutFunc(gamma.sRGB, size=65536)
+		exact = LUT.lutFunc(gamma.sRGBinv, size=1024)
+
+		for cubic in (False, True) :
+			inv = lut.inverted(newSize=1024, cubic=cubic)
+
+			self.assertEqual(inv.size, 1024)
+			np.testing.assert_allclose(inv.array, exact.array, atol=1e-4)
+
+		#Decreasing, non-strictly-monotonic LUTs invert too.
+		flat = LUT.lutArray(np.array([1.0, 1.0, 0.75, 0.5, 0.5, 0.0], dtype=np.float32))
+		inv = flat.inverted(newSize=5)
+		np.testing.assert_allclose(inv.array[[0, -1]], [1.0, 0.2], atol=1e-6)
+
+	def test_perChannel(self) :
+		lut = LUT.lutFunc((gamma.sRGB, gamma.lin, gamma.Rec709), size=4096)
+		self.assertEqual(lut.chans, 3)
+		self.assertEqual(lut.array.shape, (4096, 3))
+
+		img = np.random.rand(16, 16, 3).astype(np.float32)
+		out = lut.sample(img)
+
+		self.assertEqual(out.shape, img.shape)
+		np.testing.assert_allclose(out[..., 0], LUT.lutFunc(gamma.sRGB, size=4096).sample(img[..., 0]), atol=1e-6)
+		np.testing.assert_allclose(out[..., 1], img[..., 1], atol=1e-6)
+
+	def test_3D(self) :
+		img = np.random.rand(16, 16, 3).astype(np.float32)
+
+		np.testing.assert_allclose(LUT(dims=3, size=17).sample(img), img, atol=1e-6)
+
+		mat = ColMat(gamut.sRGB)
+		np.testing.assert_allclose(LUT.lutFunc(mat, dims=3, size=17).sample(img), mat.sample(img), atol=1e-5)
+
+	def test_shaper(self) :
+		img = (np.random.rand(16, 16, 3) ** 4 * 16).astype(np.float32)
+
+		tone = LUT.lutFunc((gamma.ReinhardHDR,) * 3, iRange=(0.0, 16.0))
+		sLUT = ShaperLUT.bake(tone, LUT.lutFunc(gamma.sLog2, iRange=(0.0, 16.0)), size=33)
+
+		np.testing.assert_allclose(sLUT.sample(img), tone.sample(img), atol=1e-3)
+
+	def test_lutFit(self) :
+		#Non-finite outputs are counted and left out. Next to them, no LUT fits - which shows as inf, never NaN.
+		with np.errstate(divide='ignore') :
+			lut, report = LUT.lutFit(lambda x: np.log(np.asarray(x)), iRange=(0.0, 1.0), sizes=[16, 64], probes=1025)
+		self.assertEqual(report['nonFinite'], 1)
+		self.assertFalse(report['met'])
+		self.assertTrue(all(c['maxErr'] == np.inf for c in report['candidates']))
+
+		self.assertTrue(LUT.lutFit(lambda x: np.log(np.asarray(x)), iRange=(0.5, 1.0))[1]['met'])
+
+		lut, report = LUT.lutFit(gamma.sRGBinv, tol=1e-4)
+
+		self.assertTrue(report['met'])
+		self.assertEqual(lut.size, report['size'])
+		self.assertLessEqual(report['candidates'][-1]['maxErr'], 1e-4)
+		self.assertGreater(report['candidates'][-2]['maxErr'], 1e-4) #The next smaller size wasn't good enough.
+
+		probe = np.linspace(0, 1, 10000, dtype=np.float32)
+		np.testing.assert_allclose(lut.sample(probe), Func(gamma.sRGBinv).sample(probe), atol=1e-4)
+
+	def test_serial(self) :
+		img = np.random.rand(16, 16, 3).astype(np.float32)
+
+		lut = LUT.lutFunc(gamma.sRGB)
+		for transform in (lut, ColMat(gamut.sRGB), Func(gamma.sRGB), Func(lambda x: x * 2), CurveMat(lut, gamut.XYZ)) :
+			data = transform.dumps()
+			np.testing.assert_array_equal(Transform.loads(data).sample(img), transform.sample(img))
+			np.testing.assert_array_equal(pickle.loads(pickle.dumps(transform)).sample(img), transform.sample(img))
+
+		self.assertLess(len(lut.dumps()), lut.array.nbytes + 64) #Just the array, and a small header.
+
+		with self.assertRaises(ValueError) :
+			Transform.loads(b'nope')
+			
+	def test_sizes(self) :
+		#3D LUTs default to a cube-sized lattice, not the 1D default.
+		self.assertEqual(LUT().size, 4096)
+		self.assertEqual(LUT(dims=3).array.shape, (33, 33, 33, 3))
+		self.assertEqual(LUT.lutFunc(ColMat(gamut.sRGB), dims=3).size, 33)
 		
-		verifyLUT(lut, 'test', 4096, (-0.125, 1.125))
+		with self.assertRaises(ValueError) :
+			LUT(dims=3, size=4096)
+			
+	def test_cache(self) :
+		old = cache.cacheDir()
+		with tempfile.TemporaryDirectory() as tmp :
+			cache.setCacheDir(tmp)
+			try :
+				lut = LUT.lutFunc(gamma.sRGB)
+				inv = lut.inverted(cubic=True)
+				
+				files = os.listdir(tmp)
+				self.assertEqual(len(files), 1)
+				np.testing.assert_array_equal(lut.inverted(cubic=True).array, inv.array)
+				self.assertEqual(os.listdir(tmp), files) #A hit.
+				
+				#Different inputs make different entries.
+				lut.inverted(cubic=False)
+				LUT.lutFunc(lambda x: x ** 2, size=256)
+				LUT.lutFunc(lambda x: x ** 3, size=256)
+				self.assertEqual(sum(len(names) for root, dirs, names in os.walk(tmp)), 4)
+				
+				cache.evict(0)
+				self.assertEqual(sum(len(names) for root, dirs, names in os.walk(tmp)), 0)
+				
+				#Functions are keyed by the globals they read too - constants & helper functions - so edits never give stale LUTs.
+				ns = {'K': 2.0}
+				exec('def helper(x): return x * K\ndef f(x): return helper(x) + 1', ns)
+				np.testing.assert_allclose(LUT.lutFunc(ns['f'], size=4).array, np.linspace(0, 1, 4) * 2 + 1, atol=1e-6)
+				
+				ns['K'] = 3.0
+				np.testing.assert_allclose(LUT.lutFunc(ns['f'], size=4).array, np.linspace(0, 1, 4) * 3 + 1, atol=1e-6)
+				
+				exec('def helper(x): return x * K * 2', ns)
+				np.testing.assert_allclose(LUT.lutFunc(ns['f'], size=4).array, np.linspace(0, 1, 4) * 6 + 1, atol=1e-6)
+				self.assertEqual(sum(len(names) for root, dirs, names in os.walk(tmp)), 3)
+				
+				#Attributes of your own modules are hashed too - not just the module's name.
+				cfg = types.ModuleType('cfg')
+				cfg.K = 2.0
+				exec('def g(x): return x * cfg.K', ns)
+				ns['cfg'] = cfg
+				np.testing.assert_allclose(LUT.lutFunc(ns['g'], size=4).array, np.linspace(0, 1, 4) * 2, atol=1e-6)
+				
+				cfg.K = 5.0
+				np.testing.assert_allclose(LUT.lutFunc(ns['g'], size=4).array, np.linspace(0, 1, 4) * 5, atol=1e-6)
+				
+				#Globals that can't be hashed turn caching off.
+				ns['K'] = object()
+				self.assertIsNone(cache.key('lutFunc', ns['f']))
+			finally :
+				cache.setCacheDir(old)
+
+if __name__ == "__main__" :
+	ut.main()
@@ -0,0 +1,63 @@
+import os, sys
+
+import unittest as ut
+
+from os import path
+
+import tempfile
+
+import numpy as np
+
+sys.path.insert(0, path.abspath(path.join(path.dirname(__file__), '..')))
+
+from openlut import *
+
+class DieOnce(Transform) :
+	'''
+	Kills the worker process on its first frame, as a crash would. The marker file makes sure it's just once.
+	'''
+	def __init__(self, marker) :
+		self.marker = marker
+
+	def sample(self, fSeq, planar = False, out = None) :
+		if path.exists(self.marker) :
+			os.remove(self.marker)
+			os._exit(3)
+
+		return Transform.intoOut(fSeq, out)
+
+class testRenderQueue(ut.TestCase) :
+	def test_run(self) :
+		lut = LUT.lutFunc(gamma.sRGB)
+		progress = []
+
+		with tempfile.TemporaryDirectory() as tmp :
+			for frame in range(1, 5) :
+				ColMap.fromArray(np.random.rand(16, 16, 3).astype(np.float32)).save(path.join(tmp, 'in.{:04d}.png'.format(frame)))
+
+			#Frame 5 doesn't exist, so it fails - once, then once more as a retry.
+			queue = RenderQueue(lut, path.join(tmp, 'in.%04d.png'), path.join(tmp, 'out.%04d.png'), workers=2, retries=1, progress=lambda *args: progress.append(args))
+			res = queue.run(range(1, 6))
+
+			self.assertEqual(res['done'], [1, 2, 3, 4])
+			self.assertEqual(list(res['failed']), [5])
+			self.assertEqual(len(progress), 5)
+
+			for frame in res['done'] :
+				self.assertTrue(path.exists(path.join(tmp, 'out.{:04d}.png'.format(frame))))
+
+	def test_crash(self) :
+		with tempfile.TemporaryDirectory() as tmp :
+			for frame in range(1, 4) :
+				ColMap.fromArray(np.random.rand(8, 8, 3).astype(np.float32)).save(path.join(tmp, 'in.{:04d}.png'.format(frame)))
+
+			marker = path.join(tmp, 'die')
+			open(marker, 'w').close()
+
+			#The worker dies mid-frame; it's replaced, and the frame it was handed is retried - not lost.
+			res = RenderQueue(DieOnce(marker), path.join(tmp, 'in.%04d.png'), path.join(tmp, 'out.%04d.png'), workers=2, retries=1).run(range(1, 4))
+
+			self.assertEqual(res, {'done': [1, 2, 3], 'failed': {}})
+
+if __name__ == "__main__" :
+	ut.main()